@@ -0,0 +1,42 @@
+# gunicorn.conf.py
+#
+# Pre-fork serving: the Production models are loaded once in the master and
+# shared copy-on-write with every worker.
+#
+#   gunicorn -c gunicorn.conf.py                       # Flask (app.main:app)
+#   GUNICORN_APP=app.asgi:app GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+#       gunicorn -c gunicorn.conf.py                   # ASGI
+#
+# Per-worker RSS / USS / PSS: GET /predict/stats, /metrics, or
+# python scripts/worker_memory.py <master pid>
+
+import os
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+for path in (here, os.path.join(here, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+wsgi_app = os.getenv("GUNICORN_APP", "app.main:app")
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the app (and prediction.py's ModelHolder) in the master before forking
+preload_app = True
+
+
+def when_ready(server):
+    from app.utils.prediction import holder
+    from app.utils.prefork import prepare_master
+
+    prepare_master(holder)
+
+
+def post_fork(server, worker):
+    from app.utils.prediction import holder
+    from app.utils.prefork import after_fork
+
+    after_fork(holder)
@@ -0,0 +1,4 @@
+# scripts/benchmark/__init__.py
+"""
+Serving performance benchmarks; see `python -m scripts.benchmark --help`.
+"""
@@ -0,0 +1,198 @@
+# scripts/benchmark/__main__.py
+"""
+Serving benchmark: synthetic leads (lead_data_schema.txt + the value and
+null profile of uploads/Lead_Scoring.csv) driven through predict_lead,
+predict_batch, /predict and /upload at each concurrency level, compared
+with a stored baseline.
+
+    python -m scripts.benchmark                            # in-process, local stand-in models
+    python -m scripts.benchmark --concurrency 1,8,32 --targets predict_lead,predict
+    python -m scripts.benchmark --url http://localhost:5001   # /predict and /upload over HTTP
+    python -m scripts.benchmark.serve --port 5001          # a server on the same stand-ins
+    python -m scripts.benchmark --update-baseline          # record scripts/benchmark/baseline.json
+
+Exits 1 when a scenario's p95 or throughput is worse than the baseline by
+more than --tolerance. Baselines are machine-specific: record one on the
+box that runs the comparison.
+"""
+
+import io
+import argparse
+import json
+import sys
+import threading
+
+from .stand_in import install_stand_ins, use_local_sinks, scratch_dir
+from .synthetic import SCHEMA_PATH, SAMPLE_CSV, load_profile, synthetic_leads
+from .drivers import run_threads, run_http
+from .baseline import BASELINE_PATH, load_baseline, save_baseline, compare, delta
+
+TARGETS = ("predict_lead", "predict_batch", "predict", "upload")
+DEFAULT_REQUESTS = {"predict_lead": 2000, "predict_batch": 100, "predict": 1000, "upload": 20}
+
+
+def records(df) -> list:
+    # Round-trip through JSON so NaN becomes null like a real client payload
+    return json.loads(df.to_json(orient="records"))
+
+
+def build_payloads(target: str, profile: dict, n: int, args, seed: int) -> tuple:
+    """
+    Returns (payloads, rows per call) for one scenario. Every scenario gets
+    fresh leads so earlier runs do not warm the prediction cache.
+    """
+    if target in ("predict_lead", "predict"):
+        return records(synthetic_leads(profile, n, seed=seed)), 1
+    if target == "predict_batch":
+        df = synthetic_leads(profile, n * args.batch_rows, seed=seed)
+        return [df.iloc[i:i + args.batch_rows].reset_index(drop=True)
+                for i in range(0, len(df), args.batch_rows)], args.batch_rows
+    # Distinct file names: concurrent uploads of one name overwrite each other in uploads/
+    df = synthetic_leads(profile, n * args.upload_rows, seed=seed)
+    return [(f"leads-{seed}-{i}.csv", df.iloc[i:i + args.upload_rows].to_csv(index=False).encode("utf-8"))
+            for i in range(0, len(df), args.upload_rows)], args.upload_rows
+
+
+def upload_params(args) -> dict:
+    return {"format": args.upload_format} if args.upload_format else {}
+
+
+def in_process_call(target: str, args):
+    """
+    Returns call(payload) -> bool for the in-process drivers.
+    """
+    from app.utils.prediction import predict_lead, predict_batch
+
+    if target == "predict_lead":
+        return lambda record: isinstance(predict_lead(record), float)
+    if target == "predict_batch":
+        return lambda df: not isinstance(predict_batch(df), dict)
+
+    from app import create_app
+    app = create_app()
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        return local.client
+
+    if target == "predict":
+        return lambda record: client().post("/predict", json=record).status_code == 200
+    params = upload_params(args)
+    return lambda upload: client().post(
+        "/upload", query_string=params, data={"file": (io.BytesIO(upload[1]), upload[0])}
+    ).status_code == 200
+
+
+def http_send(target: str, args):
+    url = args.url.rstrip("/")
+    if target == "predict":
+        return lambda client, record: client.post(f"{url}/predict", json=record)
+    params = upload_params(args)
+    return lambda client, upload: client.post(f"{url}/upload", params=params,
+                                              files={"file": (upload[0], upload[1], "text/csv")})
+
+
+def run_scenario(target: str, concurrency: int, profile: dict, args, seed: int) -> dict:
+    from app.utils.prediction import prediction_cache
+
+    n = max(1, int(DEFAULT_REQUESTS[target] * args.scale))
+    payloads, rows = build_payloads(target, profile, n, args, seed)
+    warmup, _ = build_payloads(target, profile, min(n, args.warmup), args, seed + 10_000)
+
+    if args.url and target in ("predict", "upload"):
+        send = http_send(target, args)
+        run_http(send, warmup, len(warmup), concurrency, rows)
+        return run_http(send, payloads, n, concurrency, rows)
+
+    call = in_process_call(target, args)
+    run_threads(call, warmup, len(warmup), concurrency, rows)
+    prediction_cache.clear()
+    return run_threads(call, payloads, n, concurrency, rows)
+
+
+def print_table(results: dict, baseline):
+    base = (baseline or {}).get("scenarios", {})
+    print(f"\n{'scenario':24}{'rps':>10}{'rows/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'errors':>8}{'Δ p95':>8}{'Δ rps':>8}")
+    for name, r in results.items():
+        b = base.get(name, {})
+        print(f"{name:24}{r['throughput_rps']:>10.1f}{r['rows_per_s']:>12.0f}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}"
+              f"{delta(r['p95_ms'], b.get('p95_ms')):>8}{delta(r['throughput_rps'], b.get('throughput_rps')):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"comma-separated subset of {TARGETS}")
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated caller counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the per-target request counts")
+    parser.add_argument("--batch-rows", type=int, default=500, help="leads per predict_batch call")
+    parser.add_argument("--upload-rows", type=int, default=5000, help="leads per uploaded CSV")
+    parser.add_argument("--upload-format", default=None, help="/upload ?format= (default: server default)")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured calls before each scenario")
+    parser.add_argument("--url", default=None, help="drive /predict and /upload over HTTP at this base URL")
+    parser.add_argument("--model", default="LogisticRegression", help="stand-in from src/ml/model_objects")
+    parser.add_argument("--schema", default=SCHEMA_PATH)
+    parser.add_argument("--sample", default=SAMPLE_CSV)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95/throughput regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--out", default=None, help="also write results JSON here")
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {sorted(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    version = install_stand_ins(args.model)
+    use_local_sinks()
+    profile = load_profile(args.schema, args.sample)
+    mode = "http" if args.url else "inproc"
+    print(f"[INFO] Stand-in model {version}; {mode} targets {targets} at concurrency {levels}")
+
+    results = {}
+    seed = args.seed
+    with scratch_dir():
+        for target in targets:
+            for c in levels:
+                seed += 1
+                via = mode if target in ("predict", "upload") else "inproc"
+                name = f"{target}/{via}/c{c}"
+                print(f"[INFO] {name} ...", flush=True)
+                results[name] = run_scenario(target, c, profile, args, seed)
+
+    baseline = load_baseline(args.baseline)
+    print_table(results, baseline)
+
+    config = {k: v for k, v in vars(args).items()
+              if k not in ("baseline", "update_baseline", "out", "schema", "sample")}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": config, "scenarios": results}, f, indent=2)
+    if args.update_baseline:
+        save_baseline(results, config, args.baseline)
+        print(f"\n[INFO] Baseline written to {args.baseline}")
+        return
+    if baseline is None:
+        print(f"\n[INFO] No baseline at {args.baseline}; run with --update-baseline to record one")
+        return
+
+    missing = [name for name in results if name not in baseline.get("scenarios", {})]
+    if missing:
+        print(f"\n[INFO] Not in the baseline (not compared): {missing}")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for name, metric, base, current in regressions:
+            print(f"   {name}: {metric} {base:.2f} -> {current:.2f}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# scripts/benchmark/baseline.py
+"""
+Stored-baseline comparison. A scenario regresses when its p95 latency grows
+or its throughput drops by more than the tolerance.
+"""
+
+import json
+import os
+import platform
+from datetime import datetime
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def environment() -> dict:
+    import numpy
+    import pandas
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def load_baseline(path: str = BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict, config: dict, path: str = BASELINE_PATH):
+    """
+    Records `results`, keeping baseline scenarios that were not re-run
+    (e.g. HTTP entries when only in-process targets ran).
+    """
+    scenarios = (load_baseline(path) or {}).get("scenarios", {})
+    scenarios.update(results)
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "config": config, "scenarios": scenarios}, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Returns [(scenario, metric, baseline value, current value), ...] for
+    every regression beyond `tolerance` (0.2 = 20%).
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base.get("p95_ms") and current.get("p95_ms") and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append((name, "p95_ms", base["p95_ms"], current["p95_ms"]))
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append((name, "throughput_rps", base["throughput_rps"], current["throughput_rps"]))
+        if current["errors"] > base.get("errors", 0):
+            regressions.append((name, "errors", base.get("errors", 0), current["errors"]))
+    return regressions
+
+
+def delta(current, base) -> str:
+    if not base or current is None:
+        return ""
+    return f"{(current / base - 1) * 100:+.0f}%"
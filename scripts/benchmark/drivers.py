@@ -0,0 +1,99 @@
+# scripts/benchmark/drivers.py
+"""
+Load generators. Each scenario sends `requests` calls with `concurrency`
+callers in flight and reports throughput and latency percentiles.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def summarize(latencies: list, wall: float, errors: int, rows_per_call: int = 1) -> dict:
+    lat_ms = np.asarray(latencies) * 1000.0
+    n = len(latencies)
+    return {
+        "requests": n,
+        "errors": errors,
+        "throughput_rps": n / wall if wall > 0 else 0.0,
+        "rows_per_s": n * rows_per_call / wall if wall > 0 else 0.0,
+        "p50_ms": float(np.percentile(lat_ms, 50)) if n else None,
+        "p95_ms": float(np.percentile(lat_ms, 95)) if n else None,
+        "p99_ms": float(np.percentile(lat_ms, 99)) if n else None,
+    }
+
+
+def run_threads(call, payloads: list, requests: int, concurrency: int, rows_per_call: int = 1) -> dict:
+    """
+    In-process driver: `concurrency` threads call `call(payload)` until
+    `requests` calls are done. `call` returns False (or raises) on error.
+    """
+    latencies, errors = [], [0]
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                ok = call(payloads[i % len(payloads)])
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                if ok is False:
+                    errors[0] += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return summarize(latencies, time.perf_counter() - t0, errors[0], rows_per_call)
+
+
+def run_http(send, payloads: list, requests: int, concurrency: int, rows_per_call: int = 1,
+             timeout: float = 120) -> dict:
+    """
+    HTTP driver (same shape as scripts/compare_serving.py): `send(client,
+    payload)` is a coroutine returning an httpx response.
+    """
+    import httpx
+
+    async def drive():
+        latencies, errors = [], 0
+        queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(payloads[i % len(payloads)])
+
+        async def worker(client):
+            nonlocal errors
+            while True:
+                try:
+                    payload = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                t0 = time.perf_counter()
+                try:
+                    r = await send(client, payload)
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            wall = time.perf_counter() - t0
+        return summarize(latencies, wall, errors, rows_per_call)
+
+    return asyncio.run(drive())
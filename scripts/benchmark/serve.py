@@ -0,0 +1,29 @@
+# scripts/benchmark/serve.py
+"""
+Flask server on the local stand-in models and in-memory sinks, as an HTTP
+target for `python -m scripts.benchmark --url ...`.
+
+    python -m scripts.benchmark.serve --port 5001
+"""
+
+import argparse
+
+from .stand_in import install_stand_ins, use_local_sinks, scratch_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--model", default="LogisticRegression")
+    args = parser.parse_args()
+
+    install_stand_ins(args.model)
+    use_local_sinks()
+    from app import create_app
+    with scratch_dir():
+        create_app().run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# scripts/benchmark/stand_in.py
+"""
+Runs the serving code against local artifacts instead of the MLflow
+registry, with Redshift staging and S3 persistence replaced by in-memory
+sinks, so benchmarks measure scoring and serialization rather than the
+network.
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import warnings
+from contextlib import contextmanager
+
+import joblib
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# The app imports itself as `app.*` (see src/app/main.py)
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+sys.path.insert(0, REPO_ROOT)
+
+# Keep background job threads out of the measurements
+os.environ.setdefault("JOBS_RUNNER", "off")
+# The committed model pickles were fitted on a DataFrame; serving passes arrays
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+PIPELINE_PATH = os.path.join(REPO_ROOT, "models", "full_pipeline.pkl")
+MODEL_DIR = os.path.join(REPO_ROOT, "src", "ml", "model_objects")
+
+
+def model_path(name: str) -> str:
+    return os.path.join(MODEL_DIR, f"{name}_model.pkl")
+
+
+def install_stand_ins(model_name: str = "LogisticRegression") -> str:
+    """
+    Loads the committed pipeline and model pickles into the serving
+    ModelHolder. Returns the live version string.
+    """
+    from app.utils.prediction import holder
+
+    preprocessor = joblib.load(PIPELINE_PATH)
+    model = joblib.load(model_path(model_name))
+    holder.set_models(preprocessor, model, "local", model_name)
+    return holder.peek().version
+
+
+def _parquet_sink(df, key=None, file_format="parquet", **kwargs):
+    # Same encode cost as the real writer, no upload
+    df.to_parquet(io.BytesIO(), index=False)
+
+
+def _skip_staging(*args, **kwargs):
+    return None
+
+
+def use_local_sinks():
+    """
+    Points feature persistence at an in-memory Parquet sink and turns the
+    Redshift staging of uploads into a no-op.
+    """
+    import app.routes as routes
+    import app.utils.prediction as prediction
+    from app.utils.persistence import get_feature_writer
+
+    writer = get_feature_writer()
+    if writer is not None:
+        writer.write_fn = _parquet_sink
+    prediction.save_dataframe_to_postgres = _parquet_sink
+    routes.handle_csv_upload = _skip_staging
+    routes.handle_columnar_upload = _skip_staging
+
+
+@contextmanager
+def scratch_dir():
+    """
+    Runs the block from a temporary working directory, so the app's
+    relative uploads/ and jobs/ paths do not touch the repo.
+    """
+    cwd, tmp = os.getcwd(), tempfile.mkdtemp(prefix="lead-bench-")
+    os.chdir(tmp)
+    try:
+        yield tmp
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
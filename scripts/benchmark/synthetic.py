@@ -0,0 +1,84 @@
+# scripts/benchmark/synthetic.py
+"""
+Synthetic leads shaped like production traffic: columns and types come from
+lead_data_schema.txt, categorical frequencies, numeric distributions and
+null rates from the sample upload.
+"""
+
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from src.ml.data_loader.schema import ID_COLUMNS, SCHEMA_PATH, read_schema
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SAMPLE_CSV = os.path.join(REPO_ROOT, "uploads", "Lead_Scoring.csv")
+TARGET = "Converted"
+
+
+def build_profile(schema: list, sample: pd.DataFrame) -> dict:
+    """
+    Per-column generator spec from the sample:
+    - "id": ID_COLUMNS -> fresh UUIDs (text) or a counter (int)
+    - "categorical": observed values with their frequencies
+    - "numeric": the observed distribution (interpolated quantiles)
+    plus the observed null rate. All-empty padding rows are ignored.
+    """
+    sample = sample.dropna(how="all")
+    profile = {}
+    for col, kind in schema:
+        if col == TARGET:
+            continue
+        values = sample[col] if col in sample else pd.Series(dtype=object)
+        observed = values.dropna()
+        spec = {"kind": kind, "null_rate": float(values.isna().mean()) if len(values) else 0.0}
+        if col in ID_COLUMNS:
+            spec["gen"] = "id"
+            spec["start"] = int(observed.max()) + 1 if kind == "int" and len(observed) else 0
+        elif kind == "text":
+            freq = observed.astype(str).value_counts(normalize=True)
+            spec.update(gen="categorical", values=freq.index.to_numpy(dtype=object), p=freq.to_numpy())
+        else:
+            spec.update(gen="numeric", values=np.sort(observed.to_numpy(dtype=np.float64)))
+        profile[col] = spec
+    return profile
+
+
+def load_profile(schema_path: str = SCHEMA_PATH, sample_csv: str = SAMPLE_CSV) -> dict:
+    return build_profile(read_schema(schema_path), pd.read_csv(sample_csv))
+
+
+def synthetic_leads(profile: dict, n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Draws `n` leads. Ids are fresh per seed, so the prediction cache does
+    not flatter the numbers.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col, spec in profile.items():
+        if spec["gen"] == "id":
+            if spec["kind"] == "int":
+                start = spec["start"] + seed * 10_000_000
+                values = np.arange(start, start + n, dtype=np.int64)
+            else:
+                raw = rng.bytes(16 * n)
+                values = np.array([str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, 16 * n, 16)],
+                                  dtype=object)
+        elif spec["gen"] == "categorical" and len(spec["values"]):
+            values = rng.choice(spec["values"], size=n, p=spec["p"])
+        elif spec["gen"] == "numeric" and len(spec["values"]):
+            # Inverse-CDF draw: smooth values within the observed range
+            values = np.quantile(spec["values"], rng.random(n))
+            if spec["kind"] == "int":
+                values = np.round(values)
+        else:
+            values = np.full(n, np.nan, dtype=object if spec["kind"] == "text" else np.float64)
+
+        nulls = rng.random(n) < spec["null_rate"]
+        if nulls.any():
+            values = values.astype(object if spec["kind"] == "text" else np.float64)
+            values[nulls] = np.nan
+        data[col] = values
+    return pd.DataFrame(data)
@@ -0,0 +1,85 @@
+# scripts/check_coalescer.py
+"""
+Regression check for micro-batched /predict (PREDICT_COALESCE=1): a JSON
+array posted to /predict gets a 400, and the coalescer keeps serving valid
+leads afterwards, including after a batch that fails while being grouped.
+
+    python scripts/check_coalescer.py
+    python scripts/check_coalescer.py --model src/ml/model_objects/LogisticRegression_model.pkl
+
+Exits 1 on a failed check.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import Future
+
+os.environ["PREDICT_COALESCE"] = "1"
+os.environ.setdefault("MODEL_POLL_INTERVAL_S", "0")
+
+import joblib
+import pandas as pd
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+from app import create_app
+from app.utils.batching import get_coalescer
+from app.utils.prediction import holder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", default=os.path.join(REPO_ROOT, "models", "full_pipeline.pkl"))
+    parser.add_argument("--model", default=os.path.join(REPO_ROOT, "src", "ml", "model_objects", "LogisticRegression_model.pkl"))
+    parser.add_argument("--csv", default=os.path.join(REPO_ROOT, "uploads", "Lead_Scoring.csv"))
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="slowest acceptable /predict")
+    args = parser.parse_args()
+
+    holder.set_models(joblib.load(args.pipeline), joblib.load(args.model))
+    lead = json.loads(pd.read_csv(args.csv, nrows=1).drop(columns=["Converted"], errors="ignore")
+                      .to_json(orient="records"))[0]
+    client = create_app().test_client()
+    failures = []
+
+    def predict_ok(label: str):
+        t0 = time.perf_counter()
+        r = client.post("/predict", json=lead)
+        elapsed = time.perf_counter() - t0
+        proba = (r.get_json() or {}).get("conversion_probability")
+        print(f"[INFO] {label}: {r.status_code} {r.get_json()} in {elapsed:.2f}s")
+        if r.status_code != 200 or not isinstance(proba, float) or elapsed > args.max_seconds:
+            failures.append(f"{label}: valid lead not scored")
+
+    # 1) an array body is refused up front, and a valid lead still scores
+    r = client.post("/predict", json=[lead])
+    print(f"[INFO] array body: {r.status_code} {r.get_json()}")
+    if r.status_code != 400:
+        failures.append(f"array body returned {r.status_code}, expected 400")
+    predict_ok("after array body")
+
+    # 2) a batch that fails while being grouped (bypassing submit's check)
+    #    fails only its own caller; the worker thread keeps running
+    coalescer = get_coalescer()
+    fut = Future()
+    coalescer._queue.put(([lead], fut))
+    try:
+        fut.result(timeout=args.max_seconds)
+        failures.append("unhashable record did not fail")
+    except TypeError as e:
+        print(f"[INFO] bad batch failed its caller: {e}")
+    except Exception as e:
+        failures.append(f"bad batch: {type(e).__name__}: {e}")
+    predict_ok("after failed batch")
+
+    if failures:
+        print("❌ " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Coalescer rejects arrays and survives failed batches")
+
+
+if __name__ == "__main__":
+    main()
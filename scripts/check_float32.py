@@ -0,0 +1,63 @@
+# scripts/check_float32.py
+"""
+Parity and speed of float32 inference (INFERENCE_FLOAT32=1) for a fitted
+pipeline + model on a CSV of leads.
+
+    python scripts/check_float32.py --model src/ml/model_objects/LogisticRegression_model.pkl
+    python scripts/check_float32.py --pipeline models/full_pipeline.pkl --csv uploads/Lead_Scoring.csv --tolerance 1e-4
+
+Exits 1 when probabilities differ by more than --tolerance.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import joblib
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.ml.inference.precision import to_float32_pipeline, to_float32_model, parity_check, parity_frame
+
+
+def timed(preprocessor, model, df, chunk: int) -> tuple:
+    t0 = time.perf_counter()
+    nbytes = 0
+    for i in range(0, len(df), chunk):
+        X = preprocessor.transform(df.iloc[i:i + chunk])
+        nbytes += X.nbytes
+        model.predict_proba(X)
+    return time.perf_counter() - t0, nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", default="models/full_pipeline.pkl")
+    parser.add_argument("--model", default="src/ml/model_objects/LogisticRegression_model.pkl")
+    parser.add_argument("--csv", default="uploads/Lead_Scoring.csv")
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("FLOAT32_TOLERANCE", "1e-4")))
+    parser.add_argument("--chunk", type=int, default=5000)
+    args = parser.parse_args()
+
+    pipeline, model = joblib.load(args.pipeline), joblib.load(args.model)
+    pipe32, model32 = to_float32_pipeline(pipeline), to_float32_model(model)
+    df = pd.read_csv(args.csv).drop(columns=["Converted"], errors="ignore").dropna(how="all")
+
+    for name, frame in (("csv", df), ("synthetic", parity_frame(pipeline, n=2000))):
+        diff = parity_check((pipeline, model), (pipe32, model32), frame)
+        print(f"[INFO] {name:10} rows={len(frame):>7}  max |Δp| = {diff:.2e}")
+        if diff > args.tolerance:
+            print(f"❌ Exceeds tolerance {args.tolerance:.0e}")
+            sys.exit(1)
+
+    bench = parity_frame(pipeline, n=max(len(df), 20000))
+    t64, b64 = timed(pipeline, model, bench, args.chunk)
+    t32, b32 = timed(pipe32, model32, bench, args.chunk)
+    print(f"[⏱️] float64 {t64:.2f}s, {b64 / 1e6:.1f} MB of preprocessed features")
+    print(f"[⏱️] float32 {t32:.2f}s, {b32 / 1e6:.1f} MB ({t64 / t32:.2f}x faster)")
+    print(f"✅ float32 within {args.tolerance:.0e}")
+
+
+if __name__ == "__main__":
+    main()
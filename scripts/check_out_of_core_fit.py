@@ -0,0 +1,193 @@
+# scripts/check_out_of_core_fit.py
+"""
+Out-of-core (chunked, OUT_OF_CORE_FIT=1) vs in-memory preprocessing fit on
+a leads CSV: fitted-state differences, feature parity, sketched-median rank
+error and peak memory of each fit. With --full, also the peak RSS of
+run_pipeline's training path in each mode (load, fit, transform, feature
+selection), each in a fresh process. Both fits and both training paths drop
+the id columns, as the out-of-core path does (pipeline_runner.training_chunks).
+
+    python scripts/check_out_of_core_fit.py --rows 500000 --chunk-rows 50000 --full
+    python scripts/check_out_of_core_fit.py --csv uploads/Lead_Scoring.csv --chunk-rows 1000
+
+Exits 1 when the streamed fit is outside the tolerances documented in
+src/ml/pipeline/streaming_fit.py.
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+import tracemalloc
+
+import json
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.ml.data_loader.schema import ID_COLUMNS, compact_frame
+from src.ml.pipeline.preprocessing import clean_columns, feature_types, get_full_pipeline
+from src.ml.pipeline.streaming_fit import (
+    MEDIAN_RANK_TOLERANCE, MOMENT_TOLERANCE, SKETCHED_MOMENT_TOLERANCE,
+    fit_differences, fit_out_of_core, fit_transform_out_of_core,
+)
+
+
+def prepared(df: pd.DataFrame, typed: bool, drop: tuple = ()) -> pd.DataFrame:
+    # Same cleaning as run_pipeline, per chunk for the streamed fit
+    df.columns = df.columns.str.lower()
+    df = clean_columns(df).drop(columns=["converted", *drop], errors="ignore")
+    return compact_frame(df) if typed else df
+
+
+# Both fits use CSR output: the fitted statistics are the same either way
+def fit_in_memory(path: str, typed: bool, drop: tuple):
+    X = prepared(pd.read_csv(path), typed, drop)
+    pipeline = get_full_pipeline(*feature_types(X), sparse=True)
+    return pipeline.fit(X)
+
+
+def fit_streamed(path: str, typed: bool, drop: tuple, chunk_rows: int):
+    chunks = (prepared(chunk, typed, drop) for chunk in pd.read_csv(path, chunksize=chunk_rows))
+    first = next(chunks)
+    pipeline = get_full_pipeline(*feature_types(first), sparse=True)
+    chunks = (c for group in ([first], chunks) for c in group)
+    return fit_out_of_core(pipeline, chunks)
+
+
+def target(df: pd.DataFrame) -> pd.Series:
+    return df["Converted"].fillna(0).astype(int).reset_index(drop=True)
+
+
+def training_path(mode: str, path: str, typed: bool, drop: tuple, chunk_rows: int) -> dict:
+    """
+    run_pipeline's steps up to feature selection (no database: the CSV
+    stands in for lead_data). In-memory uses CSR output too, its cheapest
+    setting, and the same columns as the out-of-core path.
+    """
+    from src.ml.pipeline.feature_selection import apply_feature_selection
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    t0 = time.perf_counter()
+    if mode == "in-memory":
+        df = pd.read_csv(path)
+        y = target(df)
+        X = prepared(df, typed, drop)
+        del df
+        Xt = get_full_pipeline(*feature_types(X), sparse=True).fit_transform(X, y)
+    else:
+        def chunks():
+            for chunk in pd.read_csv(path, chunksize=chunk_rows):
+                yield prepared(chunk.copy(), typed, drop), target(chunk)
+        _, Xt, y, _, _ = fit_transform_out_of_core(chunks)
+    apply_feature_selection(Xt, y)
+    return {"seconds": time.perf_counter() - t0, "baseline_mb": before,
+            "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "nnz": int(Xt.nnz)}
+
+
+def measure_in_subprocess(mode: str, path: str, typed: bool, drop: tuple, chunk_rows: int) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--measure", mode, "--csv", path,
+           "--chunk-rows", str(chunk_rows)] + ([] if typed else ["--untyped"]) + ([] if drop else ["--keep-ids"])
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def traced(fn, *args) -> tuple:
+    """(result, peak MB allocated, seconds)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak / 1e6, seconds
+
+
+def median_rank_errors(path: str, typed: bool, drop: tuple, stats) -> dict:
+    """{column: |rank - 0.5|} of the streamed median, for sketched columns."""
+    inexact = [col for col, sketch in zip(stats.numeric, stats.sketches) if not sketch.exact]
+    if not inexact:
+        return {}
+    X = prepared(pd.read_csv(path), typed, drop)
+    errors = {}
+    for col, median in zip(stats.numeric, stats.medians()):
+        if col in inexact:
+            values = X[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            below, at_most = (values < median).mean(), (values <= median).mean()
+            errors[col] = 0.0 if below <= 0.5 <= at_most else float(min(abs(below - 0.5), abs(at_most - 0.5)))
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=None, help="leads CSV (default: synthetic leads)")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--untyped", action="store_true", help="skip compact dtypes (TYPED_LOAD=0)")
+    parser.add_argument("--keep-ids", action="store_true",
+                        help="keep the id columns (one-hot ids make either fit hold one category per row)")
+    parser.add_argument("--full", action="store_true",
+                        help="also compare peak RSS of the whole training path (fresh process per mode)")
+    parser.add_argument("--measure", choices=["in-memory", "out-of-core"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    typed = not args.untyped
+    drop = () if args.keep_ids else tuple(c.lower() for c in ID_COLUMNS)
+    if args.measure:
+        print(json.dumps(training_path(args.measure, args.csv, typed, drop, args.chunk_rows)))
+        return
+
+    path, tmp = args.csv, None
+    if path is None:
+        from scripts.benchmark.synthetic import load_profile, synthetic_leads
+        tmp = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+        leads = synthetic_leads(load_profile(), args.rows, seed=0)
+        leads["Converted"] = (np.random.default_rng(0).random(len(leads)) < 0.4).astype(int)
+        leads.to_csv(tmp.name, index=False)
+        del leads
+        path = tmp.name
+    try:
+        runs = {mode: measure_in_subprocess(mode, path, typed, drop, args.chunk_rows)
+                for mode in ("in-memory", "out-of-core")} if args.full else {}
+        reference, ref_mb, ref_s = traced(fit_in_memory, path, typed, drop)
+        (streamed, stats), ooc_mb, ooc_s = traced(fit_streamed, path, typed, drop, args.chunk_rows)
+        diff = fit_differences(reference, streamed)
+        rank_errors = median_rank_errors(path, typed, drop, stats)
+        head = prepared(pd.read_csv(path, nrows=5000), typed, drop)
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    feature_diff = float(abs(reference.transform(head) - streamed.transform(head)).max())
+    print(f"[INFO] {stats.n_rows} rows, chunks of {args.chunk_rows}, sketches hold {stats.sketch_items()} values")
+    print(f"[⏱️] in-memory   {ref_s:7.2f}s, peak {ref_mb:8.1f} MB allocated")
+    print(f"[⏱️] out-of-core {ooc_s:7.2f}s, peak {ooc_mb:8.1f} MB allocated")
+    print(f"[INFO] structure equal: {diff['structure_equal']}, max |Δ median| {diff['median_abs']:.3g}, "
+          f"max rel Δ mean {diff['mean_rel']:.3g}, scale {diff['scale_rel']:.3g}, max |Δ feature| {feature_diff:.3g}")
+    if rank_errors:
+        print(f"[INFO] sketched median rank error: " + ", ".join(f"{c} {e:.4f}" for c, e in rank_errors.items()))
+    for mode, run in runs.items():
+        print(f"[⏱️] training path, {mode:<11} {run['seconds']:7.2f}s, peak RSS {run['peak_mb']:8.1f} MB "
+              f"(imports {run['baseline_mb']:.1f} MB), {run['nnz']} stored features")
+
+    failures = []
+    if not diff["structure_equal"]:
+        failures.append("columns, categories or most-frequent values differ")
+    if any(e > MEDIAN_RANK_TOLERANCE for e in rank_errors.values()):
+        failures.append(f"median rank error above {MEDIAN_RANK_TOLERANCE}")
+    moment_tolerance = SKETCHED_MOMENT_TOLERANCE if rank_errors else MOMENT_TOLERANCE
+    if max(diff["mean_rel"], diff["scale_rel"]) > moment_tolerance:
+        failures.append(f"scaler statistics differ by more than {moment_tolerance}")
+    if not rank_errors and diff["median_abs"] > 0:
+        failures.append("exactly counted medians differ")
+    if failures:
+        print("❌ " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Out-of-core fit within tolerance")
+
+
+if __name__ == "__main__":
+    main()
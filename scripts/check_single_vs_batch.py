@@ -0,0 +1,76 @@
+# scripts/check_single_vs_batch.py
+"""
+Regression check: /predict scores a lead the same way whether it goes
+through the single-record path (predict_lead, compiled scorer or pandas
+fallback) or the batch path (score_frame, used when PREDICT_COALESCE=1),
+including leads whose numeric fields arrive as strings ("5", "1532").
+
+    python scripts/check_single_vs_batch.py
+    python scripts/check_single_vs_batch.py --model src/ml/model_objects/LogisticRegression_model.pkl
+
+Exits 1 on a failed check.
+"""
+
+import os
+import sys
+import json
+import argparse
+import warnings
+
+os.environ["PREDICTION_CACHE_SIZE"] = "0"
+os.environ.setdefault("MODEL_POLL_INTERVAL_S", "0")
+# The committed model pickles were fitted on a DataFrame; serving passes arrays
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+import joblib
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+from app.utils.prediction import holder, predict_lead, score_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", default=os.path.join(REPO_ROOT, "models", "full_pipeline.pkl"))
+    parser.add_argument("--model", default=os.path.join(REPO_ROOT, "src", "ml", "model_objects", "LogisticRegression_model.pkl"))
+    parser.add_argument("--csv", default=os.path.join(REPO_ROOT, "uploads", "Lead_Scoring.csv"))
+    parser.add_argument("--rows", type=int, default=11)
+    parser.add_argument("--tolerance", type=float, default=1e-12)
+    args = parser.parse_args()
+
+    holder.set_models(joblib.load(args.pipeline), joblib.load(args.model))
+    live = holder.get()
+    df = pd.read_csv(args.csv, nrows=args.rows).drop(columns=["Converted"], errors="ignore")
+    leads = json.loads(df.to_json(orient="records"))
+    numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    # Every non-null number sent as a string, the way some form encoders post it
+    as_strings = [{k: (str(v) if k in numeric and v is not None else v) for k, v in lead.items()}
+                  for lead in leads]
+
+    failures = []
+    for label, records in (("numbers", leads), ("numeric strings", as_strings)):
+        _, batch = score_frame(pd.DataFrame(records), live)
+        for path, snapshot in (("compiled", live), ("pandas", live._replace(scorer=None))):
+            holder._live = snapshot
+            single = [predict_lead(r) for r in records]
+            errors = [s for s in single if isinstance(s, dict)]
+            if errors:
+                failures.append(f"{label}/{path}: {errors[0]}")
+                continue
+            diff = float(np.nanmax(np.abs(np.asarray(single, dtype=float) - batch)))
+            print(f"[INFO] {label:<15} {path:<8} max |single - batch| {diff:.2e} over {len(records)} leads")
+            if diff > args.tolerance:
+                failures.append(f"{label}/{path}: single and batch differ by {diff:.2e}")
+        holder._live = live
+
+    if failures:
+        print("❌ " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Single and batch scoring agree")
+
+
+if __name__ == "__main__":
+    main()
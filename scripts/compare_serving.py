@@ -0,0 +1,95 @@
+# scripts/compare_serving.py
+"""
+Side-by-side /predict throughput for the Flask and ASGI entry points.
+
+Start both servers first, e.g.
+    python src/app/main.py                       # Flask on :5001
+    uvicorn app.asgi:app --app-dir src --port 8000 --workers 1
+then run
+    python scripts/compare_serving.py --requests 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+SAMPLE_CSV = "uploads/test_Lead_Scoring.csv"
+
+
+def load_payloads(path: str) -> list:
+    df = pd.read_csv(path).drop(columns=["Converted"], errors="ignore")
+    # Round-trip through JSON so NaN becomes null like a real client payload
+    return json.loads(df.to_json(orient="records"))
+
+
+async def drive(url: str, payloads: list, n_requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(payloads[i % len(payloads)])
+
+    async def worker(client):
+        nonlocal errors
+        while True:
+            try:
+                payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(f"{url}/predict", json=payload)
+                if r.status_code != 200 or "error" in r.json():
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+    lat_ms = np.array(latencies) * 1000.0
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "throughput_rps": n_requests / wall,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flask-url", default="http://localhost:5001")
+    parser.add_argument("--asgi-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--payloads", default=SAMPLE_CSV)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.payloads)
+    results = {}
+    for name, url in (("flask", args.flask_url), ("asgi", args.asgi_url)):
+        print(f"[INFO] Driving {name} at {url} ({args.requests} requests, concurrency={args.concurrency})")
+        results[name] = asyncio.run(drive(url, payloads, args.requests, args.concurrency))
+
+    print(f"\n{'':8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:8}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}")
+    if results["flask"]["throughput_rps"] > 0:
+        print(f"\n[⏱️] ASGI / Flask throughput: "
+              f"{results['asgi']['throughput_rps'] / results['flask']['throughput_rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# scripts/worker_memory.py
+"""
+Per-worker memory for a running gunicorn (pre-fork) deployment.
+
+    python scripts/worker_memory.py                # finds the gunicorn master
+    python scripts/worker_memory.py --pid 12345
+
+RSS counts shared pages in every worker; USS is the memory a worker owns
+privately (what one more worker costs) and PSS splits shared pages fairly.
+"""
+
+import os
+import sys
+import argparse
+
+import psutil
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.app.utils.prefork import process_memory
+
+
+def find_master() -> int:
+    for proc in psutil.process_iter(["pid", "ppid", "cmdline"]):
+        cmd = " ".join(proc.info["cmdline"] or [])
+        if "gunicorn" in cmd and "worker_memory.py" not in cmd:
+            try:
+                parent = psutil.Process(proc.info["ppid"])
+                if "gunicorn" in " ".join(parent.cmdline()):
+                    continue  # a worker; keep looking for the master
+            except psutil.Error:
+                pass
+            return proc.info["pid"]
+    raise SystemExit("❌ No gunicorn master found; pass --pid")
+
+
+def mb(value) -> str:
+    return f"{value / 2**20:>10.1f}" if value is not None else f"{'n/a':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pid", type=int, help="gunicorn master pid")
+    args = parser.parse_args()
+
+    master = psutil.Process(args.pid or find_master())
+    rows = [("master", process_memory(master.pid))]
+    rows += [("worker", process_memory(child.pid)) for child in master.children()]
+
+    print(f"{'role':8}{'pid':>8}{'RSS MB':>10}{'USS MB':>10}{'PSS MB':>10}{'shared MB':>10}")
+    for role, m in rows:
+        print(f"{role:8}{m['pid']:>8}{mb(m['rss'])}{mb(m['uss'])}{mb(m['pss'])}{mb(m['shared'])}")
+
+    workers = [m for role, m in rows if role == "worker"]
+    if workers and all(m["uss"] is not None for m in workers):
+        total_pss = sum(m["pss"] for _, m in rows)
+        mean_uss = sum(m["uss"] for m in workers) / len(workers)
+        naive = sum(m["rss"] for _, m in rows)
+        print(f"\n[INFO] {len(workers)} workers: total PSS {total_pss / 2**20:.1f} MB "
+              f"(sum of RSS would suggest {naive / 2**20:.1f} MB)")
+        print(f"[INFO] Each additional worker costs ~{mean_uss / 2**20:.1f} MB (mean USS)")
+
+
+if __name__ == "__main__":
+    main()
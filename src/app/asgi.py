@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# src/app/asgi.py
+
+import os
+import sys
+import time
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+# ────────────────────────────────────────────────────────────────
+# 1) Make sure `src/` is on Python’s import path
+# ────────────────────────────────────────────────────────────────
+here = os.path.dirname(__file__)              # …/lead_scoring_project/src/app
+project_src = os.path.abspath(os.path.join(here, ".."))  # …/lead_scoring_project/src
+if project_src not in sys.path:
+    sys.path.insert(0, project_src)
+
+# ────────────────────────────────────────────────────────────────
+# 2) Now do absolute imports
+# ────────────────────────────────────────────────────────────────
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from werkzeug.utils import secure_filename
+
+from app.routes import allowed_file
+from app.utils.prediction import (
+    predict_lead, predict_batch, score_frame_cached, score_leads, score_result,
+    save_preprocessed_features, holder, prediction_cache, model_version,
+    score_upload, rejection_reasons,
+)
+from app.utils.payloads import PayloadError, frame_from_payload, parse_batch_options
+from app.utils.batching import get_coalescer
+from app.utils.persistence import get_feature_writer, persistence_stats
+from app.utils.prefork import process_memory
+from app.utils.ranking import RankingError, parse_top_k, rank_chunks
+from app.utils.serialization import ResponseFormatError, response_format, predictions_json
+from app.utils.metrics import CONTENT_TYPE, stage, observe_request, render_metrics
+from app.utils.jobs import (
+    QueueFullError, SUCCEEDED, get_job_store, ensure_job_runner, new_job_path, submit_job,
+    job_status, discard_job_dir, iter_result_csv,
+)
+from app.utils.upload import (
+    UploadSchemaError, upload_format, handle_csv_upload, iter_csv_chunks, stream_scored_chunks,
+    open_arrow_table, input_schema, check_upload_schema, table_to_frame,
+    iter_table_chunks, handle_columnar_upload,
+)
+
+# CPU-bound scoring runs here; persistence and registry I/O use asyncio.to_thread
+SCORING_THREADS = int(os.getenv("ASGI_SCORING_THREADS", str(os.cpu_count() or 4)))
+scoring_pool = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix="scoring")
+
+
+async def run_cpu(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(scoring_pool, fn, *args)
+
+
+def staged(name: str, fn):
+    """
+    Wraps fn so the time it runs (not the time queued for a thread) is
+    recorded as stage `name`.
+    """
+    def run(*args):
+        with stage(name, model_version()):
+            return fn(*args)
+    return run
+
+
+class RequestMetrics:
+    """
+    Pure ASGI middleware recording request counts and end-to-end latency
+    (including streamed bodies) per route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            observe_request(endpoint, scope["method"], status[0],
+                            time.perf_counter() - start, model_version())
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Warm the model holder off the event loop; failures surface per request.
+    try:
+        await asyncio.to_thread(holder.get)
+    except Exception as e:
+        print(f"⚠️ Model warm-up failed: {e}")
+    runner = await asyncio.to_thread(ensure_job_runner)
+    yield
+    if runner is not None:
+        runner.stop()
+    scoring_pool.shutdown(wait=False)
+    # Flush queued feature frames before the worker exits
+    writer = get_feature_writer()
+    if writer is not None:
+        await asyncio.to_thread(writer.close)
+
+
+app = FastAPI(title="Lead Scoring API", lifespan=lifespan)
+app.add_middleware(RequestMetrics)
+
+
+def wants_stream(request: Request) -> bool:
+    if request.query_params.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+@app.post("/predict")
+async def predict(request: Request):
+    """
+    Accepts JSON payload with lead features and returns conversion probability.
+    """
+    try:
+        with stage("parse", model_version()):
+            data = await request.json()
+    except ValueError:
+        data = None
+    if not data:
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "Expected a JSON object of lead features (use /predict/batch for arrays)"},
+                            status_code=400)
+    try:
+        coalescer = get_coalescer()
+        if coalescer is not None:
+            # submit() just waits on the batch; keep it off the scoring pool
+            proba = await asyncio.to_thread(coalescer.submit, data)
+        else:
+            proba = await run_cpu(predict_lead, data)
+        if proba != proba:
+            # NaN: the batch rejected this lead; score it alone for the reason
+            proba = await run_cpu(predict_lead, data)
+        with stage("serialization", model_version()):
+            return JSONResponse({"conversion_probability": proba})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.post("/predict/batch")
+async def predict_bulk(request: Request):
+    """
+    Scores a JSON array (or columnar JSON) of leads in one pass and returns
+    conversion probabilities; optional threshold labels and persistence.
+    """
+    try:
+        with stage("parse", model_version()):
+            payload = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    try:
+        df = await run_cpu(staged("parse", frame_from_payload), payload)
+        threshold, save = parse_batch_options(payload, request.query_params)
+    except PayloadError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    try:
+        if not save:
+            result = await run_cpu(score_leads, df, threshold)
+        else:
+            # Score on the pool, persist without holding a scoring thread
+            live = await asyncio.to_thread(holder.get)
+            X_proc, proba = await run_cpu(score_frame_cached, df, live)
+            await asyncio.to_thread(save_preprocessed_features, X_proc)
+            reasons = await run_cpu(rejection_reasons, df, np.isnan(proba), live)
+            result = score_result(live, proba, threshold, reasons)
+        return await run_cpu(staged("serialization", JSONResponse), result)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.get("/model")
+async def model_info():
+    """
+    Reports which preprocessor/model versions are currently live.
+    """
+    return holder.info()
+
+
+@app.get("/predict/stats")
+async def predict_stats():
+    """
+    Returns prediction-cache, feature-persistence and worker-memory
+    counters, plus micro-batching counters when coalescing is enabled.
+    """
+    coalescer = get_coalescer()
+    stats = {"coalescing": coalescer is not None}
+    if coalescer is not None:
+        stats.update(coalescer.stats())
+    stats["cache"] = prediction_cache.stats()
+    stats["persistence"] = persistence_stats()
+    stats["memory"] = process_memory()
+    return stats
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text exposition (see routes.metrics).
+    """
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+async def save_upload(upload, path: str, block_size: int = 1 << 20):
+    with open(path, "wb") as out:
+        while True:
+            block = await upload.read(block_size)
+            if not block:
+                break
+            await asyncio.to_thread(out.write, block)
+
+
+@app.post("/upload")
+async def upload(request: Request):
+    """
+    Accepts a CSV, Parquet or Arrow IPC file, stores it, runs batch
+    prediction, and returns results (?format=records|columns|compact,
+    ?top_k=N for the N best leads only).
+    """
+    try:
+        out_fmt = response_format(request.query_params.get("format"))
+        top_k = parse_top_k(request.query_params.get("top_k"))
+    except (ResponseFormatError, RankingError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    form = await request.form()
+    file = form.get("file")
+    if file is None or not hasattr(file, "filename"):
+        return JSONResponse({"error": "No file part in request"}, status_code=400)
+    if file.filename == "":
+        return JSONResponse({"error": "No selected file"}, status_code=400)
+    if not allowed_file(file.filename):
+        return JSONResponse({"error": "Unsupported file type. Use .csv, .parquet or .arrow"}, status_code=400)
+
+    filename = secure_filename(file.filename)
+    upload_path = os.path.join("uploads", filename)
+    os.makedirs("uploads", exist_ok=True)
+    await save_upload(file, upload_path)
+
+    fmt = upload_format(filename)
+    if top_k is not None:
+        return await upload_ranked(upload_path, fmt, top_k)
+    if fmt != "csv":
+        return await upload_columnar(request, upload_path, fmt, out_fmt)
+
+    if wants_stream(request):
+        return await upload_stream(upload_path)
+
+    try:
+        df = await run_cpu(staged("parse", pd.read_csv), upload_path)
+        if df.empty:
+            return JSONResponse({"error": "Uploaded file is empty."}, status_code=400)
+
+        # Save to DB
+        await asyncio.to_thread(handle_csv_upload, upload_path, "uploaded_leads")
+
+        # Get predictions, then persist features without holding a scoring thread
+        live = await asyncio.to_thread(holder.get)
+        X_proc, proba = await run_cpu(score_upload, df, live)
+        await asyncio.to_thread(save_preprocessed_features, X_proc)
+
+        body = await run_cpu(staged("serialization", predictions_json), df, out_fmt, proba)
+        return Response(body, media_type="application/json")
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def upload_stream(upload_path: str):
+    """
+    Streams NDJSON results chunk by chunk (see routes.upload_stream).
+    """
+    try:
+        chunks = iter_csv_chunks(upload_path)
+        first = await run_cpu(next, chunks, None)
+        if first is None or first.empty:
+            return JSONResponse({"error": "Uploaded file is empty."}, status_code=400)
+        await asyncio.to_thread(handle_csv_upload, upload_path, "uploaded_leads", True)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    lines = stream_scored_chunks(itertools.chain([first], chunks), predict_batch,
+                                 await asyncio.to_thread(holder.get))
+    return StreamingResponse(drain(lines), media_type="application/x-ndjson")
+
+
+async def drain(lines):
+    """
+    Pulls NDJSON lines from a blocking generator on the scoring pool.
+    """
+    while True:
+        line = await run_cpu(next, lines, None)
+        if line is None:
+            break
+        yield line
+
+
+async def upload_ranked(upload_path: str, fmt: str, top_k: int):
+    """
+    Returns only the top_k leads, merged across chunks (see routes.upload_ranked).
+    """
+    try:
+        live = await asyncio.to_thread(holder.get)
+        if fmt == "csv":
+            chunks = iter_csv_chunks(upload_path)
+            first = await run_cpu(next, chunks, None)
+            if first is None or first.empty:
+                return JSONResponse({"error": "Uploaded file is empty."}, status_code=400)
+            await asyncio.to_thread(handle_csv_upload, upload_path, "uploaded_leads", True)
+            chunks = itertools.chain([first], chunks)
+        else:
+            table = await run_cpu(staged("parse", open_arrow_table), upload_path, fmt)
+            check_upload_schema(table.schema, input_schema(live.preprocessor))
+            if table.num_rows == 0:
+                return JSONResponse({"error": "Uploaded file is empty."}, status_code=400)
+            await asyncio.to_thread(handle_columnar_upload, upload_path, fmt, table, "uploaded_leads")
+            chunks = iter_table_chunks(table)
+
+        result = await run_cpu(rank_chunks, chunks, top_k, live)
+        return await run_cpu(staged("serialization", JSONResponse), result)
+    except UploadSchemaError as e:
+        return JSONResponse({"error": f"Schema mismatch: {e}"}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def upload_columnar(request: Request, upload_path: str, fmt: str, out_fmt: str):
+    """
+    Parquet / Arrow IPC upload (see routes.upload_columnar).
+    """
+    try:
+        table = await run_cpu(staged("parse", open_arrow_table), upload_path, fmt)
+        live = await asyncio.to_thread(holder.get)
+        check_upload_schema(table.schema, input_schema(live.preprocessor))
+        if table.num_rows == 0:
+            return JSONResponse({"error": "Uploaded file is empty."}, status_code=400)
+        await asyncio.to_thread(handle_columnar_upload, upload_path, fmt, table, "uploaded_leads")
+    except UploadSchemaError as e:
+        return JSONResponse({"error": f"Schema mismatch: {e}"}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    if wants_stream(request):
+        lines = stream_scored_chunks(iter_table_chunks(table), predict_batch, live)
+        return StreamingResponse(drain(lines), media_type="application/x-ndjson")
+
+    try:
+        df = await run_cpu(staged("parse", table_to_frame), table)
+        del table
+
+        X_proc, proba = await run_cpu(score_upload, df, live)
+        await asyncio.to_thread(save_preprocessed_features, X_proc)
+
+        body = await run_cpu(staged("serialization", predictions_json), df, out_fmt, proba)
+        return Response(body, media_type="application/json")
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.post("/jobs")
+async def create_job(request: Request):
+    """
+    Queues a file for background scoring and returns its job id (see routes.create_job).
+    """
+    form = await request.form()
+    file = form.get("file")
+    if file is None or not hasattr(file, "filename"):
+        return JSONResponse({"error": "No file part in request"}, status_code=400)
+    if file.filename == "":
+        return JSONResponse({"error": "No selected file"}, status_code=400)
+    if not allowed_file(file.filename):
+        return JSONResponse({"error": "Unsupported file type. Use .csv, .parquet or .arrow"}, status_code=400)
+
+    try:
+        priority = int(request.query_params.get("priority", form.get("priority", 0)))
+    except ValueError:
+        return JSONResponse({"error": "priority must be an integer"}, status_code=400)
+
+    filename = secure_filename(file.filename)
+    input_path = new_job_path(filename)
+    await save_upload(file, input_path)
+    try:
+        job = await asyncio.to_thread(submit_job, filename, input_path, upload_format(filename), priority)
+    except QueueFullError as e:
+        discard_job_dir(input_path)
+        return JSONResponse({"error": str(e)}, status_code=429)
+
+    status = job_status(job)
+    status["status_url"] = f"/jobs/{job['id']}"
+    return JSONResponse(status, status_code=202)
+
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 50):
+    """
+    Lists the most recent jobs.
+    """
+    jobs = await asyncio.to_thread(get_job_store().list, limit)
+    return [job_status(job) for job in jobs]
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Reports a job's status and progress.
+    """
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    status = job_status(job)
+    if job["status"] == SUCCEEDED:
+        status["result_url"] = f"/jobs/{job_id}/result"
+    return status
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, format: str = "parquet"):
+    """
+    Downloads a finished job's scores as Parquet (default) or ?format=csv.
+    """
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    if job["status"] != SUCCEEDED:
+        return JSONResponse({"error": f"Job is {job['status']}", "status": job["status"]}, status_code=409)
+
+    fmt = format.lower()
+    if fmt == "parquet":
+        return FileResponse(job["result_path"], media_type="application/vnd.apache.parquet",
+                            filename=f"{job_id}.parquet")
+    if fmt == "csv":
+        return StreamingResponse(drain(iter_result_csv(job["result_path"])), media_type="text/csv",
+                                 headers={"Content-Disposition": f"attachment; filename={job_id}.csv"})
+    return JSONResponse({"error": "format must be 'parquet' or 'csv'"}, status_code=400)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # loop="auto" picks uvloop when it is installed
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("ASGI_PORT", "8000")), loop="auto")
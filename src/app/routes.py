@@ -1,17 +1,62 @@
 import os
+import time
+import itertools
 import pandas as pd
-from flask import Blueprint, request, render_template, jsonify
+from flask import Blueprint, Response, g, request, render_template, jsonify, stream_with_context, send_file
 from werkzeug.utils import secure_filename
 
-from .utils.prediction import predict_lead, predict_batch
-from .utils.upload import handle_csv_upload
+from .utils.prediction import (
+    predict_lead, predict_batch, score_leads, score_upload, save_preprocessed_features,
+    holder, prediction_cache, model_version,
+)
+from .utils.payloads import PayloadError, frame_from_payload, parse_batch_options
+from .utils.batching import get_coalescer
+from .utils.persistence import persistence_stats
+from .utils.prefork import process_memory
+from .utils.ranking import RankingError, parse_top_k, rank_chunks
+from .utils.serialization import ResponseFormatError, response_format, predictions_json
+from .utils.metrics import CONTENT_TYPE, stage, observe_request, render_metrics
+from .utils.jobs import (
+    QueueFullError, SUCCEEDED, get_job_store, ensure_job_runner, new_job_path, submit_job,
+    job_status, discard_job_dir, iter_result_csv,
+)
+from .utils.upload import (
+    UPLOAD_FORMATS, UploadSchemaError, upload_format, handle_csv_upload, iter_csv_chunks,
+    stream_scored_chunks, open_arrow_table, input_schema,
+    check_upload_schema, table_to_frame, iter_table_chunks, handle_columnar_upload,
+)
 
 bp = Blueprint("routes", __name__)
-ALLOWED_EXTENSIONS = {"csv"}
+ALLOWED_EXTENSIONS = set(UPLOAD_FORMATS)
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def wants_stream():
+    """
+    Streaming NDJSON is requested with ?stream=1 or Accept: application/x-ndjson.
+    """
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "application/x-ndjson" in request.headers.get("Accept", "")
+
+@bp.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@bp.before_request
+def start_job_runner():
+    # Runs in each worker after fork; no-op once started or with JOBS_RUNNER=off
+    ensure_job_runner()
+
+@bp.after_request
+def record_request_metrics(response):
+    # Streaming responses are timed up to the first byte
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    observe_request(endpoint, request.method, response.status_code,
+                    time.perf_counter() - g.request_start, model_version())
+    return response
+
 @bp.route("/", methods=["GET", "POST"])
 def index():
     """
@@ -24,19 +69,82 @@ def predict():
     """
     Accepts JSON payload with lead features and returns conversion probability.
     """
-    data = request.get_json()
+    with stage("parse", model_version()):
+        data = request.get_json()
     if not data:
         return jsonify({"error": "Invalid JSON"}), 400
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object of lead features (use /predict/batch for arrays)"}), 400
     try:
-        proba = predict_lead(data)
-        return jsonify({"conversion_probability": proba})
+        coalescer = get_coalescer()
+        proba = coalescer.submit(data) if coalescer is not None else predict_lead(data)
+        if proba != proba:
+            # NaN: the batch rejected this lead; score it alone for the reason
+            proba = predict_lead(data)
+        with stage("serialization", model_version()):
+            return jsonify({"conversion_probability": proba})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@bp.route("/predict/batch", methods=["POST"])
+def predict_bulk():
+    """
+    Scores a JSON array (or columnar JSON) of leads in one pass and returns
+    conversion probabilities; optional threshold labels and persistence.
+    """
+    with stage("parse", model_version()):
+        payload = request.get_json(silent=True)
+        if payload is None:
+            return jsonify({"error": "Invalid JSON"}), 400
+        try:
+            df = frame_from_payload(payload)
+            threshold, save = parse_batch_options(payload, request.args)
+        except PayloadError as e:
+            return jsonify({"error": str(e)}), 400
+    try:
+        result = score_leads(df, threshold=threshold, save=save)
+        with stage("serialization", model_version()):
+            return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/model", methods=["GET"])
+def model_info():
+    """
+    Reports which preprocessor/model versions are currently live.
+    """
+    return jsonify(holder.info())
+
+@bp.route("/predict/stats", methods=["GET"])
+def predict_stats():
+    """
+    Returns prediction-cache, feature-persistence and worker-memory
+    counters, plus micro-batching counters when coalescing is enabled.
+    """
+    coalescer = get_coalescer()
+    stats = {"coalescing": coalescer is not None}
+    if coalescer is not None:
+        stats.update(coalescer.stats())
+    stats["cache"] = prediction_cache.stats()
+    stats["persistence"] = persistence_stats()
+    stats["memory"] = process_memory()
+    return jsonify(stats)
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Prometheus text exposition: per-stage latency histograms, request
+    counts, batch sizes and the live model version (this process only).
+    """
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
 @bp.route("/upload", methods=["POST"])
 def upload():
     """
-    Accepts a CSV file, stores it, runs batch prediction, and returns results.
+    Accepts a CSV, Parquet or Arrow IPC file, stores it, runs batch
+    prediction, and returns results. ?format=records|columns|compact picks
+    the response layout (compact = ids + scores + labels); ?top_k=N returns
+    only the N highest-scoring leads.
     """
     if "file" not in request.files:
         return jsonify({"error": "No file part in request"}), 400
@@ -45,15 +153,31 @@ def upload():
     if file.filename == "":
         return jsonify({"error": "No selected file"}), 400
 
+    try:
+        out_fmt = response_format(request.args.get("format"))
+        top_k = parse_top_k(request.args.get("top_k"))
+    except (ResponseFormatError, RankingError) as e:
+        return jsonify({"error": str(e)}), 400
+
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         upload_path = os.path.join("uploads", filename)
         os.makedirs("uploads", exist_ok=True)
         file.save(upload_path)
 
+        fmt = upload_format(filename)
+        if top_k is not None:
+            return upload_ranked(upload_path, fmt, top_k)
+        if fmt != "csv":
+            return upload_columnar(upload_path, fmt, out_fmt)
+
+        if wants_stream():
+            return upload_stream(upload_path)
+
         try:
             # Read and validate CSV
-            df = pd.read_csv(upload_path)
+            with stage("parse", model_version()):
+                df = pd.read_csv(upload_path)
 
             if df.empty:
                 return jsonify({"error": "Uploaded file is empty."}), 400
@@ -62,14 +186,186 @@ def upload():
             handle_csv_upload(upload_path, table_name="uploaded_leads")
 
             # Get predictions
-            predictions = predict_batch(df)
-            df["prediction"] = predictions
-
-            # Clean up NaNs for JSON serialization
-            response_data = df.where(pd.notnull(df), None).to_dict(orient="records")
-
-            return jsonify({"predictions": response_data})
+            return scored_upload_response(df, out_fmt, holder.get())
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     else:
-        return jsonify({"error": "Unsupported file type. Only .csv allowed"}), 400
+        return jsonify({"error": "Unsupported file type. Use .csv, .parquet or .arrow"}), 400
+
+
+def scored_upload_response(df, out_fmt, live):
+    """
+    Scores an upload frame with the `live` models snapshot, queues its
+    features for persistence and writes the response body straight to
+    JSON bytes.
+    """
+    X_proc, proba = score_upload(df, live)
+    save_preprocessed_features(X_proc)
+    with stage("serialization", model_version()):
+        body = predictions_json(df, out_fmt, scores=proba)
+    return Response(body, mimetype="application/json")
+
+
+def upload_stream(upload_path):
+    """
+    Scores the saved CSV chunk by chunk and streams one JSON record per line
+    (each input row plus its "prediction"). Peak memory is bounded by
+    UPLOAD_CHUNK_ROWS regardless of file size.
+    """
+    try:
+        chunks = iter_csv_chunks(upload_path)
+        first = next(chunks, None)
+        if first is None or first.empty:
+            return jsonify({"error": "Uploaded file is empty."}), 400
+
+        # Stage the raw file without re-reading it into memory
+        handle_csv_upload(upload_path, table_name="uploaded_leads", stream=True)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    lines = stream_scored_chunks(itertools.chain([first], chunks), predict_batch, holder.get())
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+def upload_ranked(upload_path, fmt, top_k):
+    """
+    Scores the file chunk by chunk and returns only the top_k leads by
+    conversion probability (id, row number, score), merged across chunks.
+    """
+    try:
+        # One snapshot for every chunk, so a swap cannot mix versions in a ranking
+        live = holder.get()
+        if fmt == "csv":
+            chunks = iter_csv_chunks(upload_path)
+            first = next(chunks, None)
+            if first is None or first.empty:
+                return jsonify({"error": "Uploaded file is empty."}), 400
+            handle_csv_upload(upload_path, table_name="uploaded_leads", stream=True)
+            chunks = itertools.chain([first], chunks)
+        else:
+            with stage("parse", model_version()):
+                table = open_arrow_table(upload_path, fmt)
+                check_upload_schema(table.schema, input_schema(live.preprocessor))
+            if table.num_rows == 0:
+                return jsonify({"error": "Uploaded file is empty."}), 400
+            handle_columnar_upload(upload_path, fmt, table, table_name="uploaded_leads")
+            chunks = iter_table_chunks(table)
+
+        result = rank_chunks(chunks, top_k, live)
+        with stage("serialization", model_version()):
+            return jsonify(result)
+    except UploadSchemaError as e:
+        return jsonify({"error": f"Schema mismatch: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def upload_columnar(upload_path, fmt, out_fmt):
+    """
+    Parquet / Arrow IPC upload: memory-maps the file, checks its schema
+    against the live preprocessor, and scores it without a text-parsing
+    step. Honours ?stream=1 like the CSV path.
+    """
+    try:
+        # One snapshot for the schema check and every scored row
+        live = holder.get()
+        with stage("parse", model_version()):
+            table = open_arrow_table(upload_path, fmt)
+            check_upload_schema(table.schema, input_schema(live.preprocessor))
+        if table.num_rows == 0:
+            return jsonify({"error": "Uploaded file is empty."}), 400
+
+        # Save to DB
+        handle_columnar_upload(upload_path, fmt, table, table_name="uploaded_leads")
+    except UploadSchemaError as e:
+        return jsonify({"error": f"Schema mismatch: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    if wants_stream():
+        lines = stream_scored_chunks(iter_table_chunks(table), predict_batch, live)
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+    try:
+        with stage("parse", model_version()):
+            df = table_to_frame(table)
+        del table
+
+        return scored_upload_response(df, out_fmt, live)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/jobs", methods=["POST"])
+def create_job():
+    """
+    Queues a CSV, Parquet or Arrow file for background scoring and returns
+    its job id straight away (202). Optional ?priority=N (higher runs first).
+    """
+    if "file" not in request.files:
+        return jsonify({"error": "No file part in request"}), 400
+
+    file = request.files["file"]
+    if file.filename == "":
+        return jsonify({"error": "No selected file"}), 400
+    if not allowed_file(file.filename):
+        return jsonify({"error": "Unsupported file type. Use .csv, .parquet or .arrow"}), 400
+
+    try:
+        priority = int(request.values.get("priority", 0))
+    except ValueError:
+        return jsonify({"error": "priority must be an integer"}), 400
+
+    filename = secure_filename(file.filename)
+    input_path = new_job_path(filename)
+    file.save(input_path)
+    try:
+        job = submit_job(filename, input_path, upload_format(filename), priority)
+    except QueueFullError as e:
+        discard_job_dir(input_path)
+        return jsonify({"error": str(e)}), 429
+
+    status = job_status(job)
+    status["status_url"] = f"/jobs/{job['id']}"
+    return jsonify(status), 202
+
+@bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    """
+    Lists the most recent jobs (?limit=, default 50).
+    """
+    limit = request.args.get("limit", 50, type=int)
+    return jsonify([job_status(job) for job in get_job_store().list(limit)])
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Reports a job's status and progress (rows scored so far).
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    status = job_status(job)
+    if job["status"] == SUCCEEDED:
+        status["result_url"] = f"/jobs/{job_id}/result"
+    return jsonify(status)
+
+@bp.route("/jobs/<job_id>/result", methods=["GET"])
+def get_job_result(job_id):
+    """
+    Downloads a finished job's scores as Parquet (default) or ?format=csv.
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job["status"] != SUCCEEDED:
+        return jsonify({"error": f"Job is {job['status']}", "status": job["status"]}), 409
+
+    fmt = request.args.get("format", "parquet").lower()
+    if fmt == "parquet":
+        return send_file(os.path.abspath(job["result_path"]), mimetype="application/vnd.apache.parquet",
+                         as_attachment=True, download_name=f"{job_id}.parquet")
+    if fmt == "csv":
+        return Response(iter_result_csv(job["result_path"]), mimetype="text/csv",
+                        headers={"Content-Disposition": f"attachment; filename={job_id}.csv"})
+    return jsonify({"error": "format must be 'parquet' or 'csv'"}), 400
@@ -0,0 +1,168 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# ─────────────────────────────────────────────
+# Config (opt-in via environment)
+# ─────────────────────────────────────────────
+COALESCE_ENABLED = os.getenv("PREDICT_COALESCE", "0") == "1"
+COALESCE_MAX_WAIT_MS = float(os.getenv("PREDICT_COALESCE_WAIT_MS", "2"))
+COALESCE_MAX_BATCH = int(os.getenv("PREDICT_COALESCE_MAX_BATCH", "64"))
+COALESCE_TIMEOUT_S = float(os.getenv("PREDICT_COALESCE_TIMEOUT_S", "30"))
+
+
+class RequestCoalescer:
+    """
+    Collects concurrent single-lead requests for up to `max_wait_ms`
+    (or `max_batch_size` rows), scores them as one frame with `score_fn`
+    and hands each waiting caller its own probability.
+
+    `score_fn` takes a DataFrame of raw leads and returns one probability
+    per row (see `prediction.predict_proba_batch`).
+    """
+
+    def __init__(self, score_fn: Callable[[pd.DataFrame], np.ndarray],
+                 max_wait_ms: float = COALESCE_MAX_WAIT_MS,
+                 max_batch_size: int = COALESCE_MAX_BATCH):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.score_fn = score_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._batches = 0
+        self._fallbacks = 0
+
+    # ─────────────────────────────────────────────
+    # Public API
+    # ─────────────────────────────────────────────
+    def submit(self, record: dict, timeout: Optional[float] = COALESCE_TIMEOUT_S) -> Union[float, dict]:
+        """
+        Queue one lead and block until its batch is scored.
+        Returns the probability, or {"error": ...} like `predict_lead`.
+        Raises TypeError for anything but a dict of features.
+        """
+        if not isinstance(record, dict):
+            raise TypeError(f"Expected a JSON object of lead features, got {type(record).__name__}")
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((record, fut))
+        try:
+            return fut.result(timeout=timeout)
+        except Exception as e:
+            return {"error": str(e)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = dict(sorted(self._batch_sizes.items()))
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "mean_batch_size": (self._requests / self._batches) if self._batches else 0.0,
+                "max_batch_size_seen": max(sizes) if sizes else 0,
+                "batch_size_counts": sizes,
+                "row_fallbacks": self._fallbacks,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_batch_size": self.max_batch_size,
+            }
+
+    # ─────────────────────────────────────────────
+    # Background worker
+    # ─────────────────────────────────────────────
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="predict-coalescer", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self._lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._batch_sizes[len(batch)] += 1
+
+            try:
+                # Requests with different key sets are scored separately so a
+                # missing column still errors instead of being imputed.
+                groups = {}
+                for record, fut in batch:
+                    groups.setdefault(frozenset(record), []).append((record, fut))
+                for items in groups.values():
+                    self._score(items)
+            except Exception as e:
+                # The worker must survive any batch: fail only its waiting callers
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _score(self, items: list):
+        try:
+            proba = [float(p) for p in self.score_fn(pd.DataFrame([r for r, _ in items]))]
+            if len(proba) != len(items):
+                raise ValueError(f"Expected {len(items)} scores, got {len(proba)}")
+            for (_, fut), p in zip(items, proba):
+                fut.set_result(p)
+            return
+        except Exception as e:
+            if len(items) == 1:
+                items[0][1].set_result({"error": str(e)})
+                return
+            with self._lock:
+                self._fallbacks += len(items)
+
+        # One bad lead must not fail its neighbours: score row by row.
+        for record, fut in items:
+            try:
+                fut.set_result(float(self.score_fn(pd.DataFrame([record]))[0]))
+            except Exception as e:
+                fut.set_result({"error": str(e)})
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer() -> Optional[RequestCoalescer]:
+    """
+    Returns the process-wide coalescer, or None unless PREDICT_COALESCE=1.
+    """
+    global _coalescer
+    if not COALESCE_ENABLED:
+        return None
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                from .prediction import predict_proba_batch
+                _coalescer = RequestCoalescer(predict_proba_batch)
+    return _coalescer
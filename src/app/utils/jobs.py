@@ -0,0 +1,412 @@
+import os
+import uuid
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .prediction import holder, score_frame_cached, save_preprocessed_features, rejection_reasons
+from .serialization import id_column
+from .upload import (
+    UPLOAD_CHUNK_ROWS, iter_csv_chunks, handle_csv_upload, open_arrow_table, input_schema,
+    check_upload_schema, iter_table_chunks, handle_columnar_upload,
+)
+
+# ─────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(JOBS_DIR, "jobs.db"))
+JOBS_RUNNER = os.getenv("JOBS_RUNNER", "inline")        # "inline" = threads in each web worker, "off" = separate process
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "1"))      # threads per process
+JOBS_MAX_RUNNING = int(os.getenv("JOBS_MAX_RUNNING", "2"))   # across all processes sharing the DB
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "100"))
+JOBS_POLL_INTERVAL_S = float(os.getenv("JOBS_POLL_INTERVAL_S", "1"))
+JOBS_STAGE_TABLE = os.getenv("JOBS_STAGE_TABLE", "uploaded_leads")  # "" skips the Redshift load
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    priority    INTEGER NOT NULL DEFAULT 0,
+    filename    TEXT,
+    input_path  TEXT NOT NULL,
+    input_format TEXT NOT NULL,
+    result_path TEXT,
+    rows_done   INTEGER NOT NULL DEFAULT 0,
+    model_version TEXT,
+    owner       TEXT,
+    error       TEXT,
+    created_at  TEXT NOT NULL,
+    started_at  TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+"""
+
+
+class QueueFullError(RuntimeError):
+    """
+    Raised when JOBS_MAX_QUEUED jobs are already waiting.
+    """
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: str) -> bool:
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True  # can't tell for other hosts; leave their jobs alone
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class JobStore:
+    """
+    SQLite-backed job table. The table doubles as the queue: runners claim
+    the highest-priority, oldest queued job inside an IMMEDIATE transaction,
+    so several processes can share one database file safely.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; multi-statement changes use explicit BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, filename: str, input_path: str, input_format: str, priority: int = 0) -> dict:
+        job_id = os.path.basename(os.path.dirname(input_path))
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if queued >= JOBS_MAX_QUEUED:
+                conn.execute("ROLLBACK")
+                raise QueueFullError(f"{queued} jobs already queued; try again later")
+            conn.execute(
+                "INSERT INTO jobs (id, status, priority, filename, input_path, input_format, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, int(priority), filename, input_path, input_format, _now()),
+            )
+            conn.execute("COMMIT")
+        return self.get(job_id)
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, limit: int = 50) -> list:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def claim(self, owner: str):
+        """
+        Marks the next queued job as running for `owner` and returns it, or
+        None when nothing is queued or JOBS_MAX_RUNNING jobs are running.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+            row = None
+            if running < JOBS_MAX_RUNNING:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED,),
+                ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = ? WHERE id = ?",
+                (RUNNING, owner, _now(), row["id"]),
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    def update(self, job_id: str, **fields):
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def requeue_orphans(self) -> int:
+        """
+        Puts 'running' jobs whose owning process on this host has died back
+        in the queue (restart recovery). Returns how many were requeued.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT id, owner FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            orphans = [r["id"] for r in rows if not _owner_alive(r["owner"])]
+            for job_id in orphans:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, owner = NULL, started_at = NULL, rows_done = 0 WHERE id = ?",
+                    (QUEUED, job_id),
+                )
+            conn.execute("COMMIT")
+        return len(orphans)
+
+
+# ─────────────────────────────────────────────
+# Job execution
+# ─────────────────────────────────────────────
+def job_dir(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def new_job_path(filename: str) -> str:
+    """
+    Reserves a fresh job directory and returns the path to save the upload to.
+    """
+    job_id = uuid.uuid4().hex
+    os.makedirs(job_dir(job_id), exist_ok=True)
+    ext = filename.rsplit(".", 1)[1].lower() if "." in filename else "bin"
+    return os.path.join(job_dir(job_id), f"input.{ext}")
+
+
+def result_table(chunk: pd.DataFrame, start: int, proba, reasons=None) -> pa.Table:
+    """
+    Compact per-row result: row number, lead id (as text) when present,
+    probability, 0/1 prediction and validation errors. Rows rejected by
+    input validation have null probability/prediction and their reasons.
+    """
+    out = {"row": pa.array(range(start, start + len(chunk)), pa.int64())}
+    id_col = id_column(chunk)
+    if id_col is not None:
+        ids = chunk[id_col]
+        out["lead_id"] = pa.array(ids.astype(str).where(ids.notna(), None), pa.string())
+    rejected = np.isnan(proba)
+    out["probability"] = pa.array(proba, pa.float64(), mask=rejected)
+    out["prediction"] = pa.array((proba > 0.5).astype("int8"), pa.int8(), mask=rejected)
+    out["validation_errors"] = pa.array(reasons if reasons is not None else [None] * len(chunk), pa.string())
+    return pa.table(out)
+
+
+def run_job(store: JobStore, job: dict):
+    """
+    Stages, scores and persists one job chunk by chunk, writing results to
+    <JOBS_DIR>/<id>/result.parquet.
+    """
+    path, fmt = job["input_path"], job["input_format"]
+    live = holder.get()
+    store.update(job["id"], model_version=live.version)
+
+    if fmt == "csv":
+        chunks = iter_csv_chunks(path, UPLOAD_CHUNK_ROWS)
+        first = next(chunks, None)
+        if first is None or first.empty:
+            raise ValueError("Uploaded file is empty.")
+        if JOBS_STAGE_TABLE:
+            handle_csv_upload(path, JOBS_STAGE_TABLE, stream=True)
+        chunks = _prepend(first, chunks)
+    else:
+        table = open_arrow_table(path, fmt)
+        check_upload_schema(table.schema, input_schema(live.preprocessor))
+        if table.num_rows == 0:
+            raise ValueError("Uploaded file is empty.")
+        if JOBS_STAGE_TABLE:
+            handle_columnar_upload(path, fmt, table, JOBS_STAGE_TABLE)
+        chunks = iter_table_chunks(table, UPLOAD_CHUNK_ROWS)
+
+    result_path = os.path.join(job_dir(job["id"]), "result.parquet")
+    tmp_path = result_path + ".tmp"
+    writer, done = None, 0
+    try:
+        for chunk in chunks:
+            X_proc, proba = score_frame_cached(chunk, live)
+            save_preprocessed_features(X_proc)
+            part = result_table(chunk, done, proba, rejection_reasons(chunk, np.isnan(proba), live))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, part.schema)
+            writer.write_table(part.cast(writer.schema))
+            done += len(chunk)
+            store.update(job["id"], rows_done=done)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, result_path)
+    return result_path, done
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+class JobRunner:
+    """
+    Background threads that claim and run jobs from a JobStore. Concurrency
+    is bounded per process (`workers`) and globally (JOBS_MAX_RUNNING).
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOBS_WORKERS,
+                 poll_interval: float = JOBS_POLL_INTERVAL_S):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.owner = _owner()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        requeued = self.store.requeue_orphans()
+        if requeued:
+            print(f"♻️ Requeued {requeued} interrupted job(s)")
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-runner-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim(self.owner)
+            except sqlite3.Error as e:
+                print(f"⚠️ Job claim failed: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: dict):
+        print(f"🏃 Job {job['id']} started ({job['filename']}, priority {job['priority']})")
+        t0 = time.perf_counter()
+        try:
+            result_path, rows = run_job(self.store, job)
+            self.store.update(job["id"], status=SUCCEEDED, result_path=result_path,
+                              rows_done=rows, finished_at=_now())
+            print(f"✅ Job {job['id']} scored {rows} rows in {time.perf_counter() - t0:.1f}s")
+        except Exception as e:
+            self.store.update(job["id"], status=FAILED, error=str(e), finished_at=_now())
+            print(f"❌ Job {job['id']} failed: {e}")
+
+
+# ─────────────────────────────────────────────
+# Process-wide singletons
+# ─────────────────────────────────────────────
+_store = None
+_runner = None
+_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = JobStore()
+    return _store
+
+
+def ensure_job_runner():
+    """
+    Starts this process's runner threads (JOBS_RUNNER=inline). Call after
+    fork, e.g. on the first request or in the ASGI lifespan.
+    """
+    global _runner
+    if JOBS_RUNNER != "inline":
+        return None
+    if _runner is None:
+        store = get_job_store()
+        with _lock:
+            if _runner is None:
+                _runner = JobRunner(store)
+                _runner.start()
+    return _runner
+
+
+def submit_job(filename: str, input_path: str, input_format: str, priority: int = 0) -> dict:
+    job = get_job_store().create(filename, input_path, input_format, priority)
+    runner = ensure_job_runner()
+    if runner is not None:
+        runner.notify()
+    return job
+
+
+def job_status(job: dict) -> dict:
+    """
+    Public view of a job row (no local paths).
+    """
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "filename": job["filename"],
+        "rows_done": job["rows_done"],
+        "model_version": job["model_version"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+
+
+def discard_job_dir(input_path: str):
+    shutil.rmtree(os.path.dirname(input_path), ignore_errors=True)
+
+
+def iter_result_csv(result_path: str):
+    """
+    Streams a Parquet result as CSV text, one row group at a time.
+    """
+    pf = pq.ParquetFile(result_path)
+    for i in range(pf.num_row_groups):
+        yield pf.read_row_group(i).to_pandas().to_csv(index=False, header=(i == 0))
+
+
+# ─────────────────────────────────────────────
+# Standalone runner: python -m src.app.utils.jobs  (with JOBS_RUNNER=off in the web tier)
+# ─────────────────────────────────────────────
+if __name__ == "__main__":
+    runner = JobRunner(get_job_store())
+    runner.start()
+    print(f"🧵 Job runner {runner.owner} polling {JOBS_DB_PATH} with {runner.workers} thread(s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        runner.stop()
@@ -0,0 +1,383 @@
+import os
+import sys
+import copy
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, NamedTuple, Optional
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
+from src.ml.inference.compiled_scorer import compile_pipeline, probe_records
+from src.ml.inference.precision import float32_pair, parity_frame
+from src.ml.inference.pruning import prune_pipeline, same_outputs, pruning_stats
+from src.ml.pipeline.preprocessing import use_sparse_output
+from src.ml.pipeline.schema_validator import SCHEMA_VALIDATION, InputValidator, consumed_columns
+from src.ml.registry.model_registry import PREPROCESSOR_VERSION_TAG
+
+USE_COMPILED_SCORER = os.getenv("USE_COMPILED_SCORER", "1") == "1"
+INFERENCE_FLOAT32 = os.getenv("INFERENCE_FLOAT32", "0") == "1"
+INFERENCE_SPARSE = os.getenv("INFERENCE_SPARSE", "0") == "1"
+INFERENCE_PRUNE = os.getenv("INFERENCE_PRUNE", "1") == "1"
+FLOAT32_TOLERANCE = float(os.getenv("FLOAT32_TOLERANCE", "1e-4"))
+MODEL_POLL_INTERVAL_S = float(os.getenv("MODEL_POLL_INTERVAL_S", "60"))
+MODEL_RETRY_INTERVAL_S = float(os.getenv("MODEL_RETRY_INTERVAL_S", "5"))
+
+
+class LoadedModels(NamedTuple):
+    """
+    An immutable preprocessor/model pair. Requests grab one snapshot and
+    use it throughout, so a swap can never mix versions mid-request.
+    """
+    preprocessor: Any
+    model: Any
+    scorer: Any
+    preprocessor_version: str
+    model_version: str
+    loaded_at: str
+    precision: str = "float64"
+    validator: Any = None
+
+    @property
+    def version(self) -> str:
+        return f"{self.preprocessor_version}/{self.model_version}"
+
+
+def registry_resolver(name: str, stage: str) -> str:
+    from mlflow.tracking import MlflowClient
+    versions = MlflowClient().get_latest_versions(name, stages=[stage])
+    if not versions:
+        raise RuntimeError(f"No '{stage}' version registered for '{name}'")
+    return str(versions[0].version)
+
+
+def registry_paired_version(model_name: str, model_version: str) -> Optional[str]:
+    from mlflow.tracking import MlflowClient
+    mv = MlflowClient().get_model_version(model_name, model_version)
+    return mv.tags.get(PREPROCESSOR_VERSION_TAG)
+
+
+def registry_loader(name: str, version: str):
+    import mlflow.sklearn
+    return mlflow.sklearn.load_model(f"models:/{name}/{version}")
+
+
+def build_pruned(preprocessor):
+    """
+    Copy of the pipeline that only computes the selected features when
+    INFERENCE_PRUNE is on and its outputs match the original exactly on
+    probe rows, else the pipeline itself.
+    """
+    if not INFERENCE_PRUNE:
+        return preprocessor
+    try:
+        pruned = prune_pipeline(preprocessor)
+        probe = pd.concat([pd.DataFrame(probe_records(preprocessor)), parity_frame(preprocessor)],
+                          ignore_index=True)
+        if not same_outputs(preprocessor, pruned, probe):
+            raise ValueError("pruned pipeline disagrees with the original")
+        stats = pruning_stats(preprocessor, pruned)
+        print(f"✂️ Pruned preprocessing to {stats['computed_columns'][1]} of "
+              f"{stats['computed_columns'][0]} columns ({stats['input_columns'][1]} raw inputs)")
+        return pruned
+    except Exception as e:
+        print(f"⚠️ Pipeline pruning disabled, using the full preprocessor: {e}")
+        return preprocessor
+
+
+def build_sparse(preprocessor):
+    """
+    Copy of the pipeline whose ColumnTransformer emits CSR when
+    INFERENCE_SPARSE is on (the feature selector densifies only the selected
+    columns), else the pipeline itself.
+    """
+    if not INFERENCE_SPARSE:
+        return preprocessor
+    try:
+        sparse_pre = copy.deepcopy(preprocessor)
+        use_sparse_output(sparse_pre.named_steps["preprocessing"])
+        print("🧮 Sparse one-hot inference on")
+        return sparse_pre
+    except Exception as e:
+        print(f"⚠️ Sparse inference disabled, using dense features: {e}")
+        return preprocessor
+
+
+def build_float32(preprocessor, model) -> tuple:
+    """
+    Returns (preprocessor, model, precision): the float32 pair when
+    INFERENCE_FLOAT32 is on and its probabilities stay within
+    FLOAT32_TOLERANCE of the originals, else the originals.
+    """
+    if not INFERENCE_FLOAT32:
+        return preprocessor, model, "float64"
+    try:
+        probe = pd.concat([pd.DataFrame(probe_records(preprocessor)), parity_frame(preprocessor)],
+                          ignore_index=True)
+        pre32, model32, diff = float32_pair(preprocessor, model, probe, FLOAT32_TOLERANCE)
+        print(f"🪶 float32 inference on (max |Δp| {diff:.1e} over {len(probe)} probe rows)")
+        return pre32, model32, "float32"
+    except Exception as e:
+        print(f"⚠️ float32 inference disabled, using float64: {e}")
+        return preprocessor, model, "float64"
+
+
+def build_validator(preprocessor, served):
+    """
+    Input validator for the served pipeline: the one recorded at training
+    (`input_validator_`, with training ranges) or one compiled from the
+    fitted preprocessor, restricted to the columns `served` still reads.
+    Returns None when SCHEMA_VALIDATION is off or nothing can be compiled.
+    """
+    if not SCHEMA_VALIDATION:
+        return None
+    try:
+        validator = getattr(preprocessor, "input_validator_", None) or InputValidator.from_pipeline(preprocessor)
+        return validator.restricted_to(consumed_columns(served))
+    except Exception as e:
+        print(f"⚠️ Input validation disabled: {e}")
+        return None
+
+
+def build_scorer(preprocessor):
+    """
+    Compiles and verifies the single-row fast path, or returns None.
+    """
+    if not USE_COMPILED_SCORER:
+        return None
+    try:
+        scorer = compile_pipeline(preprocessor)
+        if not scorer.verify(preprocessor, probe_records(preprocessor, raw_names=True)):
+            raise ValueError("compiled tables disagree with the sklearn pipeline")
+        return scorer
+    except Exception as e:
+        print(f"⚠️ Compiled scorer disabled, using sklearn path: {e}")
+        return None
+
+
+class ModelHolder:
+    """
+    Lazily loads the Production preprocessor/model pair and, once started,
+    polls the MLflow registry in a background thread. New versions are
+    loaded off the request path and swapped in with a single reference
+    assignment. The model version decides the pair: the preprocessor
+    version comes from the model version's tag (see `_paired_version`), so
+    a promotion in progress never installs a mismatched pair.
+    """
+
+    def __init__(
+        self,
+        preprocessor_name: str,
+        model_name: str,
+        stage: str = "Production",
+        poll_interval: float = MODEL_POLL_INTERVAL_S,
+        resolver: Callable[[str, str], str] = registry_resolver,
+        loader: Callable[[str, str], Any] = registry_loader,
+        pairing: Callable[[str, str], Optional[str]] = registry_paired_version,
+    ):
+        self.preprocessor_name = preprocessor_name
+        self.model_name = model_name
+        self.stage = stage
+        self.poll_interval = poll_interval
+        self.resolver = resolver
+        self.loader = loader
+        self.pairing = pairing
+
+        self._live: Optional[LoadedModels] = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._last_checked = None
+        self._last_error = None
+        self._last_failure = 0.0
+
+    # ─────────────────────────────────────────────
+    # Request path
+    # ─────────────────────────────────────────────
+    def get(self) -> LoadedModels:
+        """
+        Returns the live snapshot, loading it on first use.
+        Raises RuntimeError if nothing could be loaded yet.
+        """
+        live = self._live
+        if live is not None:
+            return live
+
+        with self._load_lock:
+            if self._live is None:
+                if time.monotonic() - self._last_failure < MODEL_RETRY_INTERVAL_S:
+                    raise RuntimeError(f"❌ Model not loaded: {self._last_error}")
+                try:
+                    self._refresh_locked()
+                except Exception as e:
+                    self._last_failure = time.monotonic()
+                    raise RuntimeError(f"❌ Failed to load model or preprocessor: {e}")
+        self.start_polling()
+        return self._live
+
+    def peek(self) -> Optional[LoadedModels]:
+        """
+        Returns the live snapshot without loading (None before first load).
+        """
+        return self._live
+
+    # ─────────────────────────────────────────────
+    # Loading & swapping
+    # ─────────────────────────────────────────────
+    def refresh(self) -> bool:
+        """
+        Checks the registry and swaps in a new pair if the Production model
+        or its paired preprocessor changed.
+        Returns True when a swap happened.
+        """
+        with self._load_lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> bool:
+        try:
+            model_v = self.resolver(self.model_name, self.stage)
+            pre_v = self._paired_version(model_v)
+            self._last_checked = datetime.now().isoformat(timespec="seconds")
+
+            live = self._live
+            if live is not None and (live.preprocessor_version, live.model_version) == (pre_v, model_v):
+                return False
+
+            preprocessor = self.loader(self.preprocessor_name, pre_v)
+            model = self.loader(self.model_name, model_v)
+            self._install(preprocessor, model, pre_v, model_v)
+            self._last_error = None
+            return True
+        except Exception as e:
+            self._last_error = str(e)
+            raise
+
+    def _paired_version(self, model_v: str) -> str:
+        """
+        Preprocessor version to serve with model_v: the one tagged on the
+        model version at registration. Untagged (older) model versions only
+        pair with the Production preprocessor on first load; once a pair is
+        live, an untagged new model is refused and the current pair kept.
+        """
+        try:
+            pre_v = self.pairing(self.model_name, model_v)
+        except Exception as e:
+            print(f"⚠️ Could not read the preprocessor paired with {self.model_name} v{model_v}: {e}")
+            pre_v = None
+        if pre_v is not None:
+            return str(pre_v)
+
+        live = self._live
+        if live is not None:
+            if live.model_version == model_v:
+                return live.preprocessor_version
+            raise RuntimeError(f"{self.model_name} v{model_v} has no '{PREPROCESSOR_VERSION_TAG}' tag; "
+                               f"keeping {live.version}")
+        return self.resolver(self.preprocessor_name, self.stage)
+
+    def set_models(self, preprocessor, model, preprocessor_version: str = "local",
+                   model_version: str = "local"):
+        """
+        Installs an already-loaded pair (local artifacts, benchmarks).
+        """
+        with self._load_lock:
+            self._install(preprocessor, model, str(preprocessor_version), str(model_version))
+
+    def _install(self, preprocessor, model, pre_v: str, model_v: str):
+        original = preprocessor
+        preprocessor = build_sparse(build_pruned(preprocessor))
+        preprocessor, model, precision = build_float32(preprocessor, model)
+        new = LoadedModels(
+            preprocessor=preprocessor,
+            model=model,
+            scorer=build_scorer(preprocessor),
+            preprocessor_version=pre_v,
+            model_version=model_v,
+            loaded_at=datetime.now().isoformat(timespec="seconds"),
+            precision=precision,
+            validator=build_validator(original, preprocessor),
+        )
+        self._swap(new)
+
+    def install_built(self, new: LoadedModels):
+        """
+        Swaps in an already-built snapshot as-is, without pruning, compiling
+        or validating again (e.g. memory-mapped copies of the live one).
+        """
+        with self._load_lock:
+            self._swap(new)
+
+    def _swap(self, new: LoadedModels):
+        old, self._live = self._live, new
+        print(f"✅ Loaded {self.preprocessor_name} v{new.preprocessor_version} and {self.model_name} "
+              f"v{new.model_version} (stage={self.stage})")
+        for callback in list(self._listeners):
+            try:
+                callback(old, new)
+            except Exception as e:
+                print(f"⚠️ Model swap listener failed: {e}")
+
+    def add_listener(self, callback: Callable[[Optional[LoadedModels], LoadedModels], None]):
+        """
+        Registers callback(old, new) to run after every swap.
+        """
+        self._listeners.append(callback)
+
+    # ─────────────────────────────────────────────
+    # Background polling
+    # ─────────────────────────────────────────────
+    def start_polling(self):
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        with self._load_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._poll, name="model-registry-poller", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def after_fork(self):
+        """
+        Call in a forked worker: threads and lock state do not survive
+        fork(), so reset them and restart polling if a pair is loaded.
+        """
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if self._live is not None:
+            self.start_polling()
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the current pair; try again next interval.
+                print(f"⚠️ Registry poll failed, keeping current model: {e}")
+
+    def info(self) -> dict:
+        live = self._live
+        return {
+            "stage": self.stage,
+            "loaded": live is not None,
+            "preprocessor": {
+                "name": self.preprocessor_name,
+                "version": live.preprocessor_version if live else None,
+            },
+            "model": {
+                "name": self.model_name,
+                "version": live.model_version if live else None,
+            },
+            "compiled_scorer": bool(live and live.scorer is not None),
+            "precision": live.precision if live else None,
+            "input_validation": bool(live and live.validator is not None),
+            "loaded_at": live.loaded_at if live else None,
+            "last_checked": self._last_checked,
+            "last_error": self._last_error,
+            "poll_interval_s": self.poll_interval,
+        }
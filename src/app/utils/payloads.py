@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "10000"))
+
+
+class PayloadError(ValueError):
+    """
+    Raised for malformed bulk-scoring payloads (reported as HTTP 400).
+    """
+
+
+def frame_from_payload(payload) -> pd.DataFrame:
+    """
+    Builds a DataFrame from a bulk-scoring JSON body. Accepted shapes:
+
+      [ {lead}, {lead}, ... ]                        row records
+      {"leads": [ {lead}, ... ], ...options}         row records + options
+      {"columns": {"col": [v, ...], ...}, ...}       columnar
+    """
+    if isinstance(payload, list):
+        records, columns = payload, None
+    elif isinstance(payload, dict):
+        records, columns = payload.get("leads"), payload.get("columns")
+    else:
+        raise PayloadError("Body must be a JSON array of leads or an object with 'leads' or 'columns'")
+
+    if records is not None and columns is not None:
+        raise PayloadError("Send either 'leads' or 'columns', not both")
+
+    if columns is not None:
+        if not isinstance(columns, dict) or not columns:
+            raise PayloadError("'columns' must be a non-empty object of equal-length arrays")
+        lengths = {len(v) if isinstance(v, list) else -1 for v in columns.values()}
+        if len(lengths) != 1 or -1 in lengths:
+            raise PayloadError("'columns' values must be arrays of equal length")
+        n_rows = lengths.pop()
+        df = pd.DataFrame(columns)
+    else:
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise PayloadError("'leads' must be an array of objects")
+        n_rows = len(records)
+        df = pd.DataFrame.from_records(records)
+
+    if n_rows == 0:
+        raise PayloadError("No leads to score")
+    if n_rows > BATCH_MAX_ROWS:
+        raise PayloadError(f"Too many leads: {n_rows} > {BATCH_MAX_ROWS}")
+    return df
+
+
+def parse_batch_options(payload, args) -> tuple:
+    """
+    Reads `threshold` and `save` from the JSON object body, falling back to
+    query parameters (the only option source for bare arrays).
+    Returns (threshold or None, save).
+    """
+    body = payload if isinstance(payload, dict) else {}
+
+    def option(name, default=None):
+        return body[name] if name in body else args.get(name, default)
+
+    threshold = option("threshold")
+    if threshold is not None and threshold != "":
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            raise PayloadError("'threshold' must be a number")
+        if not 0.0 <= threshold <= 1.0:
+            raise PayloadError("'threshold' must be between 0 and 1")
+    else:
+        threshold = None
+
+    save = option("save", False)
+    if isinstance(save, str):
+        save = save.lower() in ("1", "true", "yes")
+    return threshold, bool(save)
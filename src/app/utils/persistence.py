@@ -0,0 +1,235 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
+from src.ml.data_loader.data_loader import save_dataframe_to_postgres
+from .metrics import PERSIST_FLUSH_SECONDS
+
+PERSIST_ASYNC = os.getenv("PERSIST_ASYNC", "1") == "1"
+PERSIST_QUEUE_MAX = int(os.getenv("PERSIST_QUEUE_MAX", "64"))              # frames
+PERSIST_FLUSH_ROWS = int(os.getenv("PERSIST_FLUSH_ROWS", "50000"))
+PERSIST_FLUSH_INTERVAL_S = float(os.getenv("PERSIST_FLUSH_INTERVAL_S", "30"))
+PERSIST_PUT_TIMEOUT_S = float(os.getenv("PERSIST_PUT_TIMEOUT_S", "5"))
+PERSIST_MAX_RETRIES = int(os.getenv("PERSIST_MAX_RETRIES", "3"))
+PERSIST_PREFIX = os.getenv("PERSIST_PREFIX", "user_uploaded_preprocessed")
+
+_STOP = object()
+
+
+def features_frame(X_proc) -> pd.DataFrame:
+    n_feats = X_proc.shape[1]
+    cols    = [f"f_{i}" for i in range(n_feats)]
+    return pd.DataFrame(X_proc, columns=cols)
+
+
+def object_key(prefix: str, seq: int) -> str:
+    now = datetime.now(timezone.utc)
+    return (f"{prefix}/dt={now:%Y-%m-%d}/"
+            f"{now:%H%M%S%f}-{os.getpid()}-{seq:06d}.parquet")
+
+
+class FeatureWriter:
+    """
+    Persists selected feature matrices off the request path. Callers put
+    arrays on a bounded queue; one background thread coalesces them and
+    writes a Parquet object to S3 once PERSIST_FLUSH_ROWS rows are buffered
+    or the oldest buffered frame is PERSIST_FLUSH_INTERVAL_S old. A full
+    queue blocks the caller (backpressure) and, past PERSIST_PUT_TIMEOUT_S,
+    the frame is written inline rather than dropped. Pending frames are
+    flushed at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        write_fn=save_dataframe_to_postgres,
+        prefix: str = PERSIST_PREFIX,
+        maxsize: int = PERSIST_QUEUE_MAX,
+        flush_rows: int = PERSIST_FLUSH_ROWS,
+        flush_interval: float = PERSIST_FLUSH_INTERVAL_S,
+        put_timeout: float = PERSIST_PUT_TIMEOUT_S,
+    ):
+        self.write_fn = write_fn
+        self.prefix = prefix
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        # close() waits on this until no submit() is between its closed check and its put
+        self._idle = threading.Condition(self._lock)
+        self._submitting = 0
+        self._thread = None
+        self._closed = False
+        self._seq = 0
+
+        self.frames_queued = 0
+        self.rows_written = 0
+        self.objects_written = 0
+        self.inline_writes = 0
+        self.failed_rows = 0
+        self.last_error = None
+
+    # ─────────────────────────────────────────────
+    # Producer side
+    # ─────────────────────────────────────────────
+    def submit(self, X_proc):
+        """
+        Queues a feature matrix for persistence. Blocks while the queue is
+        full; writes synchronously if it stays full past put_timeout.
+        """
+        X_proc = np.asarray(X_proc)
+        if X_proc.shape[0] == 0:
+            return
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._submitting += 1
+        if closed:
+            self._write([X_proc])
+            return
+        try:
+            self._ensure_started()
+            self._queue.put(X_proc, timeout=self.put_timeout)
+            with self._lock:
+                self.frames_queued += 1
+        except queue.Full:
+            print(f"⚠️ Persistence queue full for {self.put_timeout}s; writing inline")
+            with self._lock:
+                self.inline_writes += 1
+            self._write([X_proc])
+        finally:
+            with self._lock:
+                self._submitting -= 1
+                self._idle.notify_all()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="feature-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    # ─────────────────────────────────────────────
+    # Writer thread
+    # ─────────────────────────────────────────────
+    def _run(self):
+        buffer, rows, oldest = [], 0, None
+        while True:
+            timeout = None if oldest is None else max(0.0, oldest + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                if buffer:
+                    self._write(buffer)
+                self._queue.task_done()
+                return
+
+            if item is not None:
+                # A model swap can change the feature width; never mix widths in one object.
+                if buffer and item.shape[1] != buffer[0].shape[1]:
+                    self._write(buffer)
+                    buffer, rows, oldest = [], 0, None
+                buffer.append(item)
+                rows += item.shape[0]
+                oldest = oldest if oldest is not None else time.monotonic()
+                self._queue.task_done()
+
+            due = oldest is not None and time.monotonic() - oldest >= self.flush_interval
+            if buffer and (rows >= self.flush_rows or due):
+                self._write(buffer)
+                buffer, rows, oldest = [], 0, None
+
+    def _write(self, frames: list):
+        X = frames[0] if len(frames) == 1 else np.vstack(frames)
+        df_pre = features_frame(X)
+        with self._lock:
+            self._seq += 1
+            key = object_key(self.prefix, self._seq)
+
+        for attempt in range(1, PERSIST_MAX_RETRIES + 1):
+            try:
+                with PERSIST_FLUSH_SECONDS.time():
+                    self.write_fn(df_pre, key=key, file_format="parquet")
+                with self._lock:
+                    self.rows_written += len(df_pre)
+                    self.objects_written += 1
+                return
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Feature write attempt {attempt}/{PERSIST_MAX_RETRIES} failed: {e}")
+                if attempt < PERSIST_MAX_RETRIES:
+                    time.sleep(min(2 ** attempt, 30))
+        with self._lock:
+            self.failed_rows += len(df_pre)
+        print(f"❌ Dropped {len(df_pre)} preprocessed rows after {PERSIST_MAX_RETRIES} attempts")
+
+    # ─────────────────────────────────────────────
+    # Shutdown & stats
+    # ─────────────────────────────────────────────
+    def close(self, timeout: float = 60.0):
+        """
+        Flushes everything queued so far and stops the writer thread.
+        Submits that already passed their closed check are enqueued before
+        the stop marker; later ones write inline.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._idle.wait_for(lambda: self._submitting == 0, timeout)
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "async": True,
+                "queued_frames": self._queue.qsize(),
+                "frames_queued": self.frames_queued,
+                "rows_written": self.rows_written,
+                "objects_written": self.objects_written,
+                "inline_writes": self.inline_writes,
+                "failed_rows": self.failed_rows,
+                "last_error": self.last_error,
+            }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_feature_writer():
+    """
+    Process-wide FeatureWriter, or None when PERSIST_ASYNC=0.
+    """
+    global _writer
+    if not PERSIST_ASYNC:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = FeatureWriter()
+    return _writer
+
+
+def persistence_stats() -> dict:
+    if _writer is None:
+        return {"async": PERSIST_ASYNC, "started": False}
+    return _writer.stats()
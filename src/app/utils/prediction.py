@@ -2,7 +2,6 @@ import os
 import sys
 import pandas as pd
 import numpy as np
-import mlflow.sklearn
 from typing import Union, List
 
 # ─────────────────────────────────────────────
@@ -13,6 +12,12 @@ project_root = os.path.abspath(os.path.join(here, "../../../"))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 from src.ml.data_loader.data_loader import save_dataframe_to_postgres  # ⬅️ Import saving utility
+from .model_holder import ModelHolder, registry_resolver
+from src.ml.registry.artifact_cache import ArtifactCache
+from .persistence import get_feature_writer, features_frame, object_key, PERSIST_PREFIX
+from .prediction_cache import PredictionCache, record_key, frame_keys, cached_scores
+from .metrics import stage, BATCH_ROWS, add_collector, gauge_lines
+from .prefork import memory_gauges
 
 # ─────────────────────────────────────────────
 # Constants: Model Registry Names and Stage
@@ -22,20 +27,56 @@ MODEL_NAME = "LeadScoringBestModel"
 STAGE = "Production"
 
 # ─────────────────────────────────────────────
-# Load Preprocessor Pipeline & Model
+# Preprocessor Pipeline & Model (loaded lazily, hot-swapped on promotion)
 # ─────────────────────────────────────────────
-try:
-    # This pipeline includes feature_eng → preprocessing → feature_selection
-    preprocessor_uri = f"models:/{PREPROCESSOR_NAME}/{STAGE}"
-    preprocessor = mlflow.sklearn.load_model(preprocessor_uri)
+# The preprocessor includes feature_eng → preprocessing → feature_selection;
+# the model is just the trained classifier for predict_proba.
+# Artifacts come from a local versioned cache; only the version lookup hits
+# the registry, and the last known-good version is used if it is down.
+artifact_cache = ArtifactCache()
+holder = ModelHolder(
+    PREPROCESSOR_NAME,
+    MODEL_NAME,
+    stage=STAGE,
+    resolver=artifact_cache.cached_resolver(registry_resolver),
+    loader=artifact_cache.load_model,
+)
 
-    # This is just the trained classifier for predict_proba
-    model_uri = f"models:/{MODEL_NAME}/{STAGE}"
-    model = mlflow.sklearn.load_model(model_uri)
+# ─────────────────────────────────────────────
+# Prediction cache (keyed by payload hash + live model version)
+# ─────────────────────────────────────────────
+prediction_cache = PredictionCache()
+holder.add_listener(prediction_cache.on_model_swap)
+
+
+def model_version() -> str:
+    """
+    Live "preprocessor/model" version for metric labels ("" before first load).
+    """
+    live = holder.peek()
+    return live.version if live is not None else ""
+
+
+def _serving_gauges() -> list:
+    live = holder.peek()
+    info = [] if live is None else [({
+        "preprocessor_version": live.preprocessor_version,
+        "model_version": live.model_version,
+        "compiled_scorer": str(live.scorer is not None).lower(),
+    }, 1)]
+    cache = prediction_cache.stats()
+    return (
+        gauge_lines("lead_scoring_model_info", "Live preprocessor/model versions.", info)
+        + gauge_lines("lead_scoring_prediction_cache_entries", "Cached lead scores.", [({}, cache["size"])])
+        + gauge_lines("lead_scoring_prediction_cache_hits_total", "Prediction cache hits.",
+                      [({}, cache["hits"])], kind="counter")
+        + gauge_lines("lead_scoring_prediction_cache_misses_total", "Prediction cache misses.",
+                      [({}, cache["misses"])], kind="counter")
+    )
 
-    print(f"✅ Loaded preprocessor and model from MLflow registry (stage={STAGE})")
-except Exception as e:
-    raise RuntimeError(f"❌ Failed to load model or preprocessor: {e}")
+
+add_collector(_serving_gauges)
+add_collector(memory_gauges)
 
 
 # ─────────────────────────────────────────────
@@ -43,51 +84,231 @@ except Exception as e:
 # ─────────────────────────────────────────────
 def predict_lead(input_dict: dict) -> Union[float, dict]:
     try:
-        df = pd.DataFrame([input_dict])
-        X_proc = preprocessor.transform(df)
-        raw = model.predict_proba(X_proc)
+        live = holder.get()
+        version = live.version
+        key = None
+        if prediction_cache.enabled:
+            with stage("cache_lookup", version):
+                key = record_key(version, input_dict)
+                cached = prediction_cache.get(key)
+            if cached is not None:
+                return cached
+
+        if live.validator is not None:
+            with stage("validation", version):
+                problems = live.validator.check_record(input_dict)
+            if problems:
+                return {"error": f"Invalid input: {problems}"}
+            # Numeric strings passed the check; score them as numbers like score_frame
+            input_dict = live.validator.coerce_record(input_dict)
 
-        arr = np.asarray(raw)
-        # Handle 1D or 2D outputs
-        if arr.ndim == 1:
-            return float(arr[0])
-        if arr.ndim == 2 and arr.shape[1] >= 2:
-            return float(arr[0, 1])
-        if arr.ndim == 2 and arr.shape[1] == 1:
-            return float(arr[0, 0])
+        X_proc = None
+        if live.scorer is not None:
+            with stage("compiled_transform", version):
+                X_proc = live.scorer.transform_one(input_dict)
+        if X_proc is None:
+            df = pd.DataFrame([input_dict])
+            X_proc = transform_timed(live.preprocessor, df, version)
+        with stage("predict_proba", version):
+            proba = float(positive_proba(live.model.predict_proba(X_proc))[0])
+        BATCH_ROWS.observe(1, "single", version)
 
-        return {"error": f"Unexpected output shape: {arr.shape}"}
+        if key is not None:
+            prediction_cache.put(key, proba)
+        return proba
 
     except Exception as e:
         return {"error": str(e)}
 
 
+# ─────────────────────────────────────────────
+# Shared scoring helpers
+# ─────────────────────────────────────────────
+def positive_proba(raw) -> np.ndarray:
+    """
+    Normalise predict_proba output to a 1D array of positive-class probabilities.
+    """
+    arr = np.asarray(raw)
+    # Handle 1D or 2D outputs
+    if arr.ndim == 1:
+        return arr
+    if arr.ndim == 2 and arr.shape[1] >= 2:
+        return arr[:, 1]
+    if arr.ndim == 2 and arr.shape[1] == 1:
+        return arr[:, 0]
+    raise ValueError(f"Unexpected output shape: {arr.shape}")
+
+
+# Pipeline step name → stage label on lead_scoring_stage_seconds
+STAGE_NAMES = {
+    "feature_engineering": "feature_engineering",
+    "preprocessing": "column_transform",
+    "feature_selection": "feature_selection",
+}
+
+
+def transform_timed(preprocessor, X, version: str = ""):
+    """
+    preprocessor.transform(X), timing each pipeline step separately.
+    """
+    steps = getattr(preprocessor, "steps", None)
+    if not steps:
+        with stage("transform", version):
+            return preprocessor.transform(X)
+    for name, step in steps:
+        if step is None or step == "passthrough":
+            continue
+        with stage(STAGE_NAMES.get(name, name), version):
+            X = step.transform(X)
+    return X
+
+
+def score_frame(df: pd.DataFrame, live=None):
+    """
+    Transforms and scores a frame of raw leads with one model snapshot.
+    Returns (X_proc, positive-class probabilities). Rows the input
+    validator rejects are not transformed: their probability is NaN and
+    X_proc only holds the scored rows (None when every row was rejected).
+    """
+    live = live or holder.get()
+    version = live.version
+    rejected = None
+    if live.validator is not None:
+        with stage("validation", version):
+            rejected = live.validator.validate(df).rejected
+            df = live.validator.coerce_numeric(df)
+    if rejected is None or not rejected.any():
+        X_proc = transform_timed(live.preprocessor, df, version)
+        with stage("predict_proba", version):
+            proba = positive_proba(live.model.predict_proba(X_proc))
+    else:
+        proba = np.full(len(df), np.nan)
+        X_proc = None
+        if not rejected.all():
+            X_proc = transform_timed(live.preprocessor, df[~rejected], version)
+            with stage("predict_proba", version):
+                proba[~rejected] = positive_proba(live.model.predict_proba(X_proc))
+    BATCH_ROWS.observe(len(df), "batch", version)
+    return X_proc, proba
+
+
+def labels(proba: np.ndarray, threshold: float = 0.5) -> pd.array:
+    """
+    0/1 labels as a nullable integer array (<NA>, written as null, for rows
+    rejected by input validation).
+    """
+    return pd.array(np.where(np.isnan(proba), None, proba > threshold), dtype="Int8")
+
+
+def rejection_reasons(df: pd.DataFrame, rejected: np.ndarray, live=None):
+    """
+    Reason strings aligned with `df` (None for scored rows) when any row
+    is marked `rejected` (NaN score), else None. Only those rows are
+    re-validated.
+    """
+    live = live or holder.get()
+    if not rejected.any() or live.validator is None:
+        return None
+    reasons = np.full(len(df), None, dtype=object)
+    reasons[rejected] = live.validator.validate(df[rejected]).messages()
+    return reasons
+
+
+def add_predictions(df: pd.DataFrame, proba: np.ndarray, live=None) -> pd.DataFrame:
+    """
+    Adds the "prediction" column (null for rejected rows) and, when any row
+    was rejected, "validation_errors".
+    """
+    df["prediction"] = labels(proba)
+    reasons = rejection_reasons(df, np.isnan(proba), live)
+    if reasons is not None:
+        df["validation_errors"] = reasons
+    return df
+
+
+def score_upload(df: pd.DataFrame, live=None):
+    """
+    score_frame_cached then add_predictions with one snapshot: the CPU-bound
+    part of an upload response. Returns (X_proc, proba); `df` gains the
+    prediction columns.
+    """
+    live = live or holder.get()
+    X_proc, proba = score_frame_cached(df, live)
+    add_predictions(df, proba, live)
+    return X_proc, proba
+
+
+def cached_proba(df: pd.DataFrame, live=None) -> np.ndarray:
+    """
+    Positive-class probabilities for a frame, running the pipeline only on
+    rows whose payload is not already cached for the live model version.
+    """
+    live = live or holder.get()
+    if not prediction_cache.enabled:
+        return score_frame(df, live)[1]
+    with stage("cache_lookup", live.version):
+        keys = frame_keys(live.version, df)
+    return cached_scores(
+        prediction_cache, keys, lambda rows: score_frame(df.iloc[rows], live)[1]
+    )
+
+
+def score_frame_cached(df: pd.DataFrame, live=None):
+    """
+    score_frame for callers that persist features: every row is transformed,
+    and the fresh scores are written back to the cache.
+    """
+    live = live or holder.get()
+    keys = frame_keys(live.version, df) if prediction_cache.enabled else None
+    X_proc, proba = score_frame(df, live)
+    if keys is not None:
+        prediction_cache.put_many(keys, proba.tolist())
+    return X_proc, proba
+
+
+def predict_proba_batch(df: pd.DataFrame) -> np.ndarray:
+    """
+    Scores a frame of raw leads in one vectorized pass (no persistence).
+    """
+    return cached_proba(df)
+
+
+def save_preprocessed_features(X_proc):
+    """
+    Persists the selected feature matrix for drift monitoring. With the
+    background writer enabled this only enqueues the matrix.
+    """
+    if X_proc is None:
+        return
+    live = holder.peek()
+    with stage("persistence", live.version if live else ""):
+        writer = get_feature_writer()
+        if writer is not None:
+            writer.submit(X_proc)
+            return
+
+        df_pre = features_frame(X_proc)
+        save_dataframe_to_postgres(
+            df_pre,
+            key=object_key(PERSIST_PREFIX, 0),
+            file_format="parquet",
+        )
+    print(f"✅ Preprocessed features saved under '{PERSIST_PREFIX}/'.")
+
+
 # ─────────────────────────────────────────────
 # Batch prediction
 # ─────────────────────────────────────────────
-def predict_batch(df: pd.DataFrame, save: bool = True) -> Union[List[int], dict]:
+def predict_batch(df: pd.DataFrame, save: bool = True, live=None) -> Union[List[int], dict]:
     try:
-        X_proc = preprocessor.transform(df)
-
+        live = live or holder.get()
         if save:
-            n_feats = X_proc.shape[1]
-            cols    = [f"f_{i}" for i in range(n_feats)]
-            df_pre  = pd.DataFrame(X_proc, columns=cols)
-
-            save_dataframe_to_postgres(
-                df_pre,
-                table_name="user_uploaded_preprocessed",
-                if_exists="append"
-            )
-            print("✅ Preprocessed features saved to 'user_uploaded_preprocessed'.")
-
-        raw = model.predict_proba(X_proc)
-        arr = np.asarray(raw)
-
-        if arr.ndim == 1:
-            preds = [int(x > 0.5) for x in arr]
+            X_proc, proba = score_frame_cached(df, live)
+            save_preprocessed_features(X_proc)
         else:
-            preds = [int(x > 0.5) for x in arr[:, 1]]
+            proba = cached_proba(df, live)
+
+        preds = [None if np.isnan(x) else int(x > 0.5) for x in proba]
 
         return preds
     except Exception as e:
@@ -95,11 +316,56 @@ def predict_batch(df: pd.DataFrame, save: bool = True) -> Union[List[int], dict]
         return {"error": str(e)}
 
 # ─────────────────────────────────────────────
-# (Optional) Debug test when run directly
+# JSON bulk scoring (probabilities)
+# ─────────────────────────────────────────────
+def score_leads(df: pd.DataFrame, threshold: float = None, save: bool = False) -> dict:
+    """
+    Scores many leads in one vectorized pass and returns probabilities,
+    plus 0/1 labels when a threshold is given. Persistence is opt-in.
+    """
+    live = holder.get()
+    if save:
+        X_proc, proba = score_frame_cached(df, live)
+        save_preprocessed_features(X_proc)
+    else:
+        proba = cached_proba(df, live)
+
+    return score_result(live, proba, threshold, rejection_reasons(df, np.isnan(proba), live))
+
+
+def score_result(live, proba: np.ndarray, threshold: float = None, reasons=None) -> dict:
+    """
+    JSON body for bulk scoring: probabilities, plus labels when thresholded.
+    Rows rejected by input validation score null and are listed under
+    "rejected" with their reasons.
+    """
+    rejected = np.flatnonzero(np.isnan(proba))
+    probabilities = proba.tolist()
+    predictions = (proba > threshold).astype(int).tolist() if threshold is not None else None
+    for i in rejected:
+        probabilities[i] = None
+        if predictions is not None:
+            predictions[i] = None
+    result = {
+        "count": int(len(proba)),
+        "model_version": live.version,
+        "probabilities": probabilities,
+    }
+    if threshold is not None:
+        result["threshold"] = threshold
+        result["predictions"] = predictions
+    if len(rejected):
+        result["rejected"] = [
+            {"row": int(i), "errors": reasons[i] if reasons is not None else None} for i in rejected
+        ]
+    return result
+
+# ─────────────────────────────────────────────
+# (Optional) Debug test: python -m src.app.utils.prediction
 # ─────────────────────────────────────────────
 if __name__ == "__main__":
     # Create a dummy row with the exact columns your preprocess pipeline expects
-    sample = {col: 0 for col in preprocessor.feature_names_in_}  # fill zeros
+    sample = {col: 0 for col in holder.get().preprocessor.feature_names_in_}  # fill zeros
     print("Single:", predict_lead(sample))
 
     df = pd.DataFrame([sample, sample])
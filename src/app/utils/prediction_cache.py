@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))   # 0 disables
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "3600"))
+
+_NONE_SENTINEL = "\x00<None>"
+
+
+def record_key(version: str, record: dict) -> tuple:
+    """
+    Canonical key for a single lead payload: sorted-key JSON digest plus the
+    live model version. None and NaN stay distinct because the pipeline
+    treats them differently for categorical columns.
+    """
+    canonical = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+    return (version, "r", digest)
+
+
+# Two independent keys give each column a 128-bit hash per row
+_HASH_KEYS = ("lead-scoring-k01", "lead-scoring-k02")
+
+
+def _column_hashes(s: pd.Series) -> list:
+    if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"):
+        # Hash each distinct string once per key and gather by code
+        # (hash_pandas_object would factorize the column again for every key)
+        codes, uniques = pd.factorize(s, use_na_sentinel=False)
+        uniques = pd.Series(uniques, dtype=object)
+        return [pd.util.hash_pandas_object(uniques, index=False, hash_key=k).to_numpy()[codes]
+                for k in _HASH_KEYS]
+    hashes = [pd.util.hash_pandas_object(s, index=False, hash_key=k).to_numpy() for k in _HASH_KEYS]
+    if s.dtype == object:
+        # Object values are hashed through their string form: tag each value's
+        # type so 1 and "1" (or True and "True") get different keys
+        types = s.map(lambda v: type(v).__name__)
+        hashes.append(pd.util.hash_pandas_object(types, index=False).to_numpy())
+    return hashes
+
+
+def frame_keys(version: str, df: pd.DataFrame) -> list:
+    """
+    Per-row keys for a batch: a 128-bit blake2b digest over each row's
+    per-column hashes (two independently keyed 64-bit pandas hashes per
+    column, plus value types for mixed object columns), with columns in
+    sorted order and namespaced by the column/dtype schema (scores can
+    depend on the dtype a column was parsed with).
+    """
+    cols = sorted(df.columns, key=str)
+    parts = []
+    for c in cols:
+        s = df[c]
+        if s.dtype == object:
+            none_mask = s.to_numpy() == None  # noqa: E711 — elementwise test for None
+            if none_mask.any():
+                s = s.where(~none_mask, _NONE_SENTINEL)
+        parts.extend(_column_hashes(s))
+    schema = hashlib.blake2b(
+        repr([(str(c), str(df[c].dtype)) for c in cols]).encode(), digest_size=8
+    ).hexdigest()
+    rows = np.ascontiguousarray(np.column_stack(parts)) if parts else np.zeros((len(df), 0), np.uint64)
+    width = rows.shape[1] * 8
+    buf = rows.tobytes()
+    return [(version, schema, hashlib.blake2b(buf[i * width:(i + 1) * width], digest_size=16).digest())
+            for i in range(len(df))]
+
+
+class PredictionCache:
+    """
+    Thread-safe in-process LRU cache with per-entry TTL for positive-class
+    probabilities. Keys carry the model version and the whole cache is
+    cleared when a new model is swapped in.
+    """
+
+    def __init__(self, maxsize: int = PREDICTION_CACHE_SIZE, ttl: float = PREDICTION_CACHE_TTL_S):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: list) -> list:
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                elif entry[0] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    out.append(entry[1])
+        return out
+
+    def put(self, key, value):
+        self.put_many([key], [value])
+
+    def put_many(self, keys: list, values):
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def on_model_swap(self, old, new):
+        """
+        ModelHolder listener: drop everything scored by the previous version.
+        """
+        if old is not None:
+            self.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def cached_scores(cache: PredictionCache, keys: list, score_missing) -> np.ndarray:
+    """
+    Looks up every key and calls `score_missing(positions)` only for the
+    misses. Returns the full probability array in input order.
+    """
+    found = cache.get_many(keys)
+    proba = np.empty(len(keys), dtype=np.float64)
+    missing = [i for i, v in enumerate(found) if v is None]
+    for i, v in enumerate(found):
+        if v is not None:
+            proba[i] = v
+    if missing:
+        fresh = np.asarray(score_missing(missing), dtype=np.float64)
+        proba[missing] = fresh
+        cache.put_many([keys[i] for i in missing], fresh.tolist())
+    return proba
@@ -0,0 +1,143 @@
+import gc
+import os
+import re
+
+import joblib
+import numpy as np
+
+from .metrics import gauge_lines
+
+PREFORK_MMAP = os.getenv("PREFORK_MMAP", "1") == "1"
+PREFORK_MMAP_DIR = os.getenv("PREFORK_MMAP_DIR", os.path.join("models", "mmap"))
+
+
+# ─────────────────────────────────────────────
+# Memory-mapped model copies
+# ─────────────────────────────────────────────
+def _array_bytes(obj, seen=None) -> dict:
+    """
+    Walks estimator attributes and totals NumPy bytes that are file-backed
+    (np.memmap) vs. on the heap. Arrays held inside extension types (e.g.
+    sklearn tree nodes, which are copied on unpickle anyway) are not seen.
+    """
+    seen = set() if seen is None else seen
+    totals = {"mmap": 0, "heap": 0}
+    if id(obj) in seen:
+        return totals
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        base = obj
+        while isinstance(base, np.ndarray) and not isinstance(base, np.memmap) and base.base is not None:
+            base = base.base
+        totals["mmap" if isinstance(base, np.memmap) else "heap"] += obj.nbytes
+        return totals
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        children = vars(obj).values()
+    else:
+        return totals
+    for child in children:
+        sub = _array_bytes(child, seen)
+        totals["mmap"] += sub["mmap"]
+        totals["heap"] += sub["heap"]
+    return totals
+
+
+def mmap_copy(obj, name: str, version: str, root: str = PREFORK_MMAP_DIR):
+    """
+    Dumps `obj` with joblib and loads it back with mmap_mode="r". Numeric
+    arrays then live in the page cache and are shared by every process on
+    the box; object arrays (e.g. one-hot vocabularies of str) stay on the
+    heap and are shared copy-on-write after fork. Older dumps of `name`
+    are removed (processes still mapping them keep their pages).
+    """
+    os.makedirs(root, exist_ok=True)
+    prefix = re.sub(r"[^A-Za-z0-9_.-]", "_", name) + "-"
+    path = os.path.join(root, prefix + re.sub(r"[^A-Za-z0-9_.-]", "_", str(version)) + ".joblib")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+    for fn in os.listdir(root):
+        stale = os.path.join(root, fn)
+        if fn.startswith(prefix) and fn.endswith(".joblib") and stale != path:
+            os.remove(stale)
+    return joblib.load(path, mmap_mode="r")
+
+
+def share_models(holder):
+    """
+    Re-installs the live snapshot (served preprocessor, model, compiled
+    scorer and validator, as already built) from one memory-mapped copy.
+    Returns the {"mmap": bytes, "heap": bytes} split of the NumPy arrays
+    the installed snapshot serves from.
+    """
+    live = holder.peek()
+    shared = mmap_copy(live, f"{holder.preprocessor_name}+{holder.model_name}", live.version)
+    holder.install_built(shared)
+
+    totals = _array_bytes(holder.peek())
+    print(f"🗺️ {totals['mmap'] / 1e3:.1f} kB of served model arrays memory-mapped from {PREFORK_MMAP_DIR} "
+          f"({totals['heap'] / 1e3:.1f} kB on the heap, mostly object arrays)")
+    return totals
+
+
+# ─────────────────────────────────────────────
+# gunicorn hooks (see gunicorn.conf.py)
+# ─────────────────────────────────────────────
+def prepare_master(holder):
+    """
+    Loads the Production pair in the gunicorn master before workers fork,
+    optionally moves its arrays to memory-mapped files, and freezes the GC
+    so collections in workers do not write to (and un-share) the pages
+    holding the preloaded objects.
+    """
+    try:
+        # refresh() loads without starting the poller thread in the master
+        holder.refresh()
+        if PREFORK_MMAP:
+            share_models(holder)
+    except Exception as e:
+        print(f"⚠️ Pre-fork model load failed, workers will load lazily: {e}")
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 Froze {gc.get_freeze_count()} objects before forking workers")
+
+
+def after_fork(holder):
+    holder.after_fork()
+
+
+# ─────────────────────────────────────────────
+# Worker memory
+# ─────────────────────────────────────────────
+def process_memory(pid: int = None) -> dict:
+    """
+    RSS, USS (private), PSS (proportional share) and shared bytes for a
+    process. USS is what each extra worker really costs; USS/PSS are only
+    available on Linux.
+    """
+    import psutil
+
+    proc = psutil.Process(pid)
+    try:
+        info = proc.memory_full_info()
+    except (psutil.AccessDenied, AttributeError):
+        info = proc.memory_info()
+    return {
+        "pid": proc.pid,
+        "rss": info.rss,
+        "uss": getattr(info, "uss", None),
+        "pss": getattr(info, "pss", None),
+        "shared": getattr(info, "shared", None),
+    }
+
+
+def memory_gauges() -> list:
+    mem = process_memory()
+    samples = [({"kind": k}, v) for k, v in mem.items() if k != "pid" and v is not None]
+    return gauge_lines("lead_scoring_process_memory_bytes",
+                       "Memory of this worker process (rss, uss, pss, shared).", samples)
@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .prediction import holder, score_frame_cached, save_preprocessed_features
+from .serialization import id_column
+
+UPLOAD_TOP_K_MAX = int(os.getenv("UPLOAD_TOP_K_MAX", "10000"))
+
+
+class RankingError(ValueError):
+    """
+    Raised for an invalid ?top_k= value.
+    """
+
+
+def parse_top_k(value):
+    """
+    Returns K from a query value, None when absent.
+    """
+    if value in (None, ""):
+        return None
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise RankingError("top_k must be an integer")
+    if not 1 <= k <= UPLOAD_TOP_K_MAX:
+        raise RankingError(f"top_k must be between 1 and {UPLOAD_TOP_K_MAX}")
+    return k
+
+
+def top_k_indices(scores: np.ndarray, k: int, rows: np.ndarray = None) -> np.ndarray:
+    """
+    Positions of the k largest scores, best first (ties: lower `rows`
+    value first, default position). O(n) partial selection with
+    np.argpartition; only the k winners are sorted.
+    """
+    n = len(scores)
+    rows = np.arange(n) if rows is None else rows
+    if k >= n:
+        idx = np.arange(n)
+    else:
+        # argpartition picks arbitrary members of a tie at the cut-off, so
+        # take everything above it and fill up with the lowest-row ties:
+        # merged chunk results then equal one full sort of the file.
+        cutoff = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > cutoff)
+        ties = np.flatnonzero(scores == cutoff)
+        ties = ties[np.argsort(rows[ties], kind="stable")[: k - len(above)]]
+        idx = np.concatenate([above, ties])
+    return idx[np.lexsort((rows[idx], -scores[idx]))]
+
+
+class TopK:
+    """
+    Running top-K over scored chunks. Each push keeps only the best k of
+    (current winners + new chunk), so memory stays O(k + chunk) however
+    many rows stream through.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.rows_scored = 0
+        self.rows_rejected = 0
+        self.id_column = None
+        self.rows = np.empty(0, dtype=np.int64)
+        self.scores = np.empty(0, dtype=np.float64)
+        self.ids = np.empty(0, dtype=object)
+
+    def push(self, scores, ids=None):
+        scores = np.asarray(scores, dtype=np.float64)
+        n = len(scores)
+        rows = np.arange(self.rows_scored, self.rows_scored + n, dtype=np.int64)
+        self.rows_scored += n
+        # NaN = rejected by input validation: counted, never ranked
+        valid = ~np.isnan(scores)
+        if not valid.all():
+            self.rows_rejected += int(n - valid.sum())
+            scores, rows = scores[valid], rows[valid]
+            ids = np.asarray(ids, dtype=object)[valid] if ids is not None else None
+
+        best = top_k_indices(scores, self.k)
+        ids = np.asarray(ids, dtype=object)[best] if ids is not None else rows[best].astype(object)
+
+        rows = np.concatenate([self.rows, rows[best]])
+        scores = np.concatenate([self.scores, scores[best]])
+        ids = np.concatenate([self.ids, ids])
+        keep = top_k_indices(scores, self.k, rows)
+        self.rows, self.scores, self.ids = rows[keep], scores[keep], ids[keep]
+
+    def push_frame(self, df: pd.DataFrame, scores):
+        """
+        Pushes a scored chunk, taking ids from its UPLOAD_ID_COLUMNS column
+        (row numbers when there is none).
+        """
+        col = id_column(df)
+        if col is not None:
+            self.id_column = str(col)
+            ids = df[col].astype(object).where(df[col].notna(), None).to_numpy()
+        else:
+            ids = None
+        self.push(scores, ids)
+
+    def result(self) -> dict:
+        return {
+            "top_k": self.k,
+            "rows_scored": self.rows_scored,
+            "rows_rejected": self.rows_rejected,
+            "id_column": self.id_column,
+            "leads": [
+                {"rank": rank, "row": int(row), "id": _plain(lead_id), "conversion_probability": float(score)}
+                for rank, (row, lead_id, score) in enumerate(zip(self.rows, self.ids, self.scores), start=1)
+            ],
+        }
+
+
+def _plain(value):
+    # NumPy scalars -> JSON-friendly Python values
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def rank_chunks(chunks, k: int, live=None, save: bool = True) -> dict:
+    """
+    Scores each chunk (through the prediction cache) with the `live`
+    models snapshot, taken once when not given, optionally queues its
+    features for persistence, and returns the merged top-K.
+    """
+    live = live or holder.get()
+    top = TopK(k)
+    for chunk in chunks:
+        X_proc, proba = score_frame_cached(chunk, live)
+        if save:
+            save_preprocessed_features(X_proc)
+        top.push_frame(chunk, proba)
+    return top.result()
@@ -0,0 +1,82 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+UPLOAD_RESPONSE_FORMAT = os.getenv("UPLOAD_RESPONSE_FORMAT", "records")
+UPLOAD_ID_COLUMNS = [c.strip() for c in os.getenv("UPLOAD_ID_COLUMNS", "Prospect ID,Lead Number").split(",") if c.strip()]
+RESPONSE_FORMATS = ("records", "columns", "compact")
+
+# to_json rounds to 10 significant digits by default. 15 is pandas' maximum:
+# enough for any score to read back within 1e-15, but not an exact float64
+# round trip (that needs 17 significant digits)
+_PRECISION = 15
+
+
+class ResponseFormatError(ValueError):
+    """
+    Raised for an unknown ?format= value.
+    """
+
+
+def response_format(value=None) -> str:
+    fmt = (value or UPLOAD_RESPONSE_FORMAT).strip().lower()
+    if fmt not in RESPONSE_FORMATS:
+        raise ResponseFormatError(f"format must be one of {list(RESPONSE_FORMATS)}")
+    return fmt
+
+
+def _records(df: pd.DataFrame) -> str:
+    # pandas writes NaN/None/NaT as null in C, no per-row Python objects
+    return df.to_json(orient="records", double_precision=_PRECISION)
+
+
+def _columns(df: pd.DataFrame) -> str:
+    parts = [
+        f"{json.dumps(str(col))}:{df[col].to_json(orient='values', double_precision=_PRECISION)}"
+        for col in df.columns
+    ]
+    return "{" + ",".join(parts) + "}"
+
+
+def id_column(df: pd.DataFrame):
+    """
+    First column of UPLOAD_ID_COLUMNS present in `df` (case-insensitive), or None.
+    """
+    by_key = {str(c).strip().lower(): c for c in df.columns}
+    for name in UPLOAD_ID_COLUMNS:
+        if name.lower() in by_key:
+            return by_key[name.lower()]
+    return None
+
+
+def _values(values) -> str:
+    return pd.Series(np.asarray(values)).to_json(orient="values", double_precision=_PRECISION)
+
+
+def predictions_json(df: pd.DataFrame, fmt: str = "records", scores=None) -> bytes:
+    """
+    Serialises a scored upload straight to JSON bytes.
+
+    - "records": {"predictions": [{...row, "prediction": 0|1}, ...]}
+    - "columns": {"predictions": {"<col>": [...], ..., "prediction": [...]}}
+    - "compact": {"id_column": ..., "ids": [...], "scores": [...], "predictions": [...]}
+      (ids fall back to row positions when no id column is present;
+      scores are included when given).
+    """
+    if fmt == "records":
+        body = '{"predictions":' + _records(df) + "}"
+    elif fmt == "columns":
+        body = '{"predictions":' + _columns(df) + "}"
+    elif fmt == "compact":
+        id_col = id_column(df)
+        ids = df[id_col] if id_col is not None else np.arange(len(df))
+        body = '{"id_column":' + json.dumps(None if id_col is None else str(id_col))
+        body += ',"ids":' + _values(ids)
+        if scores is not None:
+            body += ',"scores":' + _values(scores)
+        body += ',"predictions":' + _values(df["prediction"]) + "}"
+    else:
+        raise ResponseFormatError(f"format must be one of {list(RESPONSE_FORMATS)}")
+    return body.encode("utf-8")
@@ -2,11 +2,249 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 
-from src.ml.data_loader.data_loader import load_csv_to_postgres
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from .metrics import stage
+from .prediction import holder, model_version, rejection_reasons
+from src.ml.data_loader.data_loader import (
+    load_csv_to_postgres, stage_csv_file_to_postgres, stage_parquet_file_to_postgres,
+)
+from src.ml.data_loader.schema import TYPED_LOAD, csv_dtypes
 
-def handle_csv_upload(filepath: str, table_name: str):
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "5000"))
+
+# Arrow bool columns are yes/no flags ("Do Not Email", ...), spelled the
+# way the CSV export and the fitted OneHotEncoder categories spell them
+BOOL_STRINGS = ("Yes", "No")
+
+# File extension → upload format
+UPLOAD_FORMATS = {
+    "csv": "csv",
+    "parquet": "parquet",
+    "pq": "parquet",
+    "arrow": "arrow",
+    "feather": "arrow",
+    "ipc": "arrow",
+}
+
+
+class UploadSchemaError(ValueError):
+    """
+    Raised when an uploaded file's columns do not match what the preprocessor expects.
+    """
+
+def upload_format(filename: str):
+    """
+    Returns "csv", "parquet" or "arrow" for an allowed filename, else None.
+    """
+    if "." not in filename:
+        return None
+    return UPLOAD_FORMATS.get(filename.rsplit(".", 1)[1].lower())
+
+def upload_csv_dtypes(filepath: str, typed: bool = TYPED_LOAD) -> dict:
+    """
+    Dtypes for every column of the CSV at `filepath`, fixed once from its
+    header and the lead schema (see schema.csv_dtypes).
+    """
+    return csv_dtypes(pd.read_csv(filepath, nrows=0).columns, typed)
+
+def handle_csv_upload(filepath: str, table_name: str, stream: bool = False):
     """
     Loads the CSV at `filepath` into Postgres table `table_name`.
+    With `stream`, the file is staged without being re-read into memory,
+    the table created from the same dtypes `iter_csv_chunks` parses with.
     """
+    if stream:
+        stage_csv_file_to_postgres(filepath, table_name, upload_csv_dtypes(filepath), if_exists="replace")
+        return
     # Delegates to your shared utility
     load_csv_to_postgres(filepath, table_name, if_exists="replace")
+
+def _to_numbers(s: pd.Series) -> pd.Series:
+    values = pd.to_numeric(s, errors="coerce")
+    bad = values.isna() & s.notna()
+    # keep unparseable text (object column) for the validator to reject
+    return s.where(bad, values) if bad.any() else values
+
+def iter_csv_chunks(filepath: str, chunksize: int = UPLOAD_CHUNK_ROWS, typed: bool = TYPED_LOAD):
+    """
+    Yields the CSV at `filepath` as DataFrames of at most `chunksize` rows,
+    every chunk parsed with the same dtypes (`upload_csv_dtypes`). With
+    `typed`, the schema's text columns are categories (Yes/No included, so
+    rows echoed back keep their strings). Number columns are float64; if
+    one holds text, the rest of the file is re-read with it kept as text
+    in those rows, so they get rejected rather than failing the upload.
+    """
+    dtype = upload_csv_dtypes(filepath, typed)
+    done = 0
+    try:
+        with pd.read_csv(filepath, chunksize=chunksize, dtype=dtype) as reader:
+            for chunk in reader:
+                yield chunk
+                done += len(chunk)
+        return
+    except ValueError:
+        pass
+
+    numbers = [col for col, kind in dtype.items() if kind == "float64"]
+    dtype.update({col: "object" for col in numbers})
+    with pd.read_csv(filepath, chunksize=chunksize, dtype=dtype, skiprows=range(1, done + 1)) as reader:
+        for chunk in reader:
+            for col in numbers:
+                chunk[col] = _to_numbers(chunk[col])
+            chunk.index += done
+            yield chunk
+
+def stream_scored_chunks(chunks, predict_fn, live=None):
+    """
+    Yields NDJSON text per chunk: every input row plus its "prediction".
+    `predict_fn` is `predict_batch`-like (list of labels or {"error": ...})
+    and scores every chunk with the `live` models snapshot (taken once);
+    rows it rejects (label None) carry a "validation_errors" field.
+    Failures after the first line are reported in-band.
+    """
+    try:
+        live = live or holder.get()
+        for chunk in chunks:
+            predictions = predict_fn(chunk, live=live)
+            if isinstance(predictions, dict):
+                yield json.dumps(predictions) + "\n"
+                return
+            # nullable ints: a rejected row must not turn the column into floats
+            chunk["prediction"] = pd.array(predictions, dtype="Int8")
+            rejected = np.array([p is None for p in predictions])
+            reasons = rejection_reasons(chunk, rejected, live) if rejected.any() else None
+            if reasons is not None:
+                chunk["validation_errors"] = reasons
+            with stage("serialization", model_version()):
+                body = chunk.to_json(orient="records", lines=True)
+            yield body if body.endswith("\n") else body + "\n"
+    except Exception as e:
+        # Headers are already sent; report the failure in-band
+        yield json.dumps({"error": str(e)}) + "\n"
+
+# ─────────────────────────────────────────────
+# Parquet / Arrow IPC uploads
+# ─────────────────────────────────────────────
+def open_arrow_table(filepath: str, fmt: str) -> pa.Table:
+    """
+    Memory-maps a Parquet or Arrow IPC (file or stream format) upload.
+    No text parsing or dtype inference happens here.
+    """
+    if fmt == "parquet":
+        return pq.read_table(filepath, memory_map=True)
+    source = pa.memory_map(filepath)
+    try:
+        return ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return ipc.open_stream(source).read_all()
+
+def input_schema(preprocessor) -> dict:
+    """
+    Maps each raw column the preprocessing ColumnTransformer consumes to
+    "numeric" or "string" (columns feeding a OneHotEncoder). Returns {}
+    for pipelines without a `preprocessing` ColumnTransformer.
+    """
+    ct = dict(getattr(preprocessor, "named_steps", {})).get("preprocessing")
+    if not hasattr(ct, "transformers_"):
+        return {}
+    schema = {}
+    for name, trans, cols in ct.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        last = trans.steps[-1][1] if hasattr(trans, "steps") else trans
+        kind = "string" if type(last).__name__ == "OneHotEncoder" else "numeric"
+        for col in cols:
+            schema[str(col)] = kind
+    return schema
+
+def _arrow_kind(dtype: pa.DataType) -> str:
+    if pa.types.is_dictionary(dtype):
+        dtype = dtype.value_type
+    if pa.types.is_null(dtype):
+        return "null"
+    if pa.types.is_boolean(dtype):
+        return "boolean"
+    if pa.types.is_integer(dtype) or pa.types.is_floating(dtype) or pa.types.is_decimal(dtype):
+        return "numeric"
+    if pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+        return "string"
+    return str(dtype)
+
+def check_upload_schema(schema: pa.Schema, expected: dict):
+    """
+    Checks an Arrow schema against `input_schema(...)`. Names are compared
+    the way feature engineering normalises them (strip + lower); extra
+    columns are allowed; bool columns pass as string (see BOOL_STRINGS).
+    Raises UploadSchemaError listing every problem.
+    """
+    if not expected:
+        return
+    found, problems = {}, []
+    for field in schema:
+        key = field.name.strip().lower()
+        if key in found:
+            problems.append(f"duplicate column '{field.name}'")
+        found[key] = field
+
+    missing = [col for col in expected if col not in found]
+    if missing:
+        problems.append(f"missing columns: {missing}")
+    for col, kind in expected.items():
+        field = found.get(col)
+        if field is None:
+            continue
+        actual = _arrow_kind(field.type)
+        if actual == "boolean" and kind == "string":
+            continue
+        if actual not in (kind, "null"):
+            problems.append(f"column '{field.name}' is {field.type}, expected {kind}")
+    if problems:
+        raise UploadSchemaError("; ".join(problems))
+
+def table_to_frame(table: pa.Table, self_destruct: bool = True) -> pd.DataFrame:
+    """
+    Converts an Arrow table to pandas the way the CSV path would see it:
+    bool columns become "Yes"/"No" and string nulls become NaN (not None),
+    so they are encoded and imputed identically. With self_destruct the
+    table is unusable afterwards but peak memory stays close to one copy.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_boolean(field.type):
+            table = table.set_column(i, field.name, pc.if_else(table.column(i), *BOOL_STRINGS))
+    df = table.to_pandas(split_blocks=True, self_destruct=self_destruct)
+    obj = df.select_dtypes(include="object").columns
+    if len(obj):
+        df[obj] = df[obj].where(df[obj].notna(), np.nan)
+    return df
+
+def iter_table_chunks(table: pa.Table, chunksize: int = UPLOAD_CHUNK_ROWS):
+    """
+    Yields an Arrow table as DataFrames of at most `chunksize` rows.
+    """
+    for batch in table.to_batches(max_chunksize=chunksize):
+        yield table_to_frame(pa.Table.from_batches([batch]), self_destruct=False)
+
+def handle_columnar_upload(filepath: str, fmt: str, table: pa.Table, table_name: str):
+    """
+    Loads a Parquet / Arrow IPC upload into Postgres table `table_name`.
+    Arrow IPC is rewritten as Parquet first because COPY cannot read it.
+    """
+    schema_df = table.schema.empty_table().to_pandas()
+    if fmt == "parquet":
+        stage_parquet_file_to_postgres(filepath, table_name, schema_df, if_exists="replace")
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix=".parquet", dir=os.path.dirname(filepath) or ".")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path)
+        stage_parquet_file_to_postgres(tmp_path, table_name, schema_df, if_exists="replace")
+    finally:
+        os.remove(tmp_path)
@@ -7,6 +7,7 @@ import pandas as pd
 from dotenv import load_dotenv
 from sqlalchemy import text
 from src.db.db_utils import get_db_engine
+from src.ml.data_loader.schema import LOAD_CHUNK_ROWS, TYPED_LOAD, compact_frame, read_sql_typed
 
 load_dotenv()
 
@@ -16,20 +17,34 @@ aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
 aws_region = os.getenv("AWS_REGION", "us-east-1")  # default region
 iam_role = os.getenv("REDSHIFT_IAM_ROLE")  # Must be provided in .env
 
-def load_data_from_postgres(table_name: str) -> pd.DataFrame:
+def load_data_from_postgres(table_name: str, typed: bool = TYPED_LOAD) -> pd.DataFrame:
     """
     Load data from Redshift using shared engine.
+    With `typed`, columns get compact dtypes while reading (see schema.py).
     """
     try:
         engine = get_db_engine()
         with engine.connect() as conn:
-            df = pd.read_sql(f'SELECT * FROM {table_name}', conn)
+            query = f'SELECT * FROM {table_name}'
+            df = read_sql_typed(query, conn, label=f"'{table_name}' memory") if typed else pd.read_sql(query, conn)
         print(f"[INFO] Loaded data from '{table_name}', shape: {df.shape}")
         return df
     except Exception as e:
         raise RuntimeError(f"[ERROR] Cannot load data from Redshift: {e}")
 
 
+def iter_data_from_postgres(table_name: str, chunksize: int = LOAD_CHUNK_ROWS, typed: bool = TYPED_LOAD):
+    """
+    Yields `table_name` in frames of `chunksize` rows read through a
+    server-side cursor, so only one chunk is in memory at a time.
+    With `typed`, each chunk gets compact dtypes (see schema.py).
+    """
+    engine = get_db_engine()
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(f'SELECT * FROM {table_name}', conn, chunksize=chunksize):
+            yield compact_frame(chunk) if typed else chunk
+
+
 def load_csv_to_postgres(csv_path: str, table_name: str, if_exists: str = "replace"):
     """
     Uploads CSV to S3 and loads it into Redshift using COPY.
@@ -53,22 +68,100 @@ def load_csv_to_postgres(csv_path: str, table_name: str, if_exists: str = "repla
     s3.put_object(Bucket=bucket, Key=s3_key, Body=buffer.getvalue())
     print(f"[INFO] Uploaded CSV to {s3_path}")
 
-    # Load into Redshift
-    engine = get_redshift_engine()
+    _copy_s3_file_into_table(s3_path, table_name, df.head(0), if_exists)
+
+
+def stage_csv_file_to_postgres(
+    csv_path: str,
+    table_name: str,
+    dtypes: dict,
+    if_exists: str = "replace"
+):
+    """
+    Streams a CSV file to S3 as-is and COPYs it into Redshift without
+    parsing it with pandas, so memory stays flat for large uploads.
+
+    Args:
+        csv_path (str): Local path to CSV.
+        table_name (str): Redshift table name.
+        dtypes (dict): {column: dtype} for every column in file order, the
+            same fixed dtypes the file is parsed with (schema.csv_dtypes);
+            they create the table, categories as text.
+        if_exists (str): 'replace' or 'append'.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found at: {csv_path}")
+
+    s3_key = f"tmp/{table_name}.csv"
+    s3_path = f"s3://{bucket}/{s3_key}"
+
+    # upload_file streams from disk (multipart for large files)
+    s3 = boto3.client("s3")
+    s3.upload_file(csv_path, bucket, s3_key)
+    print(f"[INFO] Uploaded CSV to {s3_path}")
+
+    schema = pd.DataFrame({col: pd.Series(dtype="object" if dtype == "category" else dtype)
+                           for col, dtype in dtypes.items()})
+    _copy_s3_file_into_table(s3_path, table_name, schema, if_exists)
+
+
+def stage_parquet_file_to_postgres(
+    parquet_path: str,
+    table_name: str,
+    schema_df: pd.DataFrame,
+    if_exists: str = "replace"
+):
+    """
+    Streams a Parquet file to S3 as-is and COPYs it into Redshift
+    (FORMAT AS PARQUET), so no text parsing happens on either side.
+
+    Args:
+        parquet_path (str): Local path to the Parquet file.
+        table_name (str): Redshift table name.
+        schema_df (pd.DataFrame): Empty frame with the file's columns/dtypes,
+            in file order (Parquet COPY maps columns by position).
+        if_exists (str): 'replace' or 'append'.
+    """
+    if not os.path.exists(parquet_path):
+        raise FileNotFoundError(f"Parquet file not found at: {parquet_path}")
+
+    s3_key = f"tmp/{table_name}.parquet"
+    s3_path = f"s3://{bucket}/{s3_key}"
+
+    s3 = boto3.client("s3")
+    s3.upload_file(parquet_path, bucket, s3_key)
+    print(f"[INFO] Uploaded Parquet to {s3_path}")
+
+    _copy_s3_file_into_table(s3_path, table_name, schema_df.head(0), if_exists, file_format="parquet")
+
+
+def _copy_s3_file_into_table(s3_path: str, table_name: str, schema_df: pd.DataFrame, if_exists: str,
+                             file_format: str = "csv"):
+    """
+    Creates `table_name` from the (empty) schema frame and COPYs the CSV
+    (or Parquet, with file_format="parquet") object at `s3_path` into it.
+    """
+    if file_format == "csv":
+        format_sql = "FORMAT AS CSV\n            IGNOREHEADER 1"
+    elif file_format == "parquet":
+        format_sql = "FORMAT AS PARQUET"
+    else:
+        raise ValueError("file_format must be 'csv' or 'parquet'.")
+
+    engine = get_db_engine()
     with engine.connect() as conn:
         if if_exists == "replace":
             conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
 
         # Create table automatically using Pandas dtype mapping
-        df.head(0).to_sql(table_name, engine, index=False, if_exists="append")
+        schema_df.to_sql(table_name, engine, index=False, if_exists="append")
 
         # COPY from S3 to Redshift
         copy_sql = text(f"""
             COPY {table_name}
             FROM '{s3_path}'
             IAM_ROLE '{iam_role}'
-            FORMAT AS CSV
-            IGNOREHEADER 1
+            {format_sql}
             REGION '{aws_region}';
         """)
         conn.execute(copy_sql)
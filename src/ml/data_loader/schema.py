@@ -0,0 +1,187 @@
+# src/ml/data_loader/schema.py
+"""
+Typed loading for lead data: the column types in lead_data_schema.txt decide
+how each column is held in memory. Text becomes `category`, Yes/No flags
+become booleans, integers the smallest integer type and floats float32 where
+that loses nothing. `FeatureEngineeringTransformer` maps these back to the
+dtypes the preprocessor was fitted on.
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+SCHEMA_PATH = os.getenv("LEAD_SCHEMA_PATH", os.path.join(REPO_ROOT, "lead_data_schema.txt"))
+TYPED_LOAD = os.getenv("TYPED_LOAD", "1") == "1"
+LOAD_CHUNK_ROWS = int(os.getenv("LOAD_CHUNK_ROWS", "50000"))
+
+ID_COLUMNS = ("Prospect ID", "Lead Number")
+YES_NO = ("No", "Yes")
+# Object columns with more distinct values than this share of rows stay
+# strings: categories would only add a codes array on top of them
+MAX_CATEGORY_RATIO = 0.5
+
+_PG_KINDS = {"text": "text", "bigint": "int", "integer": "int", "double precision": "float", "real": "float"}
+
+
+def _schema_rows(path: str):
+    # [column, type, collation, nullable, ...] for each column line of the dump
+    with open(path) as f:
+        for line in f:
+            parts = [p.strip() for p in line.split("|")]
+            if len(parts) < 2 or parts[0] in ("", "Column") or set(parts[0]) <= {"-", "+"}:
+                continue
+            yield parts
+
+
+def read_schema(path: str = SCHEMA_PATH) -> list:
+    """
+    Parses the psql `\\d+` dump into [(column, kind), ...] with kind one of
+    "text", "int", "float".
+    """
+    columns = []
+    for parts in _schema_rows(path):
+        kind = _PG_KINDS.get(parts[1])
+        if kind is None:
+            raise ValueError(f"Unsupported type {parts[1]!r} for column {parts[0]!r}")
+        columns.append((parts[0], kind))
+    return columns
+
+
+def not_null_columns(path: str = SCHEMA_PATH) -> list:
+    """Columns the dump declares `not null`."""
+    return [parts[0] for parts in _schema_rows(path) if len(parts) > 3 and parts[3].lower() == "not null"]
+
+
+def _key(col) -> str:
+    return str(col).strip().lower()
+
+
+@lru_cache(maxsize=8)
+def schema_kinds(path: str = SCHEMA_PATH) -> dict:
+    """{normalised column name: kind}, read once per schema file."""
+    return {_key(col): kind for col, kind in read_schema(path)}
+
+
+_ID_KEYS = {_key(col) for col in ID_COLUMNS}
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def log_memory(label: str, before: float, after: float):
+    ratio = before / after if after else float("inf")
+    print(f"[INFO] {label}: {before:.1f} MB → {after:.1f} MB ({ratio:.1f}x smaller)")
+
+
+def csv_dtypes(columns, typed: bool = True, path: str = SCHEMA_PATH) -> dict:
+    """
+    read_csv `dtype=` fixing every column of a file with these header names,
+    so all chunks (and the staging table) share one set of dtypes whatever
+    rows a chunk holds. Schema numbers are float64 (ints may be missing);
+    everything else is text: categories for the schema's text columns with
+    `typed` (ids excepted), else object.
+    """
+    kinds = schema_kinds(path)
+    dtypes = {}
+    for col in columns:
+        kind = kinds.get(_key(col))
+        if kind in ("int", "float"):
+            dtypes[col] = "float64"
+        elif typed and kind == "text" and _key(col) not in _ID_KEYS:
+            dtypes[col] = "category"
+        else:
+            dtypes[col] = "object"
+    return dtypes
+
+
+def _compact_text(s: pd.Series, yes_no: str, is_id: bool) -> pd.Series:
+    if is_id and not isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    # one hashing pass gives both the distinct values and the codes
+    cat = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+    categories = cat.cat.categories
+    if len(categories) and set(categories) <= set(YES_NO):
+        if yes_no == "boolean":
+            return (cat == "Yes").astype("boolean").mask(cat.isna())
+        return cat.cat.set_categories(list(YES_NO))
+    if cat is not s and len(categories) > MAX_CATEGORY_RATIO * len(s):
+        return s
+    return cat
+
+
+def _compact_number(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_integer_dtype(s.dtype):
+        return pd.to_numeric(s, downcast="integer")
+    if s.dtype == np.float64:
+        narrow = s.astype(np.float32)
+        # only when every value (NaN included) survives the round trip
+        if np.array_equal(narrow.to_numpy(np.float64), s.to_numpy(), equal_nan=True):
+            return narrow
+    return s
+
+
+def compact_frame(df: pd.DataFrame, yes_no: str = "boolean", numeric: bool = True,
+                  path: str = SCHEMA_PATH) -> pd.DataFrame:
+    """
+    Copy of `df` with compact dtypes. Text columns (schema "text", or any
+    object column) become categories unless they are ids or mostly distinct;
+    columns holding only Yes/No become nullable booleans (yes_no="boolean")
+    or a No/Yes category (yes_no="category", keeps the strings for callers
+    that echo rows back). With numeric=True integers are downcast and
+    floats become float32 when lossless.
+    """
+    kinds = schema_kinds(path)
+    out = df.copy(deep=False)
+    for i, col in enumerate(df.columns):
+        s = df.iloc[:, i]
+        kind = kinds.get(_key(col))
+        if s.dtype == object or isinstance(s.dtype, pd.CategoricalDtype):
+            new = _compact_text(s, yes_no, _key(col) in _ID_KEYS)
+        elif numeric and kind != "text" and pd.api.types.is_numeric_dtype(s.dtype) \
+                and not pd.api.types.is_bool_dtype(s.dtype):
+            new = _compact_number(s)
+        else:
+            continue
+        if new is not s:
+            out.isetitem(i, new)
+    return out
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    """
+    pd.concat for typed chunks: category columns get the union of the
+    chunks' categories first, otherwise pandas falls back to object.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    for i in range(frames[0].shape[1]):
+        columns = [f.iloc[:, i] for f in frames]
+        if all(isinstance(s.dtype, pd.CategoricalDtype) for s in columns):
+            categories = columns[0].cat.categories
+            for s in columns[1:]:
+                categories = categories.union(s.cat.categories)
+            for f, s in zip(frames, columns):
+                f.isetitem(i, s.cat.set_categories(categories))
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_sql_typed(query: str, conn, chunksize: int = LOAD_CHUNK_ROWS, label: str = "Typed load") -> pd.DataFrame:
+    """
+    pd.read_sql in chunks, each chunk's text columns turned into categories
+    before the next is fetched, then compacted as a whole. Prints the
+    untyped (object/int64/float64) and typed memory.
+    """
+    before, frames = 0.0, []
+    for chunk in pd.read_sql(query, conn, chunksize=chunksize):
+        before += memory_mb(chunk)
+        frames.append(compact_frame(chunk, yes_no="category", numeric=False))
+    if not frames:
+        return pd.read_sql(query, conn)
+    df = compact_frame(concat_frames(frames))
+    log_memory(label, before, memory_mb(df))
+    return df
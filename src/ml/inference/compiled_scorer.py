@@ -0,0 +1,329 @@
+# src/ml/inference/compiled_scorer.py
+
+import math
+import numbers
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+from src.ml.pipeline.feature_engineering import FeatureEngineeringTransformer
+from src.ml.pipeline.feature_selector import FeatureSelector
+from src.ml.pipeline.preprocessing import is_float32_cast
+
+# Raw columns FeatureEngineeringTransformer derives extra features from
+# (matched on the exact, un-normalised input name like the transformer does).
+_VISITS = "TotalVisits"
+_TIME = "Total Time Spent on Website"
+_DERIVED = {
+    f"{_VISITS}_is_zero".lower(),
+    f"{_TIME}_is_zero".lower(),
+    "engagementscore",
+}
+
+
+class CompiledScorer:
+    """
+    Flat NumPy/dict lookup tables compiled from a fitted
+    FeatureEngineering → ColumnTransformer → FeatureSelector pipeline.
+
+    `transform_one` maps a raw lead dict straight to the selected feature
+    vector without building a DataFrame. It returns None whenever the
+    record holds something the tables cannot reproduce bit-for-bit
+    (strings in numeric columns, non-string categories, colliding column
+    names, ...) so callers can fall back to `pipeline.transform`, and raises
+    ValueError like the pipeline when a `required` column is missing.
+    """
+
+    def __init__(self, n_out, num_cols, num_fill, num_mean, num_scale, num_dst,
+                 cat_cols, cat_fill, cat_lookup, dtype=np.float64, required=()):
+        self.n_out = n_out
+        # Output dtype of the pipeline; float32 pipelines scale in float64 and cast last
+        self.dtype = np.dtype(dtype)
+        self.num_cols = num_cols
+        self.num_fill = num_fill
+        self.num_mean = num_mean
+        self.num_scale = num_scale
+        self.num_dst = num_dst
+        self.cat_cols = cat_cols
+        self.cat_fill = cat_fill
+        self.cat_lookup = cat_lookup
+        # Every ColumnTransformer input, selected or not: the pipeline needs them all
+        self.required = list(required)
+        self.needs_derived = bool(_DERIVED & (set(num_cols) | set(cat_cols)))
+        self._key_cache = {}
+
+    # ─────────────────────────────────────────────
+    # Column-name normalisation (memoised per key set)
+    # ─────────────────────────────────────────────
+    def _normalise_keys(self, keys: tuple):
+        """(normalised name → key, required columns missing), or (None, ())."""
+        cached = self._key_cache.get(keys)
+        if cached is None:
+            mapping = {}
+            for k in keys:
+                norm = str(k).strip().lower()
+                if norm in mapping:
+                    # Duplicate columns after lowercasing: let pandas decide.
+                    return None, ()
+                mapping[norm] = k
+            # Derived features exist when their raw inputs do (exact names)
+            derivable = {f"{name}_is_zero".lower() for name in (_VISITS, _TIME) if name in keys}
+            if _VISITS in keys and _TIME in keys:
+                derivable.add("engagementscore")
+            missing = [c for c in self.required if c not in mapping and c not in derivable]
+            cached = (mapping, missing)
+            if len(self._key_cache) < 64:
+                self._key_cache[keys] = cached
+        return cached
+
+    def _derived_values(self, record: dict) -> dict:
+        out = {}
+        visits, time_spent = record.get(_VISITS), record.get(_TIME)
+        for name, val in ((_VISITS, visits), (_TIME, time_spent)):
+            if name in record:
+                out[f"{name}_is_zero".lower()] = int(val == 0)
+        if _VISITS in record and _TIME in record:
+            if _is_missing(visits) or _is_missing(time_spent):
+                return None
+            out["engagementscore"] = visits * time_spent
+        return out
+
+    # ─────────────────────────────────────────────
+    # Single-record transform
+    # ─────────────────────────────────────────────
+    def transform_one(self, record: dict):
+        mapping, missing = self._normalise_keys(tuple(record))
+        if mapping is None:
+            return None
+        if missing:
+            raise ValueError(f"columns are missing: {set(missing)}")
+
+        derived = {}
+        if self.needs_derived:
+            derived = self._derived_values(record)
+            if derived is None:
+                return None
+
+        def lookup(col):
+            if col in derived:
+                return derived[col]
+            if col not in mapping:
+                raise ValueError(f"columns are missing: {{'{col}'}}")
+            return record[mapping[col]]
+
+        x = np.zeros((1, self.n_out), dtype=np.float64)
+
+        if self.num_cols:
+            raw = np.empty(len(self.num_cols), dtype=np.float64)
+            for i, col in enumerate(self.num_cols):
+                v = lookup(col)
+                if v is None:
+                    raw[i] = np.nan
+                elif isinstance(v, (numbers.Real, np.bool_)):
+                    raw[i] = v
+                else:
+                    return None
+            missing = np.isnan(raw)
+            if missing.any():
+                raw[missing] = self.num_fill[missing]
+            x[0, self.num_dst] = (raw - self.num_mean) / self.num_scale
+
+        for col, fill, table in zip(self.cat_cols, self.cat_fill, self.cat_lookup):
+            v = lookup(col)
+            if v is None:
+                # SimpleImputer only treats NaN as missing in object columns;
+                # None reaches the encoder as an unknown category (all zeros).
+                continue
+            if isinstance(v, float) and math.isnan(v):
+                v = fill
+            elif not isinstance(v, str):
+                return None
+            dst = table.get(v)
+            if dst is not None:
+                x[0, dst] = 1.0
+
+        return x if self.dtype == np.float64 else x.astype(self.dtype)
+
+    def verify(self, pipeline, records) -> bool:
+        """
+        Check the compiled tables against `pipeline.transform` for every
+        record the fast path accepts. Returns True when all match exactly.
+        """
+        for rec in records:
+            fast = self.transform_one(rec)
+            if fast is None:
+                continue
+            slow = np.asarray(pipeline.transform(pd.DataFrame([rec])), dtype=np.float64)
+            if not np.array_equal(fast, slow, equal_nan=True):
+                return False
+        return True
+
+
+def _is_missing(v) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+def _unpack_numeric(pipe):
+    steps = [s for _, s in pipe.steps] if isinstance(pipe, Pipeline) else [pipe]
+    if steps and is_float32_cast(steps[-1]):
+        steps = steps[:-1]
+    imputer = scaler = None
+    for step in steps:
+        if isinstance(step, SimpleImputer) and imputer is None and scaler is None:
+            imputer = step
+        elif isinstance(step, StandardScaler) and scaler is None:
+            scaler = step
+        else:
+            raise ValueError(f"Unsupported numeric step: {type(step).__name__}")
+    return imputer, scaler
+
+
+def _unpack_categorical(pipe):
+    steps = [s for _, s in pipe.steps] if isinstance(pipe, Pipeline) else [pipe]
+    if not isinstance(steps[-1], OneHotEncoder) or len(steps) > 2:
+        raise ValueError("Categorical branch must end in a OneHotEncoder")
+    imputer = steps[0] if len(steps) == 2 else None
+    if imputer is not None and not isinstance(imputer, SimpleImputer):
+        raise ValueError(f"Unsupported categorical step: {type(imputer).__name__}")
+    return imputer, steps[-1]
+
+
+def _check_imputer(imputer, n_cols):
+    if imputer is None:
+        return
+    if imputer.add_indicator or not _is_missing(imputer.missing_values):
+        raise ValueError("Only NaN-imputing SimpleImputers without indicators are supported")
+    if len(imputer.statistics_) != n_cols:
+        raise ValueError("Imputer dropped empty features")
+
+
+def compile_pipeline(pipeline) -> CompiledScorer:
+    """
+    Build a CompiledScorer from a fitted inference pipeline
+    (feature_engineering → preprocessing → feature_selection).
+
+    Raises ValueError when the pipeline contains steps the scorer
+    cannot reproduce exactly.
+    """
+    steps = dict(pipeline.named_steps)
+    fe, ct, selector = (steps.get("feature_engineering"),
+                        steps.get("preprocessing"),
+                        steps.get("feature_selection"))
+    if not isinstance(fe, FeatureEngineeringTransformer) or len(steps) != 3:
+        raise ValueError("Expected feature_engineering → preprocessing → feature_selection")
+    if not isinstance(ct, ColumnTransformer) or not isinstance(selector, FeatureSelector):
+        raise ValueError("Unsupported preprocessing / selection steps")
+    if ct.remainder != "drop":
+        raise ValueError("Only remainder='drop' ColumnTransformers are supported")
+
+    # Source of every ColumnTransformer output column: (kind, column, detail)
+    sources = [None] * sum(s.stop - s.start for s in ct.output_indices_.values())
+    num_specs, cat_specs = {}, {}
+    branch_dtypes = []
+    for name, trans, cols in ct.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        cols = list(cols)
+        if not all(isinstance(c, str) for c in cols):
+            raise ValueError("ColumnTransformer columns must be given by name")
+        out = ct.output_indices_[name]
+        last = trans.steps[-1][1] if isinstance(trans, Pipeline) else trans
+        if isinstance(last, OneHotEncoder):
+            imputer, enc = _unpack_categorical(trans)
+            _check_imputer(imputer, len(cols))
+            if enc.handle_unknown != "ignore" or enc.drop is not None \
+                    or getattr(enc, "_infrequent_enabled", False):
+                raise ValueError("OneHotEncoder must use handle_unknown='ignore' and no drop/infrequent")
+            branch_dtypes.append(np.dtype(enc.dtype))
+            pos = out.start
+            for j, (col, cats) in enumerate(zip(cols, enc.categories_)):
+                if not all(isinstance(c, str) for c in cats):
+                    raise ValueError(f"Non-string categories in '{col}'")
+                fill = imputer.statistics_[j] if imputer is not None else None
+                cat_specs.setdefault(col, fill)
+                for c in cats:
+                    sources[pos] = ("cat", col, c)
+                    pos += 1
+        else:
+            imputer, scaler = _unpack_numeric(trans)
+            _check_imputer(imputer, len(cols))
+            last_step = trans.steps[-1][1] if isinstance(trans, Pipeline) else trans
+            branch_dtypes.append(np.dtype(np.float32 if is_float32_cast(last_step) else np.float64))
+            for j, col in enumerate(cols):
+                fill = float(imputer.statistics_[j]) if imputer is not None else np.nan
+                mean = float(scaler.mean_[j]) if scaler is not None and scaler.mean_ is not None else 0.0
+                scale = float(scaler.scale_[j]) if scaler is not None and scaler.scale_ is not None else 1.0
+                sources[out.start + j] = ("num", col, (fill, mean, scale))
+                num_specs[col] = True
+
+    selected = list(selector.selected_features)
+    num_cols, num_fill, num_mean, num_scale, num_dst = [], [], [], [], []
+    cat_tables = {}
+    for dst, src_idx in enumerate(selected):
+        kind, col, detail = sources[src_idx]
+        if kind == "num":
+            fill, mean, scale = detail
+            num_cols.append(col)
+            num_fill.append(fill)
+            num_mean.append(mean)
+            num_scale.append(scale)
+            num_dst.append(dst)
+        else:
+            table = cat_tables.setdefault(col, {})
+            table[detail] = table.get(detail, ()) + (dst,)
+
+    if len(set(num_cols)) != len(num_cols):
+        raise ValueError("Numeric columns selected more than once")
+    if any(c in cat_tables for c in num_cols):
+        raise ValueError("Column used as both numeric and categorical")
+
+    cat_cols = list(cat_tables)
+    return CompiledScorer(
+        n_out=len(selected),
+        num_cols=num_cols,
+        num_fill=np.asarray(num_fill, dtype=np.float64),
+        num_mean=np.asarray(num_mean, dtype=np.float64),
+        num_scale=np.asarray(num_scale, dtype=np.float64),
+        num_dst=np.asarray(num_dst, dtype=np.intp),
+        cat_cols=cat_cols,
+        cat_fill=[cat_specs[c] for c in cat_cols],
+        cat_lookup=[{k: (v[0] if len(v) == 1 else list(v)) for k, v in cat_tables[c].items()}
+                    for c in cat_cols],
+        dtype=np.result_type(*branch_dtypes) if branch_dtypes else np.float64,
+        required=[str(c) for c in ct.feature_names_in_],
+    )
+
+
+def probe_records(pipeline, raw_names: bool = False) -> list:
+    """
+    Synthetic records for `CompiledScorer.verify`: every raw input missing
+    (as None and as NaN) and one filled with the fitted imputer statistics.
+    With raw_names, also filled records that give TotalVisits / Total Time
+    Spent on Website under their raw names instead of the derived features,
+    so the feature-engineering path is compared too (these mix name styles,
+    so only use them one record at a time).
+    """
+    ct = pipeline.named_steps["preprocessing"]
+    cols = list(ct.feature_names_in_)
+    empty = {c: None for c in cols}
+    nans = {c: np.nan for c in cols}
+    filled = dict(empty)
+    for name, trans, tcols in ct.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        imputer = trans.steps[0][1] if isinstance(trans, Pipeline) else None
+        if isinstance(imputer, SimpleImputer):
+            for c, v in zip(tcols, imputer.statistics_):
+                filled[c] = v.item() if hasattr(v, "item") else v
+    records = [empty, nans, filled]
+    if raw_names:
+        base = {c: v for c, v in filled.items() if c not in _DERIVED | {_VISITS.lower(), _TIME.lower()}}
+        visits, time_spent = filled.get(_VISITS.lower()), filled.get(_TIME.lower())
+        visits = 3.0 if _is_missing(visits) else visits
+        time_spent = 300.0 if _is_missing(time_spent) else time_spent
+        for v, t in ((visits, time_spent), (0.0, time_spent), (visits, 0.0), (0.0, 0.0)):
+            records.append({**base, _VISITS: v, _TIME: t})
+    return records
@@ -0,0 +1,109 @@
+# src/ml/inference/precision.py
+
+import copy
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from src.ml.pipeline.preprocessing import float32_cast, is_float32_cast
+
+
+def to_float32_pipeline(pipeline):
+    """
+    Copy of a fitted feature_engineering → preprocessing → feature_selection
+    pipeline whose ColumnTransformer emits float32: numeric branches get a
+    trailing float32 cast (after imputing/scaling in float64) and one-hot
+    encoders emit uint8. Fitted statistics are unchanged. Idempotent.
+
+    Raises ValueError for branches it cannot convert.
+    """
+    pipeline = copy.deepcopy(pipeline)
+    ct = pipeline.named_steps.get("preprocessing")
+    if not isinstance(ct, ColumnTransformer):
+        raise ValueError("Expected a 'preprocessing' ColumnTransformer")
+    if ct.remainder != "drop":
+        raise ValueError("Only remainder='drop' ColumnTransformers are supported")
+
+    for name, trans, _ in ct.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        if not isinstance(trans, Pipeline):
+            raise ValueError(f"Branch '{name}' is not a Pipeline")
+        last = trans.steps[-1][1]
+        if isinstance(last, OneHotEncoder):
+            # sparse or dense, uint8 stacks with float32 numerics as float32
+            last.dtype = np.uint8
+        elif not is_float32_cast(last):
+            trans.steps.append(("to_float32", float32_cast()))
+    return pipeline
+
+
+def to_float32_model(model):
+    """
+    Copy of a fitted model that consumes float32 without upcasting:
+    linear models get float32 coefficients. Tree ensembles already work in
+    float32 internally and are returned as-is (they then skip their own
+    float64 → float32 input copy).
+    """
+    if hasattr(model, "coef_") and hasattr(model, "intercept_"):
+        model = copy.deepcopy(model)
+        model.coef_ = np.asarray(model.coef_, dtype=np.float32)
+        model.intercept_ = np.asarray(model.intercept_, dtype=np.float32)
+    return model
+
+
+def parity_check(reference: tuple, reduced: tuple, frame: pd.DataFrame) -> float:
+    """
+    Max absolute difference in P(converted) between a (preprocessor, model)
+    pair and its reduced-precision copy on `frame`.
+    """
+    ref_pre, ref_model = reference
+    red_pre, red_model = reduced
+    p_ref = ref_model.predict_proba(ref_pre.transform(frame))[:, 1]
+    p_red = red_model.predict_proba(red_pre.transform(frame))[:, 1]
+    return float(np.max(np.abs(p_ref.astype(np.float64) - p_red.astype(np.float64)))) if len(frame) else 0.0
+
+
+def float32_pair(preprocessor, model, frame: pd.DataFrame, tolerance: float) -> tuple:
+    """
+    Returns the float32 (preprocessor, model) pair and its measured max
+    probability difference on `frame`. Raises ValueError when the
+    difference exceeds `tolerance`.
+    """
+    reduced = (to_float32_pipeline(preprocessor), to_float32_model(model))
+    diff = parity_check((preprocessor, model), reduced, frame)
+    if diff > tolerance:
+        raise ValueError(f"float32 probabilities differ by {diff:.2e} (> {tolerance:.0e})")
+    return reduced + (diff,)
+
+
+def parity_frame(pipeline, n: int = 256, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic inputs spanning the fitted pipeline: known categories drawn at
+    random, numerics around the scaler mean, ~10% missing values.
+    """
+    rng = np.random.default_rng(seed)
+    ct = pipeline.named_steps["preprocessing"]
+    data = {}
+    for name, trans, cols in ct.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        steps = dict(trans.steps) if isinstance(trans, Pipeline) else {}
+        encoder = trans.steps[-1][1] if isinstance(trans, Pipeline) else trans
+        if isinstance(encoder, OneHotEncoder):
+            for col, cats in zip(cols, encoder.categories_):
+                values = rng.choice(np.asarray(cats, dtype=object), size=n)
+                values[rng.random(n) < 0.1] = np.nan
+                data[col] = values
+        else:
+            scaler = steps.get("scaler")
+            for j, col in enumerate(cols):
+                mean = scaler.mean_[j] if scaler is not None and scaler.mean_ is not None else 0.0
+                scale = scaler.scale_[j] if scaler is not None and scaler.scale_ is not None else 1.0
+                values = mean + scale * rng.standard_normal(n)
+                values[rng.random(n) < 0.1] = np.nan
+                data[col] = values
+    return pd.DataFrame(data, columns=list(ct.feature_names_in_))
@@ -0,0 +1,151 @@
+# src/ml/inference/pruning.py
+
+import copy
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from src.ml.pipeline.feature_selector import FeatureSelector
+from src.ml.pipeline.preprocessing import is_float32_cast
+
+
+def _steps(trans) -> list:
+    return [s for _, s in trans.steps] if isinstance(trans, Pipeline) else [trans]
+
+
+def _valid_columns(steps, n_cols: int) -> list:
+    """Input columns that reach the branch output (imputers drop all-empty ones)."""
+    imputer = steps[0] if isinstance(steps[0], SimpleImputer) else None
+    if imputer is None or imputer.keep_empty_features:
+        return list(range(n_cols))
+    return [j for j, v in enumerate(imputer.statistics_) if not pd.isna(v)]
+
+
+def _branch_outputs(trans, n_cols: int) -> list:
+    """
+    Source of every output column of a fitted branch: (input column index,
+    category) for one-hot columns, (input column index, None) for numerics.
+    """
+    steps = _steps(trans)
+    for step in steps:
+        if isinstance(step, SimpleImputer) and step.add_indicator:
+            raise ValueError("Imputers with missing indicators are not supported")
+    valid = _valid_columns(steps, n_cols)
+    last = steps[-1]
+    if isinstance(last, OneHotEncoder):
+        if last.handle_unknown != "ignore" or last.drop_idx_ is not None \
+                or getattr(last, "_infrequent_enabled", False):
+            raise ValueError("OneHotEncoder must use handle_unknown='ignore' and no drop/infrequent")
+        if len(steps) > 2 or (len(steps) == 2 and not isinstance(steps[0], SimpleImputer)):
+            raise ValueError("Categorical branch must be [imputer,] encoder")
+        return [(valid[j], c) for j, cats in enumerate(last.categories_) for c in cats]
+    for step in steps:
+        if not isinstance(step, (SimpleImputer, StandardScaler)) and not is_float32_cast(step):
+            raise ValueError(f"Unsupported numeric step: {type(step).__name__}")
+    return [(j, None) for j in valid]
+
+
+def _copy_fitted_state(old, new, keep: list, valid: list):
+    """Moves the fitted statistics of the kept input columns onto `new`."""
+    pos = [valid.index(j) for j in keep]
+    for old_step, new_step in zip(_steps(old), _steps(new)):
+        if isinstance(old_step, SimpleImputer):
+            new_step.statistics_ = old_step.statistics_[keep]
+        elif isinstance(old_step, StandardScaler):
+            for attr in ("mean_", "var_", "scale_"):
+                value = getattr(old_step, attr)
+                setattr(new_step, attr, None if value is None else value[pos])
+            seen = old_step.n_samples_seen_
+            new_step.n_samples_seen_ = seen[pos] if np.ndim(seen) else seen
+
+
+def prune_pipeline(pipeline):
+    """
+    Copy of a fitted feature_engineering → preprocessing → feature_selection
+    pipeline whose ColumnTransformer only imputes, scales and encodes the
+    columns and categories kept by the FeatureSelector; unused raw columns
+    are no longer read. Outputs are unchanged (check with `same_outputs`).
+
+    Raises ValueError for pipelines it cannot prune.
+    """
+    pipeline = copy.deepcopy(pipeline)
+    steps = dict(pipeline.named_steps)
+    ct, selector = steps.get("preprocessing"), steps.get("feature_selection")
+    if not isinstance(ct, ColumnTransformer) or not isinstance(selector, FeatureSelector):
+        raise ValueError("Expected 'preprocessing' ColumnTransformer and 'feature_selection' FeatureSelector")
+    if ct.remainder != "drop":
+        raise ValueError("Only remainder='drop' ColumnTransformers are supported")
+
+    selected = np.asarray(selector.selected_features, dtype=np.intp)
+    kept = np.unique(selected)
+
+    # Kept inputs per branch, and a tiny frame that makes each encoder learn
+    # exactly the kept categories (in their original, sorted order)
+    branches, dummy = [], {}
+    for name, trans, cols in ct.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        cols = list(cols)
+        if not all(isinstance(c, str) for c in cols):
+            raise ValueError("ColumnTransformer columns must be given by name")
+        out = ct.output_indices_[name]
+        sources = _branch_outputs(trans, len(cols))
+        used = {}
+        for idx in kept[(kept >= out.start) & (kept < out.stop)]:
+            j, cat = sources[idx - out.start]
+            used.setdefault(j, []).append(cat)
+        if not used:
+            continue
+        keep = sorted(used)
+        branches.append((name, trans, [cols[j] for j in keep], keep,
+                         _valid_columns(_steps(trans), len(cols))))
+        for j in keep:
+            cats = used[j]
+            dummy[cols[j]] = np.asarray(cats, dtype=object) if cats[0] is not None else np.zeros(1)
+
+    n = max((len(v) for v in dummy.values()), default=1)
+    frame = pd.DataFrame({c: np.resize(v, n) for c, v in dummy.items()})
+    pruned = ColumnTransformer(
+        [(name, clone(trans), names) for name, trans, names, _, _ in branches],
+        remainder="drop",
+        sparse_threshold=ct.sparse_threshold,
+        verbose_feature_names_out=ct.verbose_feature_names_out,
+    )
+    pruned.fit(frame)
+    pruned.sparse_output_ = ct.sparse_output_
+
+    for name, trans, names, keep, valid in branches:
+        new = pruned.named_transformers_[name]
+        _copy_fitted_state(trans, new, keep, valid)
+        last = _steps(new)[-1]
+        if isinstance(last, OneHotEncoder) and any(
+                list(cats) != list(dummy[c]) for c, cats in zip(names, last.categories_)):
+            raise ValueError(f"Could not rebuild the categories of branch '{name}'")
+
+    new_selector = clone(selector)
+    new_selector.selected_features = np.searchsorted(kept, selected).tolist()
+    pipeline.steps = [
+        (name, pruned if name == "preprocessing" else new_selector if name == "feature_selection" else step)
+        for name, step in pipeline.steps
+    ]
+    return pipeline
+
+
+def same_outputs(reference, pruned, frame: pd.DataFrame) -> bool:
+    """True when both pipelines produce identical features for `frame`."""
+    a, b = reference.transform(frame), pruned.transform(frame)
+    return a.shape == b.shape and a.dtype == b.dtype and np.array_equal(a, b, equal_nan=True)
+
+
+def pruning_stats(reference, pruned) -> dict:
+    """Input columns read and columns computed before/after pruning."""
+    def widths(pipeline):
+        ct = pipeline.named_steps["preprocessing"]
+        return len(ct.feature_names_in_), sum(s.stop - s.start for s in ct.output_indices_.values())
+    (in_before, out_before), (in_after, out_after) = widths(reference), widths(pruned)
+    return {"input_columns": (in_before, in_after), "computed_columns": (out_before, out_after)}
@@ -1,11 +1,35 @@
 # src/ml/pipeline/feature_engineering.py
 
+import os
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 
+# 0 = build the output from column views instead of deep-copying the input
+FE_COPY = os.getenv("FE_COPY", "0") == "1"
+
+FLAG_COLUMNS = ['TotalVisits', 'Total Time Spent on Website']
+YES_NO = ('No', 'Yes')
+
+
+@lru_cache(maxsize=128)
+def normalised_columns(columns: tuple) -> list:
+    """Lower-cased, stripped column names (memoised per input schema)."""
+    return [col.strip().lower() for col in columns]
+
+
 class FeatureEngineeringTransformer(BaseEstimator, TransformerMixin):
-    def __init__(self):
-        pass
+    def __init__(self, copy=FE_COPY):
+        # copy=False: derived columns come from NumPy views of the inputs and
+        # the input frame is shared (never modified), not deep-copied
+        self.copy = copy
+
+    def __setstate__(self, state):
+        # Pipelines pickled before the copy parameter existed
+        state.setdefault("copy", FE_COPY)
+        super().__setstate__(state)
 
     def add_behavioral_flags(self, df: pd.DataFrame) -> pd.DataFrame:
         for col in ['TotalVisits', 'Total Time Spent on Website']:
@@ -19,14 +43,64 @@ class FeatureEngineeringTransformer(BaseEstimator, TransformerMixin):
         return df
 
     def lowercase_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        df.columns = [col.strip().lower() for col in df.columns]  # No underscores, just lowercase
+        df.columns = normalised_columns(tuple(df.columns))  # No underscores, just lowercase
         return df
 
     def fit(self, X, y=None):
         return self
 
+    @staticmethod
+    def model_dtypes(X: pd.DataFrame) -> dict:
+        """
+        {column position: values} for typed-load dtypes (see data_loader/schema.py)
+        the preprocessor does not take as-is: booleans back to Yes/No
+        categories, narrow ints/floats back to 64-bit.
+        """
+        restored = {}
+        for i, dtype in enumerate(X.dtypes):
+            if pd.api.types.is_bool_dtype(dtype):
+                codes = X.iloc[:, i].astype('Int8').fillna(-1).to_numpy(np.int8)
+                restored[i] = pd.Categorical.from_codes(codes, categories=YES_NO)
+            elif isinstance(dtype, np.dtype) and dtype.kind in 'iuf' and dtype.itemsize < 8:
+                restored[i] = X.iloc[:, i].to_numpy(np.float64 if dtype.kind == 'f' else np.int64)
+        return restored
+
+    @staticmethod
+    def _values(X: pd.DataFrame, col: str):
+        # NumPy view for plain numeric dtypes; extension dtypes keep pandas semantics
+        s = X[col]
+        return s.to_numpy(copy=False) if isinstance(s.dtype, np.dtype) and s.dtype != object else s
+
+    def derived_columns(self, X: pd.DataFrame) -> dict:
+        """The flag and EngagementScore columns, in the order transform adds them."""
+        present = [col for col in FLAG_COLUMNS if col in X.columns]
+        values = {col: self._values(X, col) for col in present}
+        derived = {f'{col}_is_zero': (values[col] == 0).astype(int) for col in present}
+        if len(present) == len(FLAG_COLUMNS):
+            derived['EngagementScore'] = values['TotalVisits'] * values['Total Time Spent on Website']
+        return derived
+
     def transform(self, X):
+        if self.copy or not isinstance(X, pd.DataFrame) or not X.columns.is_unique:
+            return self._transform_copy(X)
+        # Shallow frame over the caller's blocks; inserting the new columns adds
+        # blocks without copying (pd.concat would consolidate and copy)
+        out = X.copy(deep=False)
+        for i, values in self.model_dtypes(X).items():
+            out.isetitem(i, values)
+        derived = self.derived_columns(out)
+        if any(name in X.columns for name in derived):
+            return self._transform_copy(X)
+        for name, values in derived.items():
+            # .array skips index alignment (duplicate labels) and keeps extension dtypes
+            out[name] = getattr(values, "array", values)
+        return out.set_axis(normalised_columns(tuple(out.columns)), axis=1, copy=False)
+
+    def _transform_copy(self, X):
         X_copy = X.copy()
+        if isinstance(X_copy, pd.DataFrame):
+            for i, values in self.model_dtypes(X_copy).items():
+                X_copy.isetitem(i, values)
         X_copy = self.add_behavioral_flags(X_copy)
         X_copy = self.add_combined_features(X_copy)
         X_copy = self.lowercase_columns(X_copy)  # Column names lowercase, no underscores
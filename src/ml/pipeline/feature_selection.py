@@ -1,10 +1,121 @@
+import os
+import json
+import numpy as np
+import sklearn
 from sklearn.feature_selection import SelectFromModel
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
 
-def apply_feature_selection(X, y, top_n=50):
-    model = RandomForestClassifier(n_estimators=50, max_depth=7, random_state=42)
+from src.ml.pipeline.fit_cache import data_digest
+
+FS_N_JOBS = int(os.getenv("FS_N_JOBS", "-1"))                  # forest threads (-1 = all cores)
+FS_SAMPLE_ROWS = int(os.getenv("FS_SAMPLE_ROWS", "0"))         # rank on stratified samples (0 = all rows)
+FS_MIN_STABILITY = float(os.getenv("FS_MIN_STABILITY", "0.4"))  # weighted Jaccard of two samples' top-N
+FS_CACHE = os.getenv("FS_CACHE", "0") == "1"
+FS_CACHE_DIR = os.getenv("FS_CACHE_DIR", os.path.join("models", "cache", "feature_selection"))
+
+FOREST_PARAMS = {"n_estimators": 50, "max_depth": 7, "random_state": 42}
+
+
+def _importances(X, y, n_jobs):
+    model = RandomForestClassifier(**FOREST_PARAMS, n_jobs=n_jobs)
     model.fit(X, y)
-    importances = model.feature_importances_
-    indices = importances.argsort()[::-1][:top_n]
+    return model.feature_importances_
+
+
+def _top(importances, top_n):
+    return importances.argsort()[::-1][:top_n]
+
+
+def jaccard(a, b) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def weighted_jaccard(imp_a, imp_b, top_n) -> float:
+    """
+    Agreement of two importance vectors over the union of their top-N,
+    sum(min) / sum(max) of normalised importances. Unlike the plain set
+    Jaccard it is not dragged down by near-zero tail features swapping places.
+    """
+    union = np.union1d(_top(imp_a, top_n), _top(imp_b, top_n))
+    a = imp_a[union] / max(imp_a.sum(), 1e-12)
+    b = imp_b[union] / max(imp_b.sum(), 1e-12)
+    return float(np.minimum(a, b).sum() / max(np.maximum(a, b).sum(), 1e-12))
+
+
+def stratified_sample(y, n_rows, seed):
+    """Sorted row indices of a class-stratified sample of `n_rows` rows."""
+    idx = np.arange(len(y))
+    if n_rows >= len(y):
+        return idx
+    try:
+        sample, _ = train_test_split(idx, train_size=n_rows, stratify=y, random_state=seed)
+    except ValueError:
+        # a class too small to stratify
+        sample = np.random.default_rng(seed).choice(idx, size=n_rows, replace=False)
+    return np.sort(sample)
+
+
+def rank_features(X, y, top_n=50, n_jobs=FS_N_JOBS, sample_rows=FS_SAMPLE_ROWS,
+                  min_stability=FS_MIN_STABILITY):
+    """
+    Indices of the top_n features by random-forest importance. With
+    sample_rows, ranks on two stratified samples and accepts their averaged
+    importances once the two rankings agree (weighted Jaccard >=
+    min_stability); otherwise doubles the sample while it stays within a
+    quarter of the rows, then falls back to a fit on every row.
+    """
+    y = np.asarray(y)
+    rows = sample_rows
+    seed = 0
+    while 0 < rows and rows * 4 <= len(y):
+        a, b = stratified_sample(y, rows, seed), stratified_sample(y, rows, seed + 1)
+        imp_a, imp_b = _importances(X[a], y[a], n_jobs), _importances(X[b], y[b], n_jobs)
+        stability = weighted_jaccard(imp_a, imp_b, top_n)
+        print(f"[INFO] Selection on 2 x {rows} rows: weighted Jaccard {stability:.2f} "
+              f"(top-{top_n} set overlap {jaccard(_top(imp_a, top_n), _top(imp_b, top_n)):.2f})")
+        if stability >= min_stability:
+            return _top(imp_a + imp_b, top_n)
+        rows, seed = rows * 2, seed + 2
+    if sample_rows:
+        print(f"⚠️ Sampled rankings did not reach stability {min_stability}, ranking on all {len(y)} rows")
+    return _top(_importances(X, y, n_jobs), top_n)
+
+
+def selection_key(X, y, top_n, sample_rows, min_stability) -> str:
+    params = (sklearn.__version__, FOREST_PARAMS, top_n, sample_rows, min_stability if sample_rows else None)
+    return data_digest((params, data_digest(X), data_digest(np.asarray(y))))
+
+
+def load_selection(key, root=None):
+    root = root or FS_CACHE_DIR
+    try:
+        with open(os.path.join(root, f"{key}.json")) as f:
+            return json.load(f)["indices"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_selection(key, indices, root=None):
+    root = root or FS_CACHE_DIR
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f".{key}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"indices": indices}, f)
+    os.replace(tmp, os.path.join(root, f"{key}.json"))
+
+
+def apply_feature_selection(X, y, top_n=50, n_jobs=FS_N_JOBS, sample_rows=FS_SAMPLE_ROWS,
+                            min_stability=FS_MIN_STABILITY, cache=FS_CACHE):
+    key = selection_key(X, y, top_n, sample_rows, min_stability) if cache else None
+    indices = load_selection(key) if cache else None
+    if indices is not None:
+        print(f"♻️ Reusing cached feature selection {key[:12]}")
+    else:
+        indices = rank_features(X, y, top_n, n_jobs, sample_rows, min_stability).tolist()
+        if cache:
+            save_selection(key, indices)
+    # Works for dense arrays and CSR (sparse mode keeps the selection sparse)
     X_selected = X[:, indices]
-    return X_selected, indices.tolist()
+    return X_selected, indices
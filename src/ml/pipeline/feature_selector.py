@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse as sp
 from sklearn.base import BaseEstimator, TransformerMixin
 
 class FeatureSelector(BaseEstimator, TransformerMixin):
@@ -9,6 +10,15 @@ class FeatureSelector(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
         return self
 
+    def __sklearn_is_fitted__(self):
+        # Stateless: the indices come from selection, so a Pipeline of
+        # already-fitted steps needs no fit call before transform
+        return True
+
     def transform(self, X):
+        if sp.issparse(X):
+            # CSR column gather touches only the stored entries; the
+            # selection is narrow, so it is densified for every model
+            return X.tocsr()[:, self.selected_features].toarray()
         arr = np.asarray(X)
         return arr[:, self.selected_features]
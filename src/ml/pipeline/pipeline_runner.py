@@ -3,18 +3,31 @@
 import os
 import sys
 import joblib
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from datetime import datetime
 import mlflow
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 
-from src.ml.data_loader.data_loader import load_data_from_postgres, save_dataframe_to_postgres
-from src.ml.pipeline.preprocessing    import clean_columns, get_full_pipeline
+from src.ml.data_loader.data_loader import load_data_from_postgres, iter_data_from_postgres, save_dataframe_to_postgres
+from src.ml.data_loader.schema      import ID_COLUMNS
+from src.ml.pipeline.preprocessing    import clean_columns, feature_types, get_full_pipeline
 from src.ml.pipeline.feature_selection import apply_feature_selection
 from src.ml.pipeline.feature_selector  import FeatureSelector
+from src.ml.pipeline.fit_cache         import cached_fit_transform, PIPELINE_CACHE
+from src.ml.pipeline.schema_validator  import InputValidator
+from src.ml.pipeline.streaming_fit     import fit_transform_out_of_core, OUT_OF_CORE_FIT, FIT_CHUNK_ROWS
 from src.ml.registry.model_registry   import register_and_promote
+from src.ml.inference.pruning         import prune_pipeline, same_outputs, pruning_stats
 from sklearn.pipeline import Pipeline
+from sklearn.utils.validation import check_is_fitted
+
+# 1 = CSR one-hot output end to end (far less memory on the full table)
+PIPELINE_SPARSE = os.getenv("PIPELINE_SPARSE", "0") == "1"
+# 1 = save a preprocessor that only computes the selected features
+PIPELINE_PRUNE = os.getenv("PIPELINE_PRUNE", "1") == "1"
 
 
 def print_time(step: str, t0: datetime) -> datetime:
@@ -23,36 +36,66 @@ def print_time(step: str, t0: datetime) -> datetime:
     return datetime.now()
 
 
+def training_chunks(table_name: str, target_col: str, chunksize: int = FIT_CHUNK_ROWS):
+    """
+    (X, y) for each chunk of `table_name`, cleaned like the in-memory load and
+    without the id columns: one-hot ids add a category per lead, so the
+    fitted encoder and the output would grow with the table.
+    """
+    ids = [c.lower() for c in ID_COLUMNS]
+    for df in iter_data_from_postgres(table_name, chunksize):
+        df.columns = df.columns.str.lower()
+        df = clean_columns(df).drop(columns=ids, errors="ignore")
+        yield df.drop(columns=[target_col]), df[target_col]
+
+
 def run_pipeline(
     table_name: str = "lead_data",
     target_col: str = "converted",
     save: bool = True,
     register: bool = False,
-    return_pipeline: bool = False
+    return_pipeline: bool = False,
+    sparse: bool = PIPELINE_SPARSE,
+    cache: bool = PIPELINE_CACHE,
+    out_of_core: bool = OUT_OF_CORE_FIT
 ):
     t0 = datetime.now()
-
-    # 1) Load & clean
-    df = load_data_from_postgres(table_name)
-    print(f"[INFO] Loaded data from '{table_name}', shape: {df.shape}")
-    df.columns = df.columns.str.lower()
-    df = clean_columns(df)
-
-    t0 = print_time("Data load & clean", t0)
-
-    # 2) Split X/y
-    y = df[target_col]
-    X = df.drop(columns=[target_col])
-
-    # 3) Identify feature types
-    numeric_features     = X.select_dtypes(include=["int64","float64"]).columns.tolist()
-    categorical_features = X.select_dtypes(include=["object","category","bool"]).columns.tolist()
-    t0 = print_time("Feature type definition", t0)
-
-    # 4) Build & fit full pipeline
-    full_pipeline = get_full_pipeline(numeric_features, categorical_features)
-    X_transformed = full_pipeline.fit_transform(X, y)
-    t0 = print_time("Pipeline fit & transform", t0)
+    ranges = None
+
+    if out_of_core:
+        # 1-4) Fit from chunked statistics, then transform chunk by chunk.
+        # X is only the first rows, kept for the checks below. The output is
+        # always CSR, so its memory follows stored values, not one-hot width
+        if not sparse:
+            print("[INFO] Out-of-core fit: using CSR features (PIPELINE_SPARSE=1)")
+            sparse = True
+        full_pipeline, X_transformed, y, X, stats = fit_transform_out_of_core(
+            lambda: training_chunks(table_name, target_col))
+        ranges = stats.ranges()
+        t0 = print_time("Out-of-core pipeline fit & transform", t0)
+    else:
+        # 1) Load & clean
+        df = load_data_from_postgres(table_name)
+        print(f"[INFO] Loaded data from '{table_name}', shape: {df.shape}")
+        df.columns = df.columns.str.lower()
+        df = clean_columns(df)
+
+        t0 = print_time("Data load & clean", t0)
+
+        # 2) Split X/y
+        y = df[target_col]
+        X = df.drop(columns=[target_col])
+
+        # 3) Identify feature types
+        numeric_features, categorical_features = feature_types(X)
+        t0 = print_time("Feature type definition", t0)
+
+        # 4) Build & fit full pipeline (PIPELINE_CACHE reuses the fit for unchanged data)
+        full_pipeline = get_full_pipeline(numeric_features, categorical_features, sparse=sparse)
+        full_pipeline, X_transformed, _ = cached_fit_transform(full_pipeline, X, y, enabled=cache)
+        t0 = print_time("Pipeline fit & transform", t0)
+    if sparse:
+        print(f"[INFO] Sparse features: {X_transformed.shape}, {X_transformed.nnz} stored values")
 
     # 5) Extract real feature names
     preprocessor = full_pipeline.named_steps["preprocessing"]
@@ -66,16 +109,38 @@ def run_pipeline(
     X_selected, selected_indices = apply_feature_selection(X_transformed, y)
     t0 = print_time("Feature selection", t0)
 
-    # 7) Build final inference pipeline
+    # 7) Build final inference pipeline from the already-fitted steps (no refit)
     final_pipeline = Pipeline([
         ("feature_engineering", full_pipeline.named_steps["feature_engineering"]),
         ("preprocessing",      full_pipeline.named_steps["preprocessing"]),
+        # Serving gets dense rows either way; only the 50 selected columns are densified
         ("feature_selection",  FeatureSelector(selected_features=selected_indices)),
     ])
-    # re-fit on original X/y so pipeline internals are consistent
-    final_pipeline.fit(X, y)
+    check_is_fitted(final_pipeline)
+    X_check = final_pipeline.transform(X.head(1000))
+    X_expected = X_selected[:1000]
+    X_expected = X_expected.toarray() if sp.issparse(X_expected) else np.asarray(X_expected)
+    if not np.array_equal(X_check, X_expected):
+        raise ValueError("Final pipeline does not reproduce the selected training features")
+    # Input rules for serving: every category seen in training (pruning keeps
+    # only the selected ones) and the training ranges of numeric columns
+    final_pipeline.input_validator_ = InputValidator.from_pipeline(final_pipeline, X, ranges=ranges)
     t0 = print_time("Final pipeline construction", t0)
 
+    # 7b) Drop the columns and categories selection throws away
+    if PIPELINE_PRUNE:
+        try:
+            pruned = prune_pipeline(final_pipeline)
+            if not same_outputs(final_pipeline, pruned, X.head(5000)):
+                raise ValueError("pruned pipeline disagrees with the original")
+            stats = pruning_stats(final_pipeline, pruned)
+            final_pipeline = pruned
+            print(f"✂️ Pruned preprocessing to {stats['computed_columns'][1]} of "
+                  f"{stats['computed_columns'][0]} columns ({stats['input_columns'][1]} raw inputs)")
+        except Exception as e:
+            print(f"⚠️ Pruning skipped, saving the full pipeline: {e}")
+        t0 = print_time("Pipeline pruning", t0)
+
     # 8) Save artifacts
     if save:
         os.makedirs("models", exist_ok=True)
@@ -84,7 +149,8 @@ def run_pipeline(
 
         # build DataFrame of selected features with real names
         selected_names = [feature_names[i] for i in selected_indices]
-        df_pre = pd.DataFrame(X_selected, columns=selected_names)
+        X_dense = X_selected.toarray() if sp.issparse(X_selected) else X_selected
+        df_pre = pd.DataFrame(X_dense, columns=selected_names)
 
         # save to Postgres
         save_dataframe_to_postgres(df_pre, key="preprocessed_train_data")
@@ -94,11 +160,13 @@ def run_pipeline(
     # 9) Optional MLflow pipeline registration
     if register:
         try:
-            register_and_promote(
+            version = register_and_promote(
                 registry_name="LeadScoringPreprocessor",
                 model_object=final_pipeline,
                 is_pipeline=True
             )
+            # Read by training to tag the model version with its preprocessor
+            final_pipeline.registered_version_ = version
             print("✅ Pipeline registered in MLflow as 'LeadScoringPreprocessor'")
         except Exception as e:
             print(f"❌ Registration failed: {e}")
@@ -3,7 +3,8 @@
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, FunctionTransformer
+import numpy as np
 import pandas as pd
 import os
 import sys
@@ -29,36 +30,88 @@ def clean_columns(df: pd.DataFrame) -> pd.DataFrame:
     df = df.drop(columns=[col for col in drop_cols if col in df.columns], errors='ignore')
     return df
 
+
+def feature_types(X: pd.DataFrame) -> tuple:
+    """(numeric columns, categorical columns) of a cleaned training frame."""
+    # "number" also covers the narrow ints/float32 of a typed load; booleans are Yes/No flags
+    numeric_features     = X.select_dtypes(include="number").columns.tolist()
+    categorical_features = X.select_dtypes(include=["object","category","bool","boolean"]).columns.tolist()
+    return numeric_features, categorical_features
+
+# ─────────────────────────────────────────────────────────────
+# 🪶 Reduced precision (float32 output, uint8 one-hot)
+# ─────────────────────────────────────────────────────────────
+def float32_cast():
+    """
+    Last numeric step of a float32 pipeline: impute and scale in float64,
+    then emit float32.
+    """
+    return FunctionTransformer(np.asarray, kw_args={"dtype": np.float32}, feature_names_out="one-to-one")
+
+
+def is_float32_cast(step) -> bool:
+    return (
+        isinstance(step, FunctionTransformer)
+        and step.func is np.asarray
+        and np.dtype((step.kw_args or {}).get("dtype", np.float64)) == np.float32
+    )
+
 # ─────────────────────────────────────────────────────────────
 # ⚙️ Column-wise Preprocessing Pipelines
 # ─────────────────────────────────────────────────────────────
-def get_preprocessing_pipeline(numeric_features, categorical_features):
-    numeric_pipeline = Pipeline([
+def get_preprocessing_pipeline(numeric_features, categorical_features, float32=False, sparse=False):
+    """
+    float32=True emits float32 numerics and uint8 one-hot indicators, so the
+    stacked output is float32 instead of float64. sparse=True keeps the
+    one-hot block sparse and returns a CSR matrix.
+    """
+    numeric_steps = [
         ("imputer", SimpleImputer(strategy="median")),
         ("scaler", StandardScaler())
-    ])
+    ]
+    if float32:
+        numeric_steps.append(("to_float32", float32_cast()))
+    numeric_pipeline = Pipeline(numeric_steps)
 
     categorical_pipeline = Pipeline([
         ("imputer", SimpleImputer(strategy="most_frequent")),
-        ("encoder", OneHotEncoder(handle_unknown="ignore", sparse_output=False))
+        ("encoder", OneHotEncoder(handle_unknown="ignore", sparse_output=sparse,
+                                  dtype=np.uint8 if float32 else np.float64))
     ])
 
     preprocessor = ColumnTransformer([
         ("num", numeric_pipeline, numeric_features),
         ("cat", categorical_pipeline, categorical_features)
-    ])
+    ], sparse_threshold=1.0 if sparse else 0.0)
 
     return preprocessor
 
+
+def use_sparse_output(preprocessor: ColumnTransformer) -> ColumnTransformer:
+    """
+    Switches a fitted ColumnTransformer (in place) to sparse one-hot blocks
+    and CSR output. Fitted statistics and output values are unchanged.
+    """
+    for name, trans, _ in preprocessor.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        last = trans.steps[-1][1] if isinstance(trans, Pipeline) else trans
+        if isinstance(last, OneHotEncoder):
+            last.sparse_output = True
+    preprocessor.sparse_threshold = 1.0
+    preprocessor.sparse_output_ = True
+    return preprocessor
+
 # ─────────────────────────────────────────────────────────────
 # 🔄 Full Pipeline (Feature Eng + Preprocessing)
 # ─────────────────────────────────────────────────────────────
-def get_full_pipeline(numeric_features, categorical_features):
+def get_full_pipeline(numeric_features, categorical_features, float32=False, sparse=False):
     """
     Returns a pipeline with FeatureEngineering and Preprocessing steps.
     Model is not included here.
     """
-    preprocessor = get_preprocessing_pipeline(numeric_features, categorical_features)
+    preprocessor = get_preprocessing_pipeline(numeric_features, categorical_features,
+                                              float32=float32, sparse=sparse)
 
     full_pipeline = Pipeline([
         ("feature_engineering", FeatureEngineeringTransformer()),
@@ -1,9 +1,328 @@
 # src/ml/pipeline/schema_validator.py
 
+import math
+import numbers
+import os
+
+import numpy as np
 import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from src.ml.data_loader.schema import ID_COLUMNS, SCHEMA_PATH, not_null_columns, schema_kinds
+
+SCHEMA_VALIDATION = os.getenv("SCHEMA_VALIDATION", "1") == "1"
+SCHEMA_REJECT_UNSEEN = os.getenv("SCHEMA_REJECT_UNSEEN", "0") == "1"  # else unseen categories are scored (all-zero one-hot)
+SCHEMA_RANGE_MARGIN = float(os.getenv("SCHEMA_RANGE_MARGIN", "1.0"))  # allowed overshoot, in training ranges
+
+# Without recorded training ranges: mean ± this many standard deviations
+FALLBACK_ZSCORE = 100.0
+
+# Per-row error flags
+TYPE_ERROR, RANGE_ERROR, NULL_ERROR, UNSEEN_CATEGORY = 1, 2, 4, 8
+REASONS = {
+    TYPE_ERROR: "wrong type",
+    RANGE_ERROR: "out of range",
+    NULL_ERROR: "missing value",
+    UNSEEN_CATEGORY: "unseen category",
+}
+
 
 def validate_input_schema(df: pd.DataFrame, expected_columns: list) -> bool:
     missing = set(expected_columns) - set(df.columns)
     if missing:
         raise ValueError(f"Missing columns in input data: {missing}")
     return True
+
+
+def _key(col) -> str:
+    # Same normalisation as FeatureEngineeringTransformer
+    return str(col).strip().lower()
+
+
+def _steps(trans) -> list:
+    return [s for _, s in trans.steps] if isinstance(trans, Pipeline) else [trans]
+
+
+def consumed_columns(pipeline) -> list:
+    """Raw columns the fitted `preprocessing` ColumnTransformer reads."""
+    ct = dict(getattr(pipeline, "named_steps", {})).get("preprocessing")
+    if not hasattr(ct, "transformers_"):
+        raise ValueError("Expected a fitted 'preprocessing' ColumnTransformer")
+    return [str(col) for name, trans, cols in ct.transformers_
+            if trans != "drop" and name != "remainder" for col in cols]
+
+
+class Validation:
+    """
+    Result of `InputValidator.validate`: per-row error flags, the rows to
+    reject, and per-column flags for the columns that had any error.
+    """
+
+    def __init__(self, n_rows: int, column_errors: dict, reject_flags: int):
+        self.column_errors = column_errors
+        self.errors = np.zeros(n_rows, dtype=np.uint8)
+        for flags in column_errors.values():
+            self.errors |= flags
+        self.rejected = (self.errors & reject_flags) != 0
+
+    @property
+    def n_rejected(self) -> int:
+        return int(self.rejected.sum())
+
+    def counts(self) -> dict:
+        """{column: {reason: rows}}"""
+        return {
+            col: {reason: int(((flags & flag) != 0).sum()) for flag, reason in REASONS.items() if (flags & flag).any()}
+            for col, flags in self.column_errors.items()
+        }
+
+    def messages(self, rows=None) -> list:
+        """One "column: reason, ...; column: reason" string per row position (default: rejected rows)."""
+        rows = np.flatnonzero(self.rejected) if rows is None else np.asarray(rows)
+        out = []
+        for i in rows:
+            parts = []
+            for col, flags in self.column_errors.items():
+                if flags[i]:
+                    parts.append(f"{col}: " + ", ".join(r for f, r in REASONS.items() if flags[i] & f))
+            out.append("; ".join(parts))
+        return out
+
+
+class InputValidator:
+    """
+    Checks raw lead batches before they reach the preprocessor: dtypes,
+    allowed categories, numeric ranges and nullability, compiled once from a
+    fitted pipeline (its encoders' categories and scalers) plus
+    lead_data_schema.txt (integer columns, NOT NULL). `validate` works on
+    whole columns and returns per-row error flags.
+    """
+
+    def __init__(self, numeric: dict, categorical: dict, not_null=(), reject_unseen: bool = SCHEMA_REJECT_UNSEEN):
+        # numeric: {key: (low, high, integral)}; categorical: {key: allowed values or None}
+        self.numeric = numeric
+        self.categorical = {k: None if v is None else frozenset(v) for k, v in categorical.items()}
+        self._allowed = {k: None if v is None else list(v) for k, v in categorical.items()}
+        self.not_null = frozenset(not_null)
+        self.reject_unseen = reject_unseen
+
+    def __setstate__(self, state):
+        # Validators pickled with a pipeline follow this process's setting
+        state["reject_unseen"] = SCHEMA_REJECT_UNSEEN
+        self.__dict__.update(state)
+
+    @property
+    def reject_flags(self) -> int:
+        return TYPE_ERROR | RANGE_ERROR | NULL_ERROR | (UNSEEN_CATEGORY if self.reject_unseen else 0)
+
+    @classmethod
+    def from_pipeline(cls, pipeline, X: pd.DataFrame = None, schema_path: str = SCHEMA_PATH,
+                      margin: float = SCHEMA_RANGE_MARGIN, ranges: dict = None):
+        """
+        Compiles the rules for every column the pipeline's ColumnTransformer
+        reads. With the training frame `X` (or its per-column `ranges`,
+        {column: (min, max)}), numeric ranges are its min/max widened by
+        `margin` spans (never below 0 for non-negative columns); without
+        them, mean ± FALLBACK_ZSCORE standard deviations from the fitted
+        scaler. Id columns get no range or category rule.
+        """
+        ct = dict(getattr(pipeline, "named_steps", {})).get("preprocessing")
+        if not hasattr(ct, "transformers_"):
+            raise ValueError("Expected a fitted 'preprocessing' ColumnTransformer")
+        kinds = schema_kinds(schema_path)
+        ids = {_key(c) for c in ID_COLUMNS}
+        frame_cols = {_key(c): c for c in X.columns} if X is not None else {}
+        observed = {_key(c): v for c, v in (ranges or {}).items()}
+
+        numeric, categorical = {}, {}
+        for name, trans, cols in ct.transformers_:
+            if trans == "drop" or name == "remainder":
+                continue
+            cols = [str(c) for c in cols]
+            steps = _steps(trans)
+            imputer = steps[0] if isinstance(steps[0], SimpleImputer) else None
+            valid = list(range(len(cols))) if imputer is None or imputer.keep_empty_features else \
+                [j for j, v in enumerate(imputer.statistics_) if not pd.isna(v)]
+            encoder = steps[-1] if isinstance(steps[-1], OneHotEncoder) else None
+            scaler = next((s for s in steps if isinstance(s, StandardScaler)), None)
+            for pos, j in enumerate(valid):
+                key = _key(cols[j])
+                if encoder is not None:
+                    categorical[key] = None if key in ids else list(encoder.categories_[pos])
+                    continue
+                low, high = -np.inf, np.inf
+                if key in ids:
+                    pass  # new leads get new ids
+                elif key in observed or key in frame_cols:
+                    if key in observed:
+                        lo, hi = observed[key]
+                    else:
+                        values = pd.to_numeric(X[frame_cols[key]], errors="coerce")
+                        lo, hi = float(values.min()), float(values.max())
+                    if not math.isnan(lo):
+                        span = max(hi - lo, 1.0)
+                        low = 0.0 if lo >= 0 else lo - margin * span
+                        high = hi + margin * span
+                elif scaler is not None and scaler.scale_ is not None:
+                    mean, scale = float(scaler.mean_[pos]), float(scaler.scale_[pos])
+                    low, high = mean - FALLBACK_ZSCORE * scale, mean + FALLBACK_ZSCORE * scale
+                numeric[key] = (low, high, kinds.get(key) == "int")
+            # columns the imputer dropped (empty in training) only need a valid type
+            for j in set(range(len(cols))) - set(valid):
+                key = _key(cols[j])
+                if encoder is not None:
+                    categorical[key] = None
+                else:
+                    numeric[key] = (-np.inf, np.inf, False)
+
+        not_null = [_key(c) for c in not_null_columns(schema_path)]
+        return cls(numeric, categorical, [c for c in not_null if c in numeric or c in categorical])
+
+    def restricted_to(self, columns):
+        """Copy that only checks `columns` (e.g. the inputs a pruned pipeline still reads)."""
+        keep = {_key(c) for c in columns}
+        return InputValidator(
+            {k: v for k, v in self.numeric.items() if k in keep},
+            {k: v for k, v in self._allowed.items() if k in keep},
+            [k for k in self.not_null if k in keep],
+            self.reject_unseen,
+        )
+
+    # ─────────────────────────────────────────────
+    # Batch validation (vectorised per column)
+    # ─────────────────────────────────────────────
+    def _numeric_flags(self, s: pd.Series, rule: tuple, nullable: bool) -> np.ndarray:
+        low, high, integral = rule
+        if pd.api.types.is_bool_dtype(s.dtype):
+            s = s.astype("float64")
+        if pd.api.types.is_numeric_dtype(s.dtype):
+            values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+            flags = np.zeros(len(s), dtype=np.uint8)
+        else:
+            # Numeric strings pass (the imputer converts them); anything else is a type error
+            values = pd.to_numeric(s.astype(object), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            flags = np.where(np.isnan(values) & s.notna().to_numpy(), TYPE_ERROR, 0).astype(np.uint8)
+        missing = np.isnan(values)
+        with np.errstate(invalid="ignore"):
+            flags[(values < low) | (values > high) | np.isinf(values)] |= RANGE_ERROR
+            if integral:
+                flags[~missing & ~np.isinf(values) & (values != np.round(values))] |= TYPE_ERROR
+        if not nullable:
+            flags[missing & (flags == 0)] |= NULL_ERROR
+        return flags
+
+    def _categorical_flags(self, s: pd.Series, allowed, nullable: bool) -> np.ndarray:
+        if pd.api.types.is_bool_dtype(s.dtype):
+            # FeatureEngineeringTransformer reads booleans as Yes/No
+            s = s.map({True: "Yes", False: "No"})
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes, values = s.cat.codes.to_numpy(), s.cat.categories
+        else:
+            # one hashing pass: distinct values plus codes (-1 = None/NaN)
+            codes, values = pd.factorize(s, use_na_sentinel=True)
+        # decide once per distinct value, then index by the codes
+        per_value = np.array([0 if isinstance(v, str) else TYPE_ERROR for v in values], dtype=np.uint8)
+        if allowed is not None and len(values):
+            per_value[(per_value == 0) & ~pd.Index(values).isin(allowed)] |= UNSEEN_CATEGORY
+        missing = codes < 0
+        flags = np.zeros(len(s), dtype=np.uint8)
+        if len(values):
+            flags[~missing] = per_value[codes[~missing]]
+        if not nullable:
+            flags[missing] |= NULL_ERROR
+        return flags
+
+    def validate(self, df: pd.DataFrame) -> Validation:
+        """
+        Flags every row of `df`. Columns the pipeline needs but `df` lacks
+        are left to the pipeline (it rejects the whole batch).
+        """
+        by_key = {}
+        for col in df.columns:
+            by_key.setdefault(_key(col), col)
+        column_errors = {}
+        for key, rule in self.numeric.items():
+            if key in by_key:
+                flags = self._numeric_flags(df[by_key[key]], rule, key not in self.not_null)
+                if flags.any():
+                    column_errors[by_key[key]] = flags
+        for key, allowed in self._allowed.items():
+            if key in by_key:
+                flags = self._categorical_flags(df[by_key[key]], allowed, key not in self.not_null)
+                if flags.any():
+                    column_errors[by_key[key]] = flags
+        return Validation(len(df), column_errors, self.reject_flags)
+
+    def coerce_numeric(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        `df` with text-typed numeric columns (e.g. a CSV column that held a
+        rejected "abc") parsed to float; `df` itself when there are none.
+        """
+        out = None
+        for i, col in enumerate(df.columns):
+            if _key(col) in self.numeric and not pd.api.types.is_numeric_dtype(df.dtypes.iloc[i]) \
+                    and not pd.api.types.is_bool_dtype(df.dtypes.iloc[i]):
+                out = df.copy(deep=False) if out is None else out
+                out.isetitem(i, pd.to_numeric(df.iloc[:, i].astype(object), errors="coerce"))
+        return df if out is None else out
+
+    # ─────────────────────────────────────────────
+    # Single record (compiled scorer path)
+    # ─────────────────────────────────────────────
+    def coerce_record(self, record: dict) -> dict:
+        """
+        `record` with numeric strings in numeric columns parsed to float, as
+        `coerce_numeric` does for batches; `record` itself when there are none.
+        Run after `check_record` (unparseable strings are rejected there).
+        """
+        out = None
+        for col, v in record.items():
+            if isinstance(v, str) and _key(col) in self.numeric:
+                out = dict(record) if out is None else out
+                try:
+                    out[col] = float(v)
+                except ValueError:
+                    out[col] = np.nan
+        return record if out is None else out
+
+    def check_record(self, record: dict) -> str:
+        """Rejection reasons for one raw lead ("" when it can be scored)."""
+        by_key = {}
+        for col in record:
+            by_key.setdefault(_key(col), col)
+        problems = []
+        for key, (low, high, integral) in self.numeric.items():
+            if key not in by_key:
+                continue
+            v = record[by_key[key]]
+            if isinstance(v, str):
+                try:
+                    v = float(v)
+                except ValueError:
+                    problems.append((by_key[key], TYPE_ERROR))
+                    continue
+            if v is None or (isinstance(v, float) and math.isnan(v)):
+                if key in self.not_null:
+                    problems.append((by_key[key], NULL_ERROR))
+            elif not isinstance(v, (numbers.Real, np.bool_)):
+                problems.append((by_key[key], TYPE_ERROR))
+            elif math.isinf(v) or not low <= v <= high:
+                problems.append((by_key[key], RANGE_ERROR))
+            elif integral and v != round(v):
+                problems.append((by_key[key], TYPE_ERROR))
+        for key, allowed in self.categorical.items():
+            if key not in by_key:
+                continue
+            v = record[by_key[key]]
+            if isinstance(v, (bool, np.bool_)):
+                v = "Yes" if v else "No"
+            if v is None or (isinstance(v, float) and math.isnan(v)):
+                if key in self.not_null:
+                    problems.append((by_key[key], NULL_ERROR))
+            elif not isinstance(v, str):
+                problems.append((by_key[key], TYPE_ERROR))
+            elif allowed is not None and v not in allowed and self.reject_unseen:
+                problems.append((by_key[key], UNSEEN_CATEGORY))
+        return "; ".join(f"{col}: {REASONS[flag]}" for col, flag in problems)
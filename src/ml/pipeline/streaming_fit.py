@@ -0,0 +1,432 @@
+# src/ml/pipeline/streaming_fit.py
+"""
+Out-of-core fit of the feature_engineering → preprocessing pipeline: the
+training table is read chunk by chunk and only mergeable per-column
+statistics are kept, so peak memory is one chunk plus the statistics. That
+bound needs the id columns dropped (pipeline_runner.training_chunks does):
+one-hot ids keep one category per row.
+
+- medians (numeric imputer): exact value counts while a column has at most
+  QUANTILE_EXACT_DISTINCT distinct values, else a KLL-style quantile sketch
+  of QUANTILE_SKETCH_SIZE items per level
+- mean / variance (scaler): running moments merged per chunk (Chan et al.),
+  combined with the imputed medians at the end
+- category counts (most-frequent imputer, one-hot encoder)
+
+Tolerance against the in-memory fit (see `fit_differences`):
+- categories, most-frequent values, fitted columns: identical
+- medians: identical for exactly counted columns; otherwise the value at a
+  rank within MEDIAN_RANK_TOLERANCE of the true median
+- scaler mean_ / scale_: relative difference below MOMENT_TOLERANCE when the
+  medians are exact (float64 summation order only), below
+  SKETCHED_MOMENT_TOLERANCE otherwise (imputed rows take the sketched median)
+
+`fit_transform_out_of_core` always emits CSR features.
+"""
+
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from src.ml.data_loader.schema import concat_frames
+from src.ml.pipeline.preprocessing import feature_types, get_full_pipeline
+
+OUT_OF_CORE_FIT = os.getenv("OUT_OF_CORE_FIT", "0") == "1"
+FIT_CHUNK_ROWS = int(os.getenv("FIT_CHUNK_ROWS", "50000"))
+QUANTILE_SKETCH_SIZE = int(os.getenv("QUANTILE_SKETCH_SIZE", "4096"))
+QUANTILE_EXACT_DISTINCT = int(os.getenv("QUANTILE_EXACT_DISTINCT", "65536"))
+
+MEDIAN_RANK_TOLERANCE = 0.005
+MOMENT_TOLERANCE = 1e-9
+SKETCHED_MOMENT_TOLERANCE = 1e-3
+
+
+def _steps(trans) -> list:
+    return [s for _, s in trans.steps] if isinstance(trans, Pipeline) else [trans]
+
+
+# ─────────────────────────────────────────────────────────────
+# 📐 Mergeable statistics
+# ─────────────────────────────────────────────────────────────
+class QuantileSketch:
+    """
+    Mergeable quantile summary of one numeric column. Keeps exact
+    (value, count) pairs until more than `max_distinct` distinct values are
+    seen; the KLL-style compactors (level h holds items of weight 2**h, a
+    full level keeps every other sorted item at h + 1) are fed all along
+    and answer once the exact counts are dropped.
+    """
+
+    def __init__(self, k: int = QUANTILE_SKETCH_SIZE, max_distinct: int = QUANTILE_EXACT_DISTINCT, seed: int = 0):
+        self.k = k
+        self.max_distinct = max_distinct
+        self.n = 0
+        self.values, self.counts = np.empty(0), np.empty(0, dtype=np.int64)
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def exact(self) -> bool:
+        return self.values is not None
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        if self.exact:
+            self._add_counts(*np.unique(values, return_counts=True))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch"):
+        self.n += other.n
+        if self.exact and other.exact:
+            self._add_counts(other.values, other.counts)
+        else:
+            self.values = self.counts = None
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self._compress()
+
+    def _add_counts(self, values, counts):
+        values, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+        if len(values) > self.max_distinct:
+            self.values = self.counts = None
+        else:
+            self.values, self.counts = values, counts
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self.k:
+                level = np.sort(level)
+                # an odd item out stays at this level
+                rest, level = level[len(level) - len(level) % 2:], level[:len(level) - len(level) % 2]
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                promoted = level[self._rng.integers(2)::2]
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                self.levels[h] = rest
+            h += 1
+
+    def _weighted(self) -> tuple:
+        if self.exact:
+            return self.values, self.counts
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def median(self) -> float:
+        """np.median of the seen values (exact counts) or its sketch estimate; NaN when empty."""
+        if not self.n:
+            return np.nan
+        values, weights = self._weighted()
+        cum = np.cumsum(weights)
+        total = int(cum[-1])
+        # 0-based ranks of the middle item(s), as np.median averages them
+        lower = values[np.searchsorted(cum, (total - 1) // 2, side="right")]
+        upper = values[np.searchsorted(cum, total // 2, side="right")]
+        return float((lower + upper) / 2) if lower != upper else float(lower)
+
+    def n_items(self) -> int:
+        return sum(len(level) for level in self.levels) + (len(self.values) if self.exact else 0)
+
+
+class RunningMoments:
+    """Count, mean, sum of squared deviations, min and max per column, ignoring NaN."""
+
+    def __init__(self, n_columns: int):
+        self.n = np.zeros(n_columns, dtype=np.int64)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    def update(self, values: np.ndarray):
+        observed = ~np.isnan(values)
+        n = observed.sum(axis=0)
+        filled = np.where(observed, values, 0.0)
+        mean = np.divide(filled.sum(axis=0), n, out=np.zeros(len(n)), where=n > 0)
+        m2 = (np.where(observed, values - mean, 0.0) ** 2).sum(axis=0)
+        self.combine(n, mean, m2)
+        self.min = np.fmin(self.min, np.where(observed, values, np.inf).min(axis=0, initial=np.inf))
+        self.max = np.fmax(self.max, np.where(observed, values, -np.inf).max(axis=0, initial=-np.inf))
+
+    def combine(self, n, mean, m2):
+        """Chan et al.'s pairwise merge of (n, mean, m2) into these moments."""
+        total = self.n + n
+        delta = mean - self.mean
+        share = np.divide(n, total, out=np.zeros(len(total)), where=total > 0)
+        self.mean = self.mean + delta * share
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * share
+        self.n = total
+
+    def merge(self, other: "RunningMoments"):
+        self.combine(other.n, other.mean, other.m2)
+        self.min, self.max = np.fmin(self.min, other.min), np.fmax(self.max, other.max)
+
+
+def _value_counts(s: pd.Series) -> tuple:
+    """(values, counts) of the non-missing values of one chunk's column."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(s.cat.categories))
+        seen = np.flatnonzero(counts)
+        return s.cat.categories[seen].tolist(), counts[seen].tolist()
+    counts = s.value_counts(dropna=True)
+    return counts.index.tolist(), counts.tolist()
+
+
+class StreamingStats:
+    """
+    Everything the preprocessing ColumnTransformer learns, accumulated from
+    feature-engineered chunks: moments and a QuantileSketch per numeric
+    column, value counts per categorical column.
+    """
+
+    def __init__(self, numeric: list, categorical: list, k: int = QUANTILE_SKETCH_SIZE,
+                 max_distinct: int = QUANTILE_EXACT_DISTINCT):
+        self.numeric, self.categorical = list(numeric), list(categorical)
+        self.n_rows = 0
+        self.moments = RunningMoments(len(self.numeric))
+        self.sketches = [QuantileSketch(k, max_distinct, seed=i) for i in range(len(self.numeric))]
+        self.counts = {col: {} for col in self.categorical}
+
+    def update(self, X: pd.DataFrame):
+        self.n_rows += len(X)
+        if self.numeric:
+            values = X[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.moments.update(values)
+            for j, sketch in enumerate(self.sketches):
+                sketch.update(values[:, j])
+        for col in self.categorical:
+            self._add_counts(col, *_value_counts(X[col]))
+
+    def _add_counts(self, col, values, counts):
+        # plain dicts: realigning a growing pandas index per chunk costs O(distinct values)
+        total = self.counts[col]
+        for value, count in zip(values, counts):
+            total[value] = total.get(value, 0) + count
+
+    def merge(self, other: "StreamingStats"):
+        self.n_rows += other.n_rows
+        self.moments.merge(other.moments)
+        for mine, theirs in zip(self.sketches, other.sketches):
+            mine.merge(theirs)
+        for col in self.categorical:
+            self._add_counts(col, other.counts[col].keys(), other.counts[col].values())
+
+    def medians(self) -> np.ndarray:
+        return np.array([sketch.median() for sketch in self.sketches])
+
+    def imputed_moments(self, medians: np.ndarray) -> tuple:
+        """(mean, var) of the numeric columns after median imputation, as the scaler sees them."""
+        moments = RunningMoments(len(self.numeric))
+        moments.merge(self.moments)
+        missing = self.n_rows - moments.n
+        moments.combine(missing, np.nan_to_num(medians), np.zeros(len(medians)))
+        var = np.divide(moments.m2, moments.n, out=np.zeros(len(moments.n)), where=moments.n > 0)
+        return moments.mean, var
+
+    def modes(self) -> dict:
+        """Most frequent value per categorical column; ties go to the smallest, as in SimpleImputer."""
+        modes = {}
+        for col, counts in self.counts.items():
+            if counts:
+                most = max(counts.values())
+                modes[col] = min(value for value, count in counts.items() if count == most)
+        return modes
+
+    def categories(self) -> dict:
+        return {col: sorted(counts) for col, counts in self.counts.items() if counts}
+
+    def ranges(self) -> dict:
+        """{numeric column: (min, max)} of the observed values."""
+        return {col: (float(lo), float(hi)) for col, lo, hi, n in
+                zip(self.numeric, self.moments.min, self.moments.max, self.moments.n) if n}
+
+    def sketch_items(self) -> int:
+        return sum(sketch.n_items() for sketch in self.sketches)
+
+
+# ─────────────────────────────────────────────────────────────
+# 🧱 Fitted pipeline from statistics
+# ─────────────────────────────────────────────────────────────
+def _branches(ct: ColumnTransformer) -> tuple:
+    numeric, categorical = [], []
+    for name, trans, cols in ct.transformers:
+        if trans == "drop":
+            continue
+        if not all(isinstance(c, str) for c in cols):
+            raise ValueError("ColumnTransformer columns must be given by name")
+        steps = _steps(trans)
+        if not isinstance(steps[0], SimpleImputer):
+            raise ValueError(f"Branch '{name}' does not start with a SimpleImputer")
+        (categorical if isinstance(steps[-1], OneHotEncoder) else numeric).extend(cols)
+    return numeric, categorical
+
+
+def _constant_feature(var, mean, n) -> np.ndarray:
+    # StandardScaler's test for columns it leaves unscaled (scale_ = 1)
+    eps = np.finfo(np.float64).eps
+    return var <= n * eps * var + (n * mean * eps) ** 2
+
+
+def fit_from_stats(pipeline: Pipeline, stats: StreamingStats, columns: list) -> Pipeline:
+    """
+    Fits `pipeline` (feature_engineering → preprocessing, unfitted) to the
+    streamed statistics. `columns` are the feature-engineered column names
+    in training order. Like prune_pipeline, the ColumnTransformer is fitted
+    on a frame that makes each encoder learn exactly the streamed
+    categories (one row per category of the widest column), then the
+    imputer and scaler statistics are set.
+    """
+    ct = pipeline.named_steps["preprocessing"]
+    medians, modes, categories = stats.medians(), stats.modes(), stats.categories()
+    median_of = dict(zip(stats.numeric, medians))
+
+    seed = {}
+    for col in columns:
+        if col in median_of:
+            seed[col] = np.array([median_of[col]])
+        elif col in categories:
+            seed[col] = np.asarray(categories[col], dtype=object)
+        else:
+            # not read by the preprocessor, or never observed (dropped by its imputer)
+            seed[col] = np.array([np.nan], dtype=object if col in stats.counts else np.float64)
+    n = max(len(v) for v in seed.values())
+    ct.fit(pd.DataFrame({col: np.resize(v, n) for col, v in seed.items()}))
+
+    mean, var = stats.imputed_moments(medians)
+    moments = dict(zip(stats.numeric, zip(mean, var)))
+    for name, trans, cols in ct.transformers_:
+        if trans == "drop" or name == "remainder":
+            continue
+        steps = _steps(trans)
+        imputer, cols = steps[0], list(cols)
+        # columns the imputer keeps (the others were never observed)
+        valid = [c for c in cols if c in modes or (c in median_of and not np.isnan(median_of[c]))]
+        if isinstance(steps[-1], OneHotEncoder):
+            imputer.statistics_ = np.array([modes.get(c, np.nan) for c in cols], dtype=object)
+            if any(list(cats) != categories[c] for c, cats in zip(valid, steps[-1].categories_)):
+                raise ValueError(f"Could not rebuild the categories of branch '{name}'")
+            continue
+        imputer.statistics_ = np.array([median_of[c] for c in cols])
+        for step in steps:
+            if isinstance(step, StandardScaler):
+                col_mean = np.array([moments[c][0] for c in valid])
+                col_var = np.array([moments[c][1] for c in valid])
+                scale = np.sqrt(col_var)
+                scale[_constant_feature(col_var, col_mean, stats.n_rows)] = 1.0
+                step.n_samples_seen_ = np.int64(stats.n_rows)
+                step.mean_, step.var_, step.scale_ = col_mean, col_var, scale
+    return pipeline
+
+
+def fit_out_of_core(pipeline: Pipeline, chunks, k: int = QUANTILE_SKETCH_SIZE,
+                    max_distinct: int = QUANTILE_EXACT_DISTINCT) -> tuple:
+    """
+    Fits `pipeline` (unfitted feature_engineering → preprocessing) in one
+    pass over `chunks`, an iterable of raw X frames. Returns
+    (fitted pipeline, StreamingStats).
+    """
+    fe, ct = pipeline.named_steps["feature_engineering"], pipeline.named_steps["preprocessing"]
+    numeric, categorical = _branches(ct)
+    stats, columns, n_chunks = StreamingStats(numeric, categorical, k, max_distinct), None, 0
+    for chunk in chunks:
+        X = fe.fit(chunk).transform(chunk)
+        if columns is None:
+            columns = list(X.columns)
+        stats.update(X)
+        n_chunks += 1
+    if columns is None:
+        raise ValueError("No rows to fit on")
+    inexact = [col for col, sketch in zip(numeric, stats.sketches) if not sketch.exact]
+    print(f"[INFO] Streamed {stats.n_rows} rows in {n_chunks} chunks; "
+          f"sketched medians for {len(inexact)} of {len(numeric)} numeric columns {inexact or ''}")
+    return fit_from_stats(pipeline, stats, columns), stats
+
+
+def fit_transform_out_of_core(make_chunks, head_rows: int = 5000) -> tuple:
+    """
+    Out-of-core counterpart of get_full_pipeline(...).fit_transform(X):
+    `make_chunks()` returns a fresh iterator of (X, y) chunks and is called
+    twice, once to fit from streamed statistics and once to transform. The
+    output is CSR (PIPELINE_SPARSE=1 pipeline), so memory grows with its
+    stored values, never with a dense one-hot width. Returns (pipeline,
+    X_transformed, y, first `head_rows` rows of X, StreamingStats).
+    """
+    chunks = make_chunks()
+    try:
+        X_first, _ = next(chunks)
+    except StopIteration:
+        raise ValueError("No rows to fit on")
+    pipeline = get_full_pipeline(*feature_types(X_first), sparse=True)
+    pipeline, stats = fit_out_of_core(pipeline, itertools.chain([X_first], (X for X, _ in chunks)))
+    del X_first
+
+    blocks, ys, heads, start = [], [], [], 0
+    for X, y in make_chunks():
+        if start + len(X) > stats.n_rows:
+            raise ValueError("Rows were added between the fit and transform passes")
+        blocks.append(sp.csr_matrix(pipeline.transform(X)))
+        if start < head_rows:
+            heads.append(X.head(head_rows - start))
+        ys.append(y)
+        start += len(X)
+    if start != stats.n_rows:
+        raise ValueError("Rows were removed between the fit and transform passes")
+    X_transformed = sp.vstack(blocks, format="csr")
+    return pipeline, X_transformed, pd.concat(ys, ignore_index=True), concat_frames(heads), stats
+
+
+# ─────────────────────────────────────────────────────────────
+# 🔍 Comparison with an in-memory fit
+# ─────────────────────────────────────────────────────────────
+def fit_differences(reference: Pipeline, streamed: Pipeline) -> dict:
+    """
+    Largest differences between two fitted pipelines' preprocessing state:
+    max |Δ median|, max relative Δ of scaler mean_ / scale_, and whether
+    columns, most-frequent values and categories all match.
+    """
+    ref_ct, new_ct = reference.named_steps["preprocessing"], streamed.named_steps["preprocessing"]
+    diff = {"median_abs": 0.0, "mean_rel": 0.0, "scale_rel": 0.0, "structure_equal": True}
+
+    def rel(a, b):
+        return float(np.max(np.abs(a - b) / np.maximum(np.abs(a), 1e-12), initial=0.0))
+
+    for (name, ref, ref_cols), (_, new, new_cols) in zip(ref_ct.transformers_, new_ct.transformers_):
+        if ref == "drop" or name == "remainder":
+            continue
+        if list(ref_cols) != list(new_cols):
+            diff["structure_equal"] = False
+            continue
+        for a, b in zip(_steps(ref), _steps(new)):
+            if isinstance(a, SimpleImputer):
+                if a.statistics_.dtype == object:
+                    diff["structure_equal"] &= list(a.statistics_) == list(b.statistics_)
+                else:
+                    both = ~np.isnan(a.statistics_)
+                    diff["structure_equal"] &= bool(np.array_equal(both, ~np.isnan(b.statistics_)))
+                    diff["median_abs"] = max(diff["median_abs"], float(
+                        np.max(np.abs(a.statistics_[both] - b.statistics_[both]), initial=0.0)))
+            elif isinstance(a, StandardScaler):
+                diff["mean_rel"] = max(diff["mean_rel"], rel(a.mean_, b.mean_))
+                diff["scale_rel"] = max(diff["scale_rel"], rel(a.scale_, b.scale_))
+            elif isinstance(a, OneHotEncoder):
+                diff["structure_equal"] &= [list(c) for c in a.categories_] == [list(c) for c in b.categories_]
+    diff["structure_equal"] &= ref_ct.output_indices_ == new_ct.output_indices_
+    return diff
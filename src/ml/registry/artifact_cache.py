@@ -0,0 +1,230 @@
+# src/ml/registry/artifact_cache.py
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime
+from typing import Callable, Optional
+
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join("models", "cache"))
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+MANIFEST = "MANIFEST.json"
+LAST_GOOD = "LAST_GOOD"
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _list_files(root: str) -> list:
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for fn in filenames:
+            full = os.path.join(dirpath, fn)
+            rel = os.path.relpath(full, root)
+            if rel != MANIFEST:
+                files.append(rel)
+    return sorted(files)
+
+
+class ArtifactCache:
+    """
+    On-disk cache of registry model artifacts laid out as
+    `<root>/<registered name>/<version>/`, each with a MANIFEST.json of
+    file sizes and SHA-256 digests. Entries are verified before use,
+    published with an atomic rename (safe with several workers starting at
+    once) and evicted least-recently-used once the cache exceeds `max_bytes`.
+    The last version that loaded successfully is remembered per model so a
+    worker can start when the registry is unreachable.
+    """
+
+    def __init__(self, root: str = MODEL_CACHE_DIR, max_bytes: int = MODEL_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, str(version))
+
+    # ─────────────────────────────────────────────
+    # Integrity
+    # ─────────────────────────────────────────────
+    def _write_manifest(self, path: str, name: str, version: str):
+        files = {rel: {"size": os.path.getsize(os.path.join(path, rel)),
+                       "sha256": _sha256(os.path.join(path, rel))}
+                 for rel in _list_files(path)}
+        manifest = {
+            "name": name,
+            "version": str(version),
+            "files": files,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with open(os.path.join(path, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def verify(self, path: str) -> bool:
+        """
+        True when every file listed in the manifest exists with the recorded size and digest.
+        """
+        try:
+            with open(os.path.join(path, MANIFEST)) as f:
+                manifest = json.load(f)
+            files = manifest["files"]
+            if sorted(files) != _list_files(path):
+                return False
+            for rel, meta in files.items():
+                full = os.path.join(path, rel)
+                if os.path.getsize(full) != meta["size"] or _sha256(full) != meta["sha256"]:
+                    return False
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    # ─────────────────────────────────────────────
+    # Fetch / load
+    # ─────────────────────────────────────────────
+    def get(self, name: str, version: str) -> Optional[str]:
+        """
+        Returns the verified local path for (name, version), or None.
+        Corrupt entries are removed.
+        """
+        path = self.path_for(name, version)
+        if not os.path.isdir(path):
+            return None
+        if not self.verify(path):
+            print(f"⚠️ Cached artifacts for {name} v{version} failed verification; discarding")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        os.utime(os.path.join(path, MANIFEST))  # mark as recently used
+        return path
+
+    def fetch(self, name: str, version: str) -> str:
+        """
+        Returns a local path for (name, version), downloading it from the
+        registry on a cache miss.
+        """
+        path = self.get(name, version)
+        if path is not None:
+            print(f"📦 Using cached artifacts for {name} v{version}")
+            return path
+
+        import mlflow.artifacts
+
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{version}-", dir=os.path.join(self.root, name))
+        try:
+            mlflow.artifacts.download_artifacts(
+                artifact_uri=f"models:/{name}/{version}", dst_path=tmp
+            )
+            self._write_manifest(tmp, name, version)
+            path = self.path_for(name, version)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # Another worker published the same version first.
+                if self.get(name, version) is None:
+                    raise
+            print(f"⬇️ Cached artifacts for {name} v{version} at {path}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self.evict(protect={(name, str(version))})
+        return path
+
+    def load_model(self, name: str, version: str):
+        """
+        Loads an sklearn model for (name, version) from the local cache and
+        records it as the last known-good version.
+        """
+        import mlflow.sklearn
+
+        model = mlflow.sklearn.load_model(self.fetch(name, version))
+        self.record_good(name, version)
+        return model
+
+    # ─────────────────────────────────────────────
+    # Last known-good versions
+    # ─────────────────────────────────────────────
+    def record_good(self, name: str, version: str):
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        tmp = os.path.join(self.root, name, f".{LAST_GOOD}.{os.getpid()}")
+        with open(tmp, "w") as f:
+            f.write(str(version))
+        os.replace(tmp, os.path.join(self.root, name, LAST_GOOD))
+
+    def last_good(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, name, LAST_GOOD)) as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        return version if self.get(name, version) is not None else None
+
+    def cached_resolver(self, resolver: Callable[[str, str], str]) -> Callable[[str, str], str]:
+        """
+        Wraps a registry version lookup so it falls back to the last
+        known-good cached version when the registry cannot be reached.
+        """
+        def resolve(name: str, stage: str) -> str:
+            try:
+                return resolver(name, stage)
+            except Exception as e:
+                version = self.last_good(name)
+                if version is None:
+                    raise
+                print(f"⚠️ Registry lookup for {name} failed ({e}); using cached v{version}")
+                return version
+        return resolve
+
+    # ─────────────────────────────────────────────
+    # Size-based eviction
+    # ─────────────────────────────────────────────
+    def _entries(self) -> list:
+        entries = []
+        for name in sorted(os.listdir(self.root)):
+            name_dir = os.path.join(self.root, name)
+            if not os.path.isdir(name_dir):
+                continue
+            for version in os.listdir(name_dir):
+                path = os.path.join(name_dir, version)
+                manifest = os.path.join(path, MANIFEST)
+                if version.startswith(".") or not os.path.isfile(manifest):
+                    continue
+                size = sum(os.path.getsize(os.path.join(path, rel)) for rel in _list_files(path))
+                entries.append((os.path.getmtime(manifest), name, version, path, size))
+        return entries
+
+    def evict(self, protect: set = frozenset()) -> list:
+        """
+        Removes least-recently-used versions until the cache fits in
+        `max_bytes`. Protected and last known-good versions are kept.
+        Returns the evicted (name, version) pairs.
+        """
+        entries = sorted(self._entries())
+        total = sum(e[4] for e in entries)
+        keep = set(protect)
+        for _, name, _, _, _ in entries:
+            try:
+                with open(os.path.join(self.root, name, LAST_GOOD)) as f:
+                    keep.add((name, f.read().strip()))
+            except OSError:
+                pass
+
+        evicted = []
+        for _, name, version, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if (name, version) in keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted.append((name, version))
+            print(f"🧹 Evicted cached artifacts for {name} v{version}")
+        return evicted
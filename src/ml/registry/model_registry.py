@@ -10,6 +10,10 @@ from dotenv import load_dotenv
 load_dotenv()
 mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
 
+# Tag on a model version naming the preprocessor version it was trained on;
+# serving loads that preprocessor with the model (src/app/utils/model_holder.py)
+PREPROCESSOR_VERSION_TAG = "preprocessor_version"
+
 def _ensure_model_registered(client, registry_name: str):
     """Ensure the registered model exists in the MLflow registry."""
     try:
@@ -38,10 +42,12 @@ def register_and_promote(
     model_object=None,
     run_id: str = None,
     model_uri: str = None,
-    is_pipeline: bool = False
+    is_pipeline: bool = False,
+    tags: dict = None
 ):
     """
     Register and promote either a training model (using run_id + uri) or a fitted pipeline (sklearn object).
+    Returns the registered version (None if the preprocessor could not be registered).
     
     Parameters:
         registry_name (str): Name of the model in MLflow registry.
@@ -49,6 +55,7 @@ def register_and_promote(
         run_id (str): MLflow run ID (required for trained models).
         model_uri (str): Artifact URI for the model (e.g., 'runs:/.../model').
         is_pipeline (bool): Set True if logging preprocessor directly, False if logging trained model from run.
+        tags (dict): Model version tags, set before promotion (e.g. PREPROCESSOR_VERSION_TAG).
     """
     client = MlflowClient()
     _ensure_model_registered(client, registry_name)
@@ -74,7 +81,10 @@ def register_and_promote(
             return
 
         latest_version = versions[0].version
+        for key, value in (tags or {}).items():
+            client.set_model_version_tag(registry_name, latest_version, key, str(value))
         _promote_to_production(client, registry_name, latest_version)
+        return str(latest_version)
 
     else:
         if not run_id or not model_uri:
@@ -84,7 +94,8 @@ def register_and_promote(
             mv = client.create_model_version(
                 name=registry_name,
                 source=model_uri,
-                run_id=run_id
+                run_id=run_id,
+                tags=tags
             )
         except MlflowException as e:
             if "not found" in str(e).lower():
@@ -93,9 +104,11 @@ def register_and_promote(
                 mv = client.create_model_version(
                     name=registry_name,
                     source=model_uri,
-                    run_id=run_id
+                    run_id=run_id,
+                    tags=tags
                 )
             else:
                 raise
 
         _promote_to_production(client, registry_name, mv.version)
+        return str(mv.version)
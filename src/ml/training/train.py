@@ -4,6 +4,7 @@ import os
 import sys
 from datetime import datetime
 import pandas as pd
+import scipy.sparse as sparse
 import mlflow
 from sklearn.model_selection import train_test_split
 from dotenv import load_dotenv
@@ -17,8 +18,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 load_dotenv()
 
 from src.ml.pipeline.pipeline_runner import run_pipeline
-from src.ml.training.train_utils     import get_models_with_params, train_and_log_model
-from src.ml.registry.model_registry   import register_and_promote
+from src.ml.training.train_utils     import get_models_with_params, train_and_log_model, as_frame
+from src.ml.registry.model_registry   import register_and_promote, PREPROCESSOR_VERSION_TAG
 from src.ml.eda.profiler import generate_eda_report
 
 def train_all_models():
@@ -37,12 +38,15 @@ def train_all_models():
     sel_idxs  = final_pipeline.named_steps["feature_selection"].selected_features
     feat_names = all_names[sel_idxs]
 
-    # 3) Build DataFrame
-    df = pd.DataFrame(X_sel, columns=feat_names)
+    # 3) Build DataFrame (PIPELINE_SPARSE keeps CSR rows for the estimators)
+    if sparse.issparse(X_sel):
+        data = X_sel.tocsr()
+    else:
+        data = pd.DataFrame(X_sel, columns=feat_names)
 
     # 4) Split
     X_train, X_test, y_train, y_test = train_test_split(
-        df, y, test_size=0.2,
+        data, y, test_size=0.2,
         random_state=42, stratify=y
     )
 
@@ -57,8 +61,8 @@ def train_all_models():
     with mlflow.start_run(run_name="All_Model_Training_Run") as parent:
         print(f"[INFO] Parent run ID: {parent.info.run_id}")
         check_drift(
-            train_df=X_train,
-            test_df=X_test,
+            train_df=as_frame(X_train, feat_names),
+            test_df=as_frame(X_test, feat_names),
             dataset_name="train_vs_test_drift",
             save_report=True,
             log_to_mlflow=True
@@ -85,11 +89,15 @@ def train_all_models():
         if best_name:
             print(f"\n🏆 Best model: {best_name} (F1={best_f1:.4f})")
             uri = f"runs:/{best_run}/{best_name}"
+            # Pair the model with the preprocessor it was trained on, so
+            # serving never loads it next to a different Production one
+            pre_version = getattr(final_pipeline, "registered_version_", None)
             register_and_promote(
                 registry_name="LeadScoringBestModel",
                 run_id=best_run,
                 model_uri=uri,
-                is_pipeline=False
+                is_pipeline=False,
+                tags={PREPROCESSOR_VERSION_TAG: pre_version} if pre_version else None
             )
         else:
             print("❌ No successful model runs to register.")
@@ -5,6 +5,7 @@ import joblib
 import tempfile
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 import matplotlib.pyplot as plt
 import mlflow
 import warnings
@@ -18,6 +19,35 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 MODEL_DIR = os.path.join("src", "ml", "model_objects")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+# Rows densified for SHAP / signature when training on sparse input
+SPARSE_SAMPLE_ROWS = int(os.getenv("SPARSE_SAMPLE_ROWS", "1000"))
+
+# Wrappers whose sklearn tags do not advertise their native CSR support
+SPARSE_CAPABLE = {"LGBMClassifier"}
+# XGBoost reads entries absent from a CSR matrix as *missing*, not 0, while
+# serving feeds it dense rows with real zeros: always fit it on dense input
+DENSE_ONLY = {"XGBClassifier"}
+
+
+def accepts_sparse(model) -> bool:
+    if type(model).__name__ in DENSE_ONLY:
+        return False
+    if type(model).__name__ in SPARSE_CAPABLE:
+        return True
+    try:
+        return bool(model.__sklearn_tags__().input_tags.sparse)
+    except Exception:
+        return False
+
+
+def as_frame(X, feature_names) -> pd.DataFrame:
+    """DataFrame view of dense or sparse features (sparse is densified)."""
+    if isinstance(X, pd.DataFrame):
+        return X
+    if sp.issparse(X):
+        X = X.toarray()
+    return pd.DataFrame(X, columns=feature_names)
+
 
 def log_shap_plot(model_name, model, X_train_df: pd.DataFrame, X_test_df: pd.DataFrame):
     try:
@@ -51,14 +81,27 @@ def train_and_log_model(
     print(f"\n📌 Training model: {name}")
 
     # ensure DataFrame for SHAP
-    if isinstance(X_train, np.ndarray):
+    if sp.issparse(X_train):
+        if feature_names is None:
+            raise ValueError("feature_names must be provided when using sparse matrices")
+        # SHAP and the signature only need a sample; the fit stays sparse when supported
+        X_train_df = as_frame(X_train[:SPARSE_SAMPLE_ROWS], feature_names)
+        X_test_df  = as_frame(X_test[:SPARSE_SAMPLE_ROWS],  feature_names)
+        if accepts_sparse(model):
+            X_fit, X_eval = X_train, X_test
+        else:
+            print(f"[INFO] {name} needs dense input, densifying {X_train.shape}")
+            X_fit, X_eval = X_train.toarray(), X_test.toarray()
+    elif isinstance(X_train, np.ndarray):
         if feature_names is None:
             raise ValueError("feature_names must be provided when using numpy arrays")
         X_train_df = pd.DataFrame(X_train, columns=feature_names)
         X_test_df  = pd.DataFrame(X_test,  columns=feature_names)
+        X_fit, X_eval = X_train_df, X_test_df
     else:
         X_train_df = X_train.copy()
         X_test_df  = X_test.copy()
+        X_fit, X_eval = X_train_df, X_test_df
 
     # pick CV search
     search = (RandomizedSearchCV(
@@ -75,12 +118,12 @@ def train_and_log_model(
                   return_train_score=True
               ))
 
-    search.fit(X_train_df, y_train)
+    search.fit(X_fit, y_train)
     best_model = search.best_estimator_
 
     # evaluate
-    y_pred = best_model.predict(X_test_df)
-    y_prob = best_model.predict_proba(X_test_df)[:,1] if hasattr(best_model, "predict_proba") else None
+    y_pred = best_model.predict(X_eval)
+    y_prob = best_model.predict_proba(X_eval)[:,1] if hasattr(best_model, "predict_proba") else None
     metrics = compute_metrics(y_test, y_pred, y_prob)
     f1 = metrics["f1_score"]
 